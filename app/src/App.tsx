@@ -142,6 +142,7 @@ export default function App() {
 
     const [planSuuAnkou, setPlanSuuAnkou] = React.useState<PlanData | null>(null);
     const [planChiitoi, setPlanChiitoi] = React.useState<PlanData | null>(null);
+    const [planOptimal, setPlanOptimal] = React.useState<PlanData | null>(null);
 
     const [amulets, setAmulets] = React.useState<EffectItem[]>([]);
     const [goods, setGoods] = React.useState<GoodsItem[]>([]);
@@ -281,6 +282,7 @@ export default function App() {
                 if (!(d.stage === 2 || d.stage === 3)) {
                     setPlanSuuAnkou(null);
                     setPlanChiitoi(null);
+                    setPlanOptimal(null);
                 }
 
                 setAmulets(Array.isArray(d.effect_list) ? d.effect_list : []);
@@ -292,6 +294,7 @@ export default function App() {
                     if (!item || !item.yaku) continue;
                     if (item.yaku === "chiitoi") setPlanChiitoi(item.data ?? null);
                     else if (item.yaku === "suuannkou") setPlanSuuAnkou(item.data ?? null);
+                    else if (item.yaku === "optimal") setPlanOptimal(item.data ?? null);
                 }
             } else if (pkt.type === "autorun_status" && pkt.data) {
                 setAutoStatus(pkt.data as AutoRunnerStatus);
@@ -408,6 +411,7 @@ export default function App() {
                                         <AdvisorPanel
                                             suuAnkou={planSuuAnkou}
                                             chiitoi={planChiitoi}
+                                            optimal={planOptimal}
                                             resolveFace={(id) => deckMap.get(id) ?? null}
                                         />
                                     </div>
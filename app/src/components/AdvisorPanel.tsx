@@ -16,14 +16,21 @@ export type PlanData = {
 export default function AdvisorPanel({
                                          suuAnkou,
                                          chiitoi,
+                                         optimal,
                                          resolveFace,
                                      }: {
     suuAnkou: PlanData | null;
     chiitoi: PlanData | null;
+    optimal?: PlanData | null;
     resolveFace?: (id: number) => string | null;
 }) {
+    const optimalBadge =
+        optimal?.mode === "suuannkou" ? t("advisor.title_suu_ankou")
+            : optimal?.mode === "chiitoi" ? t("advisor.title_chiitoi")
+                : undefined;
     return (
         <aside className={styles.wrap}>
+            <StrategyCard title={t("advisor.title_optimal")} data={optimal ?? null} resolveFace={resolveFace} badge={optimalBadge}/>
             <StrategyCard title={t("advisor.title_suu_ankou")} data={suuAnkou} resolveFace={resolveFace}/>
             <StrategyCard title={t("advisor.title_chiitoi")} data={chiitoi} resolveFace={resolveFace}/>
         </aside>
@@ -20,8 +20,11 @@ from watchfiles import awatch
 from websockets.legacy.server import WebSocketServerProtocol, serve
 
 from backend.autorun.runner import AutoRunner
+from backend.autorun.util.recommend_cache import RecommendCache
+from backend.autorun.util.recommend_engine import RecommendEngine
 from backend.autorun.util.retry_1004 import call_with_1004_retry_async
 from backend.bot import BotPipeline, BotConfig
+from backend.bot.drivers.packet.async_packet_bot import AsyncPacketBot
 from backend.bot.drivers.packet.packet_bot import PacketBot
 from backend.config import build_manager
 from backend.data.registry_loader import load_registry_list
@@ -31,6 +34,7 @@ from backend.ui_runtime import start_ui_loop_once, get_ui_loop, post_coro, mark_
 
 GAME_STATE = GameState()
 PACKET_BOT: PacketBot
+ASYNC_PACKET_BOT: AsyncPacketBot  # 自动化（AUTORUNNER）与 UI 循环上的调用用这个，不占线程
 APP_LOOP: asyncio.AbstractEventLoop | None = None
 UI_STOP: asyncio.Event | None = None
 
@@ -114,11 +118,16 @@ MANAGER = build_manager(CONF_DIR)
 AMULET_REG: AmuletRegistry | None = None
 BADGE_REG: BadgeRegistry | None = None
 
+RECOMMEND_CACHE = RecommendCache(maxsize=256)
+
 AUTORUNNER = AutoRunner(
     get_config=lambda: MANAGER.to_table_payload("autorun"),
     get_game_state=lambda: GAME_STATE,
+    recommend_cache=RECOMMEND_CACHE,
 )
 
+RECOMMENDER = RecommendEngine(cache=RECOMMEND_CACHE)
+
 
 def _load_registries() -> None:
     global AMULET_REG, BADGE_REG
@@ -263,6 +272,41 @@ def api_level():
     return {"type": "request_level", "data": GAME_STATE.level}
 
 
+@api_app.get("/api/recommend/cache")
+def api_recommend_cache():
+    return {"type": "recommend_cache", "data": RECOMMEND_CACHE.stats()}
+
+
+@api_app.get("/api/recommend/cache/clear")
+def api_recommend_cache_clear():
+    RECOMMEND_CACHE.clear()
+    RECOMMEND_CACHE.reset_stats()
+    return {"type": "recommend_cache", "data": RECOMMEND_CACHE.stats()}
+
+
+@api_app.get("/api/mitm/request_ids")
+def api_mitm_request_ids():
+    # 代理未启动时没有 addon；addon 导入了本模块，只能在这里现取
+    from backend.mitm import addon as _addon
+    inst = _addon.WS_ADDON_INSTANCE
+    return {"type": "request_ids", "data": inst.codec_stats() if inst is not None else None}
+
+
+@api_app.get("/api/mitm/waiters")
+def api_mitm_waiters():
+    # PacketBot / AsyncPacketBot 注入请求的等待情况：timeout 多而 late 也多说明响应其实到了、只是没人接
+    from backend.mitm import addon as _addon
+    inst = _addon.WS_ADDON_INSTANCE
+    return {"type": "waiters", "data": inst.waiter_stats() if inst is not None else None}
+
+
+@api_app.get("/api/mitm/hooks")
+def api_mitm_hooks():
+    # 各 hook 处理函数的调用次数与耗时（hooks 模块导入时登记到 HOOKS）
+    from backend.mitm.hook_registry import HOOKS
+    return {"type": "hooks", "data": HOOKS.stats()}
+
+
 @api_app.get("/api/discard")
 def api_discard(tile_id: int = Query(..., description="要丢的牌的 tile_id")):
     return {"type": "discard", "data": {"ok": pipeline.click_discard_by_tile_id(
@@ -373,14 +417,13 @@ async def ws_handler(ws: WebSocketServerProtocol):
                     await AUTORUNNER.refresh_probe_now(push=True)
                     continue
                 if action == "start":
-                    bot = getattr(sys.modules.get("backend.app"), "PACKET_BOT", None)
+                    bot = getattr(sys.modules.get("backend.app"), "ASYNC_PACKET_BOT", None)
 
                     ok, reason, resp = await call_with_1004_retry_async(
                         bot.fetch_amulet_activity_data,
                         delay_sec=8,
                         interval=0.4,
                         timeout=20,
-                        to_thread=True,
                     )
 
                     if not ok:
@@ -402,7 +445,6 @@ async def ws_handler(ws: WebSocketServerProtocol):
                             delay_sec=8,
                             interval=0.6,
                             timeout=30,
-                            to_thread=True,
                         )
                         if not ok2:
                             return await _result(False, f"放弃当前对局失败：{reason2 or 'unknown'}")
@@ -412,7 +454,6 @@ async def ws_handler(ws: WebSocketServerProtocol):
                             delay_sec=8,
                             interval=0.6,
                             timeout=10,
-                            to_thread=True,
                         )
 
                     try:
@@ -9,10 +9,13 @@ import traceback
 from email.mime.text import MIMEText
 from typing import Any, Dict, List, Optional, Tuple
 
+import backend.autorun.util.suannkou_recommender  # noqa: F401  导入即注册 suuannkou 规划器
+from backend.autorun.util.planner_registry import PLANNERS
+from backend.autorun.util.recommend_cache import RecommendCache, cached_plan, relevant_effect_ids
 from backend.autorun.util.retry_1004 import call_with_1004_retry_async
-from backend.autorun.util.suannkou_recommender import plan_pure_pinzu_suu_ankou_v2
-from backend.bot.drivers.packet.packet_bot import PacketBot
+from backend.bot.drivers.packet.async_packet_bot import AsyncPacketBot
 from backend.model.game_state import GameState
+from backend.model.tiles import JOKER, PIN_RANK
 
 try:
     import backend.app as app_mod
@@ -38,9 +41,10 @@ class AutoRunner:
     PROBE_DEBUG = False
     HEARTBEAT_INTERVAL = 1.0  # s
 
-    def __init__(self, *, get_config, get_game_state) -> None:
+    def __init__(self, *, get_config, get_game_state, recommend_cache: Optional[RecommendCache] = None) -> None:
         self._get_config = get_config
         self._get_game_state = get_game_state
+        self._recommend_cache = recommend_cache
 
         self._lock = asyncio.Lock()
 
@@ -216,7 +220,7 @@ class AutoRunner:
                 pass
 
     def _preferred_flow_status(self) -> tuple[Optional[bool], Optional[str]]:
-        packet_bot: PacketBot = self._get_packet_bot()
+        packet_bot: AsyncPacketBot = self._get_packet_bot()
         if not packet_bot or not hasattr(packet_bot, "get_addon"):
             return None, None
 
@@ -249,7 +253,7 @@ class AutoRunner:
 
     def _get_packet_bot(self):
         try:
-            return getattr(app_mod, "PACKET_BOT", None)
+            return getattr(app_mod, "ASYNC_PACKET_BOT", None)
         except Exception:
             return None
 
@@ -376,14 +380,14 @@ class AutoRunner:
     async def refresh_probe_now(self, *, push: bool = False):
         bot = self._get_packet_bot()
         if bot is None:
-            ok, reason, resp = False, "PACKET_BOT missing", None
+            ok, reason, resp = False, "ASYNC_PACKET_BOT missing", None
             if self.PROBE_DEBUG:
-                logger.warning("[autorun] PACKET_BOT is None (manual probe)")
+                logger.warning("[autorun] ASYNC_PACKET_BOT is None (manual probe)")
         else:
             try:
                 if self.PROBE_DEBUG:
                     logger.info("[autorun] calling fetch_amulet_activity_data() (manual)")
-                ok, reason, resp = await asyncio.to_thread(bot.fetch_amulet_activity_data)
+                ok, reason, resp = await bot.fetch_amulet_activity_data()
             except Exception as e:
                 ok, reason, resp = False, f"probe_error: {e}", None
                 logger.exception("[autorun] manual probe exception")
@@ -545,7 +549,7 @@ class AutoRunner:
     async def run_tick(self) -> None:
         try:
             await asyncio.sleep(0.1)
-            bot: PacketBot = self._get_packet_bot()
+            bot: AsyncPacketBot = self._get_packet_bot()
             game_state: GameState = self._get_game_state()
             if await self._check_and_finish_if_done():
                 return
@@ -557,7 +561,6 @@ class AutoRunner:
                     delay_sec=3,
                     interval=3,
                     timeout=3000,
-                    to_thread=True,
                 )
                 if ok:
                     self.runs += 1
@@ -576,7 +579,6 @@ class AutoRunner:
                     delay_sec=3,
                     interval=3,
                     timeout=3000,
-                    to_thread=True,
                 )
                 if ok:
                     return
@@ -598,7 +600,6 @@ class AutoRunner:
                             delay_sec=2.0,
                             interval=0.3,
                             timeout=10,
-                            to_thread=True,
                         )
                         if not ok_sort:
                             logger.warning(f"pre-start sort_effect failed: {reason_sort}")
@@ -609,7 +610,6 @@ class AutoRunner:
                     delay_sec=3,
                     interval=3,
                     timeout=3000,
-                    to_thread=True,
                 )
                 if ok:
                     return
@@ -625,14 +625,14 @@ class AutoRunner:
                         delay_sec=3,
                         interval=3,
                         timeout=3000,
-                        to_thread=True,
                     )
                     if ok:
                         return
                     self.last_error = reason
                     await self.abort(f"fatal: {reason}")
                     return
-                prefer_keep = [tid for tid in game_state.hand_tiles if (face := game_state.deck_map.get(tid)) is not None and (face == "bd" or face.endswith("p"))]
+                codes = game_state.tile_codes
+                prefer_keep = [tid for tid in game_state.hand_tiles if tid < len(codes) and (codes[tid] == JOKER or PIN_RANK[codes[tid]])]
                 # 901是每次只能替换三张牌的debuff
                 if 901 in (game_state.boss_buff or []):
                     keep_target = max(0, len(game_state.hand_tiles) - 3)
@@ -650,7 +650,6 @@ class AutoRunner:
                     delay_sec=3,
                     interval=3,
                     timeout=3000,
-                    to_thread=True,
                 )
                 if ok:
                     return
@@ -660,7 +659,12 @@ class AutoRunner:
             if game_state.stage == 3:
                 self.current_step = f"game.discard({game_state.level})"
                 await self._broadcast_status(safe=True)
-                suuannkou = plan_pure_pinzu_suu_ankou_v2(game_state.hand_tiles, game_state.wall_tiles, game_state.deck_map)
+                planner = PLANNERS.get("suuannkou")
+                suuannkou = cached_plan(
+                    self._recommend_cache, planner.name, planner.fn,
+                    game_state.hand_tiles, game_state.wall_tiles, game_state.deck_map,
+                    game_state.tile_codes, relevant_effect_ids(game_state.effect_list),
+                )
                 if suuannkou["status"] == "impossible":
                     self.current_step = "game.remake"
                     await self._broadcast_status(safe=True)
@@ -670,7 +674,6 @@ class AutoRunner:
                         delay_sec=3,
                         interval=3,
                         timeout=3000,
-                        to_thread=True,
                     )
                     if ok:
                         return
@@ -690,7 +693,6 @@ class AutoRunner:
                                 delay_sec=2.0,
                                 interval=0.3,
                                 timeout=10,
-                                to_thread=True,
                             )
                             if not ok_sort:
                                 logger.warning(f"pre-win sort_effect failed: {reason_sort}, resp: {resp}")
@@ -703,7 +705,6 @@ class AutoRunner:
                         delay_sec=3,
                         interval=3,
                         timeout=3000,
-                        to_thread=True,
                     )
                     if ok:
                         return
@@ -718,7 +719,6 @@ class AutoRunner:
                         delay_sec=3,
                         interval=3,
                         timeout=3000,
-                        to_thread=True,
                     )
                     if ok:
                         return
@@ -741,7 +741,6 @@ class AutoRunner:
                                 delay_sec=3,
                                 interval=3,
                                 timeout=3000,
-                                to_thread=True,
                             )
                             if ok:
                                 return
@@ -755,7 +754,6 @@ class AutoRunner:
                             delay_sec=3,
                             interval=3,
                             timeout=3000,
-                            to_thread=True,
                         )
                         if ok:
                             return
@@ -769,7 +767,6 @@ class AutoRunner:
                         delay_sec=3,
                         interval=3,
                         timeout=3000,
-                        to_thread=True,
                     )
                     if ok:
                         # 刷新成功后：卖掉“带 600110 印章 且 非目标所需”的任意一个护身符
@@ -800,7 +797,6 @@ class AutoRunner:
                                 delay_sec=3,
                                 interval=3,
                                 timeout=30,
-                                to_thread=True,
                             )
                             if not ok2:
                                 self.last_error = reason2
@@ -828,7 +824,6 @@ class AutoRunner:
                                 delay_sec=3,
                                 interval=3,
                                 timeout=3000,
-                                to_thread=True,
                             )
                             if ok:
                                 return
@@ -842,7 +837,6 @@ class AutoRunner:
                             delay_sec=3,
                             interval=3,
                             timeout=3000,
-                            to_thread=True,
                         )
                         if ok:
                             return
@@ -856,7 +850,6 @@ class AutoRunner:
                         delay_sec=3,
                         interval=3,
                         timeout=3000,
-                        to_thread=True,
                     )
                     if ok:
                         # 刷新成功后：卖掉“带 600110 印章 且 非目标所需”的任意一个护身符
@@ -887,7 +880,6 @@ class AutoRunner:
                                 delay_sec=3,
                                 interval=3,
                                 timeout=30,
-                                to_thread=True,
                             )
                             if not ok2:
                                 self.last_error = reason2
@@ -903,12 +895,11 @@ class AutoRunner:
                     delay_sec=3,
                     interval=3,
                     timeout=3000,
-                    to_thread=True,
                 )
                 if ok:
                     return
                 if reason == "error code: 2691":
-                    bot.fetch_amulet_activity_data()
+                    await bot.fetch_amulet_activity_data()
                     return
                 self.last_error = reason
                 await self.abort(f"fatal: {reason}")
@@ -924,7 +915,7 @@ class AutoRunner:
                 if sell_uid:
                     # 先卖掉
                     ok, reason, resp = await call_with_1004_retry_async(
-                        bot.sell_effect, uid=sell_uid, delay_sec=3, interval=3, timeout=30, to_thread=True
+                        bot.sell_effect, uid=sell_uid, delay_sec=3, interval=3, timeout=30
                     )
                     if not ok:
                         self.last_error = reason
@@ -944,7 +935,6 @@ class AutoRunner:
                             delay_sec=3,
                             interval=3,
                             timeout=3000,
-                            to_thread=True,
                         )
                     else:
                         ok, reason, resp = await call_with_1004_retry_async(
@@ -953,7 +943,6 @@ class AutoRunner:
                             delay_sec=3,
                             interval=3,
                             timeout=3000,
-                            to_thread=True,
                         )
                     if ok:
                         if value == 0:
@@ -970,19 +959,18 @@ class AutoRunner:
                                     delay_sec=3,
                                     interval=3,
                                     timeout=3000,
-                                    to_thread=True,
                                 )
                                 if ok:
                                     return
                                 if reason == "error code: 2699":
-                                    bot.fetch_amulet_activity_data()
+                                    await bot.fetch_amulet_activity_data()
                                     return
                                 self.last_error = reason
                                 await self.abort(f"fatal: {reason}")
                             return
                         return
                     if reason == "error code: 2691":
-                        bot.fetch_amulet_activity_data()
+                        await bot.fetch_amulet_activity_data()
                         return
                     self.last_error = reason
                     await self.abort(f"fatal: {reason}")
@@ -1009,7 +997,6 @@ class AutoRunner:
                                 delay_sec=3,
                                 interval=0.6,
                                 timeout=3000,
-                                to_thread=True,
                             )
                             if ok:
                                 continue
@@ -1026,7 +1013,6 @@ class AutoRunner:
                                 delay_sec=3,
                                 interval=3,
                                 timeout=3000,
-                                to_thread=True,
                             )
                         else:
                             ok, reason, resp = await call_with_1004_retry_async(
@@ -1035,7 +1021,6 @@ class AutoRunner:
                                 delay_sec=3,
                                 interval=3,
                                 timeout=3000,
-                                to_thread=True,
                             )
                         if ok:
                             return
@@ -1053,7 +1038,6 @@ class AutoRunner:
                         delay_sec=3,
                         interval=3,
                         timeout=3000,
-                        to_thread=True,
                     )
                 else:
                     ok, reason, resp = await call_with_1004_retry_async(
@@ -1062,7 +1046,6 @@ class AutoRunner:
                         delay_sec=3,
                         interval=3,
                         timeout=3000,
-                        to_thread=True,
                     )
                 if ok:
                     return
@@ -1,39 +1,42 @@
-from collections import Counter
 from math import inf
-from typing import Dict, List, Tuple, Literal
+from typing import Dict, List, Optional, Tuple
 
-# 规则与映射
-RED_MAP = {"0m": "5m", "0p": "5p", "0s": "5s"}  # 红5归一到普通5
-JOKER = "bd"  # 癞子（仅手牌可出现）
+from backend.autorun.util.planner_registry import register_planner
+from backend.model.tiles import JOKER, KIND_FACE, KIND_MASK, RED, UNKNOWN, encode_deck
 
-FIVES = {"5m", "5p", "5s"}
-RED_FIVES_RAW = {"0m", "0p", "0s"}
-PLAIN_FIVES_RAW = {"5m", "5p", "5s"}
+# 规则与映射：全程使用 backend.model.tiles 的牌码
+#   kind = code & KIND_MASK 即归一后的牌种（红5与普通5同 kind），JOKER 为癞子（仅手牌可出现）
+FIVES = {4, 13, 22}  # 5m / 5p / 5s 的 kind
+_N_SLOTS = UNKNOWN + 1
 
 
-def _norm_tile(t: str) -> str:
-    return RED_MAP.get(t, t)
+def _kinds(ids: List[int], codes: bytes) -> List[int]:
+    return [codes[i] & KIND_MASK for i in ids]
 
 
-def _ids_to_tiles(ids: List[int], deck_map: Dict[int, str]) -> List[str]:
-    return [_norm_tile(deck_map[i]) for i in ids]
-
-
-def _distinct_pairs_singles_bd(tiles: List[str]) -> Tuple[int, int, int]:
+def _distinct_pairs_singles_bd(tiles: List[int]) -> Tuple[int, int, int]:
     """
     返回 (pairs_distinct, singles_distinct, B)
     - pairs_distinct: 非癞子中 计数(v>=2) 的“不同对子牌种数”；v=3或v=4 也只算 1 个对子
     - singles_distinct: 非癞子中 计数(v==1) 的“不同单张牌种数”
     - B: 癞子张数（bd）
     """
-    cnt = Counter(t for t in tiles if t != JOKER)
-    pairs_distinct = sum(1 for v in cnt.values() if v >= 2)
-    singles_distinct = sum(1 for v in cnt.values() if v == 1)
-    B = tiles.count(JOKER)
+    cnt = [0] * _N_SLOTS
+    for t in tiles:
+        cnt[t] += 1
+    B = cnt[JOKER]
+    cnt[JOKER] = 0
+    pairs_distinct = 0
+    singles_distinct = 0
+    for v in cnt:
+        if v >= 2:
+            pairs_distinct += 1
+        elif v == 1:
+            singles_distinct += 1
     return pairs_distinct, singles_distinct, B
 
 
-def _can_pick_14_as_chiitoi_distinct(pool: List[str]) -> bool:
+def _can_pick_14_as_chiitoi_distinct(pool: List[int]) -> bool:
     """“七对=七种不同对子”的可行性判定。允许 pool>=14（可从中挑14张）。"""
     if len(pool) < 14:
         return False
@@ -45,7 +48,7 @@ def _can_pick_14_as_chiitoi_distinct(pool: List[str]) -> bool:
     return B >= bd_needed
 
 
-def _win_now_draw_sensitive_14(hand14: List[str]) -> bool:
+def _win_now_draw_sensitive_14(hand14: List[int]) -> bool:
     """
     14张，最后一张为新摸：
     - 若手里无癞子(B=0)：14 张本身严七对即可立刻和
@@ -63,17 +66,98 @@ def _win_now_draw_sensitive_14(hand14: List[str]) -> bool:
         return P == 6 and S == 0
 
 
-def _earliest_draws_after_discard_to_chiitoi(hand13: List[str], wall_tiles_norm_no_bd: List[str]) -> int:
-    for k in range(1, len(wall_tiles_norm_no_bd) + 1):
-        if _can_pick_14_as_chiitoi_distinct(hand13 + wall_tiles_norm_no_bd[:k]):
-            return k
-    return inf
+class _ChiitoiCounts:
+    """
+    七对判定用的滚动计数：不同对子种数 P、不同单张种数 S、癞子数 B。
+    加/减一张牌都是 O(1)，判定与 _can_pick_14_as_chiitoi_distinct 完全一致。
+    """
+    __slots__ = ("cnt", "pairs", "singles", "jokers", "size")
+
+    def __init__(self, tiles: List[int] = ()):
+        self.cnt: List[int] = [0] * _N_SLOTS
+        self.pairs = 0
+        self.singles = 0
+        self.jokers = 0
+        self.size = 0
+        for t in tiles:
+            self.add(t)
+
+    def copy(self) -> "_ChiitoiCounts":
+        c = _ChiitoiCounts()
+        c.cnt = self.cnt[:]
+        c.pairs, c.singles, c.jokers, c.size = self.pairs, self.singles, self.jokers, self.size
+        return c
+
+    def add(self, t: int) -> None:
+        self.size += 1
+        if t == JOKER:
+            self.jokers += 1
+            return
+        v = self.cnt[t]
+        if v == 0:
+            self.singles += 1
+        elif v == 1:
+            self.singles -= 1
+            self.pairs += 1
+        self.cnt[t] = v + 1
+
+    def remove(self, t: int) -> None:
+        self.size -= 1
+        if t == JOKER:
+            self.jokers -= 1
+            return
+        v = self.cnt[t]
+        if v == 1:
+            self.singles -= 1
+        elif v == 2:
+            self.singles += 1
+            self.pairs -= 1
+        self.cnt[t] = v - 1
+
+    def feasible(self) -> bool:
+        if self.size < 14:
+            return False
+        need_pairs = max(0, 7 - self.pairs)
+        use_bd_on_singles = min(need_pairs, self.singles)
+        return self.jokers >= use_bd_on_singles + (need_pairs - use_bd_on_singles) * 2
+
+    def earliest(self, wall_tiles_norm_no_bd: List[int]) -> int:
+        """
+        依次加入牌山的牌，返回最早可行的摸牌数（会修改自身计数）。
+        可行性随摸牌单调：加单张使 S+1，单张成对使 P+1、S-1，所需癞子数都不会增加，
+        所以顺序扫一遍即可。
+        """
+        for k, t in enumerate(wall_tiles_norm_no_bd, 1):
+            self.add(t)
+            if self.feasible():
+                return k
+        return inf
+
+
+def _earliest_draws_after_discard_to_chiitoi(hand13: List[int], wall_tiles_norm_no_bd: List[int]) -> int:
+    return _ChiitoiCounts(hand13).earliest(wall_tiles_norm_no_bd)
+
+
+def _earliest_draws_by_discard_face(hand: _ChiitoiCounts, wall_tiles_norm_no_bd: List[int]) -> Dict[int, int]:
+    """
+    对手牌中每一种牌面：打掉一张后最早几摸能成七对。
+    同面的牌结果相同，所以按牌面算一次即可（最多 14 次线性扫描）。
+    """
+    out: Dict[int, int] = {}
+    faces = [f for f, v in enumerate(hand.cnt) if v]
+    if hand.jokers:
+        faces.append(JOKER)
+    for f in faces:
+        c = hand.copy()
+        c.remove(f)
+        out[f] = c.earliest(wall_tiles_norm_no_bd)
+    return out
 
 
 def _uke_ire_from_wall_available_first(
-        hand13_norm: List[str],
+        hand13_norm: List[int],
         wall_ids: List[int],
-        deck_map: Dict[int, str],
+        codes: bytes,
 ) -> Tuple[int, Dict[str, int]]:
     """
     逐张遍历牌山（顺序无关，仅统计张数），把“这张+hand13”能成严格七对的计入。
@@ -82,32 +166,32 @@ def _uke_ire_from_wall_available_first(
     - 快速通路：B>=1 且 非癞子“不同对子数”==6 且 “不同单张数”==0 → 任摸皆胡（除bd）
     """
     P, S, B = _distinct_pairs_singles_bd(hand13_norm)
+    wall = [t for t in _kinds(wall_ids, codes) if t != JOKER]  # 牌山不含癞子
     if B >= 1 and P == 6 and S == 0:
-        faces = [_norm_tile(deck_map[i]) for i in wall_ids]
-        faces = [f for f in faces if f != JOKER]  # 牌山不含癞子
-        cnt = Counter(faces)
-        return sum(cnt.values()), dict(cnt)
-
-    total = 0
-    face_counter = Counter()
-    for iid in wall_ids:
-        f = _norm_tile(deck_map[iid])
-        if f == JOKER:
-            continue  # 牌山不会摸到癞子：忽略
-        if _can_pick_14_as_chiitoi_distinct(hand13_norm + [f]):
-            total += 1
-            face_counter[f] += 1
-    return total, dict(face_counter)
-
-
-def _first_idx(arr: List[str], target: str) -> int:
+        accept = wall
+    else:
+        base = _ChiitoiCounts(hand13_norm)
+        accept = []
+        for t in wall:
+            base.add(t)
+            if base.feasible():
+                accept.append(t)
+            base.remove(t)
+    face_counter: Dict[str, int] = {}
+    for t in accept:
+        f = KIND_FACE[t]
+        face_counter[f] = face_counter.get(f, 0) + 1
+    return len(accept), face_counter
+
+
+def _first_idx(arr: List[int], target: int) -> int:
     try:
         return arr.index(target)
     except ValueError:
         return inf
 
 
-def _helpfulness(tile: str, hand_cnt: Counter, wall_tiles_norm_no_bd: List[str]) -> float:
+def _helpfulness(tile: int, hand_cnt: List[int], wall_tiles_norm_no_bd: List[int]) -> float:
     """
     越小越该切：
     - 不切癞子
@@ -126,28 +210,66 @@ def _helpfulness(tile: str, hand_cnt: Counter, wall_tiles_norm_no_bd: List[str])
     return -10 if nxt is inf else (50 - 0.1 * nxt)
 
 
+def _red_and_plain(kind: int, hand_raw: List[int]) -> bool:
+    """手里同一种五是否同时有红五与普通五"""
+    return (kind | RED) in hand_raw and kind in hand_raw
+
+
 def _prefer_plain_five_over_red(
         picked_idx: int,
-        hand_raw: List[str],
-        hand_norm: List[str],
+        hand_raw: List[int],
+        hand_norm: List[int],
 ) -> int:
     norm_face = hand_norm[picked_idx]
-    raw_face = hand_raw[picked_idx]
     if norm_face not in FIVES:
         return picked_idx
-    has_red = any(r in RED_FIVES_RAW and _norm_tile(r) == norm_face for r in hand_raw)
-    has_plain = any(r == norm_face for r in hand_raw)
-    if has_red and has_plain:
-        for i, r in enumerate(hand_raw):
-            if r == norm_face:  # 非红5
-                return i
+    if _red_and_plain(norm_face, hand_raw):
+        return hand_raw.index(norm_face)  # 非红5
     return picked_idx
 
 
+def _build_target14_from_pool(pool_norm_with_bd: List[int]) -> List[str]:
+    """从可行池里构造一种严格七对14张（仅用于展示；0x已归一为5x；bd 保留为 'bd'）。"""
+    cnt: Dict[int, int] = {}
+    for t in pool_norm_with_bd:
+        if t != JOKER:
+            cnt[t] = cnt.get(t, 0) + 1
+    B = pool_norm_with_bd.count(JOKER)
+
+    pairs = [t for t, v in cnt.items() if v >= 2]   # 自然对子种
+    singles = [t for t, v in cnt.items() if v == 1] # 单张种
+    res: List[int] = []
+
+    # 先放自然对子
+    used_pairs = 0
+    for t in pairs:
+        if used_pairs == 7:
+            break
+        res += [t, t]
+        used_pairs += 1
+
+    # 再用“单张 + bd”补对子
+    i = 0
+    while used_pairs < 7 and i < len(singles) and B >= 1:
+        res += [singles[i], JOKER]
+        B -= 1
+        used_pairs += 1
+        i += 1
+
+    # 不够再用纯 bd
+    while used_pairs < 7 and B >= 2:
+        res += [JOKER, JOKER]
+        B -= 2
+        used_pairs += 1
+
+    return [KIND_FACE[t] for t in res] if used_pairs == 7 and len(res) == 14 else []
+
+
 def chiitoi_recommendation_json(
         deck_map: Dict[int, str],
         hand_ids: List[int],  # 14张（最后一张为新摸）
         wall_ids: List[int],
+        codes: Optional[bytes] = None,
 ):
     """
     返回：
@@ -157,56 +279,20 @@ def chiitoi_recommendation_json(
     规则：
       - 0m/0p/0s 归一到 5m/5p/5s 做判定；丢牌时仍按 id 输出，且需要打五时优先打“5x”而不是“0x”
       - 牌山中遇到 bd 直接忽略；bd 只会在手牌出现，可补任意牌成对子
+    codes 为 GameState.tile_codes（tile id -> 牌码）；不传则由 deck_map 现算。
     """
-    from collections import Counter
-    from math import inf
-
-    def _ids_norm(ids: List[int]) -> List[str]:
-        return [_norm_tile(deck_map[i]) for i in ids]
-
-    def _wall_norm_no_bd(ids: List[int]) -> List[str]:
-        arr = [_norm_tile(deck_map[i]) for i in ids]
-        return [t for t in arr if t != JOKER]
-
-    def _build_target14_from_pool(pool_norm_with_bd: List[str]) -> List[str]:
-        """从可行池里构造一种严格七对14张（仅用于展示；0x已归一为5x；bd 保留为 'bd'）。"""
-        cnt = Counter(t for t in pool_norm_with_bd if t != JOKER)
-        B = pool_norm_with_bd.count(JOKER)
-
-        pairs = [t for t, v in cnt.items() if v >= 2]   # 自然对子种
-        singles = [t for t, v in cnt.items() if v == 1] # 单张种
-        res: List[str] = []
-
-        # 先放自然对子
-        used_pairs = 0
-        for t in pairs:
-            if used_pairs == 7:
-                break
-            res += [t, t]
-            used_pairs += 1
-
-        # 再用“单张 + bd”补对子
-        i = 0
-        while used_pairs < 7 and i < len(singles) and B >= 1:
-            res += [singles[i], JOKER]
-            B -= 1
-            used_pairs += 1
-            i += 1
-
-        # 不够再用纯 bd
-        while used_pairs < 7 and B >= 2:
-            res += [JOKER, JOKER]
-            B -= 2
-            used_pairs += 1
-
-        return res if used_pairs == 7 and len(res) == 14 else []
+    if codes is None:
+        codes = encode_deck(deck_map)
+
+    def _wall_norm_no_bd(ids: List[int]) -> List[int]:
+        return [t for t in _kinds(ids, codes) if t != JOKER]
 
     # 规范化
     if len(hand_ids) != 14:
         return {"status": "impossible", "reason": "hand-must-be-14"}
 
-    H_raw = [deck_map[i] for i in hand_ids]
-    H_norm = [_norm_tile(x) for x in H_raw]         # 判定用（0x -> 5x）
+    H_raw = [codes[i] for i in hand_ids]
+    H_norm = [c & KIND_MASK for c in H_raw]         # 判定用（0x -> 5x）
     W_norm_no_bd = _wall_norm_no_bd(wall_ids)       # 牌山无 bd
 
     # 起手可胡？（新摸在末位）
@@ -220,20 +306,17 @@ def chiitoi_recommendation_json(
         }
 
     # 起手应打哪张以达到“最早自摸”
-    hand_cnt = Counter(H_norm)
+    hand = _ChiitoiCounts(H_norm)
+    k_by_face = _earliest_draws_by_discard_face(hand, W_norm_no_bd)
     candidates = []  # (idx, k, tie_score, prefer_penalty)
 
     for idx in range(14):
-        hand13 = H_norm[:idx] + H_norm[idx+1:]
-        k = _earliest_draws_after_discard_to_chiitoi(hand13, W_norm_no_bd)  # 最早几摸
-        tie_score = _helpfulness(H_norm[idx], hand_cnt, W_norm_no_bd)       # 次级排序
+        k = k_by_face[H_norm[idx]]  # 最早几摸
+        tie_score = _helpfulness(H_norm[idx], hand.cnt, W_norm_no_bd)       # 次级排序
         prefer_penalty = 0
-        if H_norm[idx] in FIVES:
-            has_red = any(r in RED_FIVES_RAW and _norm_tile(r) == H_norm[idx] for r in H_raw)
-            has_plain = any(r == H_norm[idx] for r in H_raw)
-            if has_red and has_plain and H_raw[idx] in RED_FIVES_RAW:
-                # 同面同时持有 0x 与 5x 时，丢 0x 施加惩罚（优先丢 5x）
-                prefer_penalty = 1
+        if H_raw[idx] & RED and _red_and_plain(H_norm[idx], H_raw):
+            # 同面同时持有 0x 与 5x 时，丢 0x 施加惩罚（优先丢 5x）
+            prefer_penalty = 1
         candidates.append((idx, k, tie_score, prefer_penalty))
 
     # 速度优先：k 最小 → tie_score → prefer_penalty（普通五优先丢）
@@ -247,6 +330,7 @@ def chiitoi_recommendation_json(
     discards: List[int] = []
     cur_ids = list(hand_ids)
     cur_norm = list(H_norm)
+    cur_raw = list(H_raw)
 
     # 五优先规则修正：如果是 5x 面且同时有 0x 与 5x，优先丢 5x（非红）
     best_idx = _prefer_plain_five_over_red(best_idx, H_raw, H_norm)
@@ -255,13 +339,14 @@ def chiitoi_recommendation_json(
         discards.append(hand_ids[best_idx])
         del cur_ids[best_idx]
         del cur_norm[best_idx]
+        del cur_raw[best_idx]
 
     # 按计划摸 k_found 次；第 k_found 次即自摸，不再丢
     for j in range(k_found):
         draw_id = wall_ids[j]
-        draw_norm = _norm_tile(deck_map[draw_id])
         cur_ids.append(draw_id)
-        cur_norm.append(draw_norm)
+        cur_raw.append(codes[draw_id])
+        cur_norm.append(codes[draw_id] & KIND_MASK)
 
         if j == k_found - 1:
             break  # 这一摸自摸
@@ -271,18 +356,15 @@ def chiitoi_recommendation_json(
         # 丟一張，保证仍能在剩余步数内完成（保持全局最早 k）
         best2_idx = None
         best2_key = None
+        cur = _ChiitoiCounts(cur_norm)
+        k2_by_face = _earliest_draws_by_discard_face(cur, rest_norm_no_bd)
         for idx2 in range(len(cur_norm)):
-            nh = cur_norm[:idx2] + cur_norm[idx2+1:]
-            k2 = _earliest_draws_after_discard_to_chiitoi(nh, rest_norm_no_bd)
+            k2 = k2_by_face[cur_norm[idx2]]
             if k2 <= (k_found - (j+1)):
-                tie = _helpfulness(cur_norm[idx2], Counter(cur_norm), rest_norm_no_bd)
+                tie = _helpfulness(cur_norm[idx2], cur.cnt, rest_norm_no_bd)
                 red_penalty = 0
-                if cur_norm[idx2] in FIVES:
-                    raw_set = [deck_map[_id] for _id in cur_ids]
-                    has_red = any(r in RED_FIVES_RAW and _norm_tile(r) == cur_norm[idx2] for r in raw_set)
-                    has_plain = any(r == cur_norm[idx2] for r in raw_set)
-                    if has_red and has_plain and deck_map[cur_ids[idx2]] in RED_FIVES_RAW:
-                        red_penalty = 1
+                if cur_raw[idx2] & RED and _red_and_plain(cur_norm[idx2], cur_raw):
+                    red_penalty = 1
                 key = (k2, tie, red_penalty)
                 if best2_key is None or key < best2_key:
                     best2_key = key
@@ -291,13 +373,14 @@ def chiitoi_recommendation_json(
         if best2_idx is None:
             # 兜底（极少）：选一个对后续帮助最小的
             best2_idx = min(range(len(cur_norm)),
-                            key=lambda i: _helpfulness(cur_norm[i], Counter(cur_norm), rest_norm_no_bd))
+                            key=lambda i: _helpfulness(cur_norm[i], cur.cnt, rest_norm_no_bd))
 
         discards.append(cur_ids[best2_idx])
         del cur_ids[best2_idx]
         del cur_norm[best2_idx]
+        del cur_raw[best2_idx]
 
-    pool_norm = _ids_norm(hand_ids + wall_ids[:k_found])
+    pool_norm = _kinds(hand_ids + wall_ids[:k_found], codes)
     target14 = _build_target14_from_pool(pool_norm)
 
     return {
@@ -306,3 +389,9 @@ def chiitoi_recommendation_json(
         "target14": target14,
         "discards": discards
     }
+
+
+@register_planner("chiitoi", order=10)
+def chiitoi_planner(hand_ids: List[int], wall_ids: List[int], deck_map: Dict[int, str], codes: Optional[bytes] = None):
+    """规划器注册表的统一调用约定 (hand_ids, wall_ids, deck_map, codes)"""
+    return chiitoi_recommendation_json(deck_map, hand_ids, wall_ids, codes)
@@ -0,0 +1,226 @@
+"""
+整局最优打牌规划：在已知牌山上做分支定界，求到任一支持役的最少摸牌路径。
+
+状态为 (第 j 摸, 手牌牌种计数)，每一步 = 打一张 + 摸 wall[j]。
+  - 剪枝：打完这张后，“手牌 + 剩余将摸的牌”整体仍能凑出该役（与两个贪心规划器相同的池判定）
+  - 置换表：已证明走不通的 (j, 手牌计数) 直接跳过（不同打法常殊途同归）
+  - 迭代加深：k 从“牌山前缀池可行”的最早摸数开始。该下界几乎总是可达，搜索基本不回溯
+
+丢牌只决定牌种；落到具体 id 时同种优先打非红五。
+"""
+from math import inf
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from backend.autorun.util.chiitoi_recommender import _build_target14_from_pool, _win_now_draw_sensitive_14
+from backend.autorun.util.planner_registry import register_planner
+from backend.autorun.util.suannkou_recommender import _pinzu_deficit, min_pinzu_deficit
+from backend.model.tiles import JOKER, KIND_MASK, RED, UNKNOWN, encode_deck
+
+_N = UNKNOWN + 1
+_PIN = range(9, 18)
+
+
+def _chiitoi_pool_ok(cnt: Sequence[int]) -> bool:
+    """池中能否挑出 14 张严格七对（7 种不同对子，癞子补）"""
+    size = 0
+    pairs = singles = 0
+    for k, v in enumerate(cnt):
+        size += v
+        if k == JOKER:
+            continue
+        if v >= 2:
+            pairs += 1
+        elif v == 1:
+            singles += 1
+    if size < 14:
+        return False
+    need = 7 - pairs if pairs < 7 else 0
+    use = need if need < singles else singles
+    return cnt[JOKER] >= use + (need - use) * 2
+
+
+def _chiitoi_target(kinds: List[int]) -> List[str]:
+    return _build_target14_from_pool(kinds)
+
+
+def _suu_pool_ok(cnt: Sequence[int]) -> bool:
+    """池中能否挑出 14 张纯饼四暗刻（癞子当任意饼）"""
+    bd = cnt[JOKER]
+    pins = [0] + [cnt[k] for k in _PIN]
+    if sum(pins) + bd < 14:
+        return False
+    return _pinzu_deficit(pins) <= bd
+
+
+def _suu_target(kinds: List[int]) -> List[str]:
+    pins = [0] * 10
+    for t in kinds:
+        if 9 <= t <= 17:
+            pins[t - 8] += 1
+    _, trip, pair = min_pinzu_deficit(pins)
+    need = [0] * 10
+    for r in trip:
+        need[r] += 3
+    need[pair] += 2
+    out: List[str] = []
+    for d in range(1, 10):
+        out += [f"{d}p"] * need[d]
+    return out
+
+
+# 役名 -> (池可行判定, 展示用 target14)。顺序即同摸数时的优先级
+YAKU: Dict[str, Tuple[Callable[[Sequence[int]], bool], Callable[[List[int]], List[str]]]] = {
+    "suuannkou": (_suu_pool_ok, _suu_target),
+    "chiitoi": (_chiitoi_pool_ok, _chiitoi_target),
+}
+
+
+def _counts(kinds: Sequence[int]) -> List[int]:
+    c = [0] * _N
+    for t in kinds:
+        c[t] += 1
+    return c
+
+
+def _win_now(yaku: str, hand_kinds: List[int], pool_ok) -> bool:
+    if yaku == "chiitoi":
+        # 七对起手即和要看末张（新摸）：与 chiitoi_recommender 一致
+        return _win_now_draw_sensitive_14(hand_kinds)
+    return pool_ok(_counts(hand_kinds))
+
+
+def _search(
+        hand: List[int],
+        wall: List[int],
+        k: int,
+        pool_ok: Callable[[Sequence[int]], bool],
+) -> Optional[List[int]]:
+    """
+    恰好摸 k 张后和牌的打法（返回每步打出的牌种）；无解返回 None。
+    hand 为 14 张的牌种计数（会被原地修改后复原）。
+    """
+    # rest[j] = wall[j:k] 的计数
+    rest = [[0] * _N for _ in range(k + 1)]
+    for j in range(k - 1, -1, -1):
+        rest[j][:] = rest[j + 1]
+        rest[j][wall[j]] += 1
+    dead = set()  # 置换表：走不通的 (j, 手牌计数)
+
+    def dfs(j: int) -> Optional[List[int]]:
+        if j == k:
+            return [] if pool_ok(hand) else None
+        key = (j, tuple(hand))
+        if key in dead:
+            return None
+        draw = wall[j]
+        after = rest[j + 1]
+        # 打牌顺序：先打池中最多余的牌种，癞子最后
+        order = sorted(
+            (t for t in range(_N) if hand[t]),
+            key=lambda t: (t == JOKER, -(hand[t] + after[t]), t),
+        )
+        for d in order:
+            hand[d] -= 1
+            hand[draw] += 1
+            pool = [a + b for a, b in zip(hand, after)]
+            if pool_ok(pool):
+                sub = dfs(j + 1)
+                if sub is not None:
+                    hand[draw] -= 1
+                    hand[d] += 1
+                    return [d] + sub
+            hand[draw] -= 1
+            hand[d] += 1
+        dead.add(key)
+        return None
+
+    return dfs(0)
+
+
+def _lower_bound(hand: List[int], wall: List[int], pool_ok) -> int:
+    pool = hand[:]
+    if pool_ok(pool):
+        return 0
+    for k, t in enumerate(wall, 1):
+        pool[t] += 1
+        if pool_ok(pool):
+            return k
+    return inf
+
+
+def _kinds_to_ids(
+        hand_ids: List[int],
+        wall_ids: List[int],
+        codes: bytes,
+        discard_kinds: List[int],
+) -> List[int]:
+    """把每步要打的牌种落到具体 id：同种优先打非红五，其次手里靠前的那张"""
+    cur = list(hand_ids)
+    out: List[int] = []
+    for j, d in enumerate(discard_kinds):
+        same = [i for i in cur if codes[i] & KIND_MASK == d]
+        pick = next((i for i in same if not codes[i] & RED), same[0])
+        out.append(pick)
+        cur.remove(pick)
+        cur.append(wall_ids[j])
+    return out
+
+
+@register_planner("optimal", order=30)
+def plan_optimal(
+        hand_ids: List[int],
+        wall_ids: List[int],
+        deck_map: Dict[int, str],
+        codes: Optional[bytes] = None,
+        yaku: Sequence[str] = tuple(YAKU),
+) -> dict:
+    """
+    对每个支持的役求最少摸牌数，取最少者（同摸数按 YAKU 顺序）。
+    返回与其他规划器相同的结构，另带 mode=役名：
+      - {"status":"win_now","draws_needed":0,"target14":[...],"discards":[],"mode":...}
+      - {"status":"plan","draws_needed":k,"target14":[...],"discards":[...],"mode":...}
+      - {"status":"impossible","reason":"..."}
+    """
+    if codes is None:
+        codes = encode_deck(deck_map)
+    if len(hand_ids) != 14:
+        return {"status": "impossible", "reason": "hand-must-be-14"}
+
+    hand_kinds = [codes[i] & KIND_MASK for i in hand_ids]
+    wall_kinds = [codes[i] & KIND_MASK for i in wall_ids]
+    hand = _counts(hand_kinds)
+
+    best = None  # (k, 役名, 打牌牌种)
+    for name in yaku:
+        pool_ok, _ = YAKU[name]
+        if _win_now(name, hand_kinds, pool_ok):
+            best = (0, name, [])
+            break
+        lo = max(1, _lower_bound(hand, wall_kinds, pool_ok))
+        hi = len(wall_kinds) if best is None else best[0] - 1
+        k = lo
+        while k <= hi:
+            path = _search(hand, wall_kinds, k, pool_ok)
+            if path is not None:
+                best = (k, name, path)
+                break
+            k += 1
+
+    if best is None:
+        return {"status": "impossible", "reason": "no-path-to-any-yaku"}
+
+    k, name, path = best
+    final = list(hand_kinds)
+    for j, d in enumerate(path):
+        final.remove(d)
+        final.append(wall_kinds[j])
+    target14 = YAKU[name][1](final)
+    if k == 0:
+        return {"status": "win_now", "draws_needed": 0, "target14": target14, "discards": [], "mode": name}
+    return {
+        "status": "plan",
+        "draws_needed": k,
+        "target14": target14,
+        "discards": _kinds_to_ids(hand_ids, wall_ids, codes, path),
+        "mode": name,
+    }
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+# 规划器调用约定：planner(hand_ids, wall_ids, deck_map, codes) -> dict
+#   返回 {"status": "win_now" | "plan" | "impossible", "draws_needed", "target14", "discards", ...}
+Planner = Callable[..., dict]
+
+DEFAULT_BUDGET_MS = 200
+
+
+@dataclass
+class PlannerSpec:
+    name: str  # 即 discard_recommendation 里的 yaku 字段
+    fn: Planner
+    order: int = 100  # payload 中的顺序（小的在前）
+    budget_ms: int = DEFAULT_BUDGET_MS  # 超时则本次推荐先不带它
+    enabled: bool = True  # 只在注册时决定
+
+
+class PlannerRegistry:
+    """
+    打牌规划器注册表：各规划器模块在导入时用 register_planner 登记自己，
+    RecommendEngine / AutoRunner 只按名字取用，不再各自硬编码。
+    规划器都在导入时登记（有导入锁），之后只读，不需要另外加锁。
+    """
+
+    def __init__(self):
+        self._by_name: Dict[str, PlannerSpec] = {}
+
+    def register(self, spec: PlannerSpec) -> PlannerSpec:
+        if spec.name in self._by_name:
+            raise ValueError(f"重复的规划器: {spec.name}")
+        self._by_name[spec.name] = spec
+        return spec
+
+    def get(self, name: str) -> Optional[PlannerSpec]:
+        return self._by_name.get(name)
+
+    def enabled(self) -> List[PlannerSpec]:
+        return sorted((s for s in self._by_name.values() if s.enabled), key=lambda s: s.order)
+
+
+PLANNERS = PlannerRegistry()
+
+
+def register_planner(name: str, *, order: int = 100, budget_ms: int = DEFAULT_BUDGET_MS, enabled: bool = True):
+    """装饰器：把 planner(hand_ids, wall_ids, deck_map, codes) 登记到 PLANNERS，函数本身原样返回"""
+
+    def deco(fn: Planner) -> Planner:
+        PLANNERS.register(PlannerSpec(name=name, fn=fn, order=order, budget_ms=budget_ms, enabled=enabled))
+        return fn
+
+    return deco
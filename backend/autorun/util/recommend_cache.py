@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from backend.model.tiles import encode_deck
+
+# 会改变推荐结果的护身符（按 id // 10 归类）：221 = 牌山理牌
+RELEVANT_EFFECT_BASES = {221}
+
+
+def relevant_effect_ids(effect_list: Iterable[Dict[str, Any]]) -> Tuple[int, ...]:
+    """从 effect_list 中挑出影响推荐的护身符 id（排序后作为缓存键的一部分）"""
+    out = set()
+    for e in effect_list or []:
+        try:
+            eid = int(e.get("id", -1))
+        except Exception:
+            continue
+        if eid // 10 in RELEVANT_EFFECT_BASES:
+            out.add(eid)
+    return tuple(sorted(out))
+
+
+def recommend_key(
+        yaku: str,
+        hand_ids: Sequence[int],
+        wall_ids: Sequence[int],
+        codes: bytes,
+        effect_ids: Tuple[int, ...] = (),
+) -> Tuple[Hashable, ...]:
+    """
+    推荐结果的规范缓存键：(役, 手牌 id 顺序, 剩余牌山顺序, 这些 id 的牌码, 相关护身符)。
+    - 手牌保留原顺序：末张是新摸的牌，七对的即和判定与同分候选的取舍都依赖位置
+    - 牌码只取手牌与牌山用到的 id，换了一副牌（同 id 不同牌面）也不会误命中
+    """
+    n = len(codes)
+    used = bytes(codes[i] if i < n else 0xFF for i in (*hand_ids, *wall_ids))
+    return yaku, tuple(hand_ids), tuple(wall_ids), used, effect_ids
+
+
+class RecommendCache:
+    """
+    规划器结果的 LRU 缓存（线程安全：推荐线程与 autorun 会同时访问）。
+    命中返回的是同一个 dict，调用方只读不改。
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple[Hashable, ...], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key: Tuple[Hashable, ...], compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        # 计算放在锁外：规划器可能要几毫秒，不挡住其他线程查缓存
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+def cached_plan(
+        cache: Optional[RecommendCache],
+        yaku: str,
+        planner: Callable[..., dict],
+        hand_ids: List[int],
+        wall_ids: List[int],
+        deck_map: Dict[int, str],
+        codes: Optional[bytes] = None,
+        effect_ids: Tuple[int, ...] = (),
+) -> dict:
+    """
+    经缓存调用规划器。planner 的参数约定为 (hand_ids, wall_ids, deck_map, codes)；
+    cache 为 None 时直接计算。
+    """
+    if not codes:
+        codes = encode_deck(deck_map)
+    if cache is None:
+        return planner(hand_ids, wall_ids, deck_map, codes)
+    key = recommend_key(yaku, hand_ids, wall_ids, codes, effect_ids)
+    return cache.get_or_compute(key, lambda: planner(hand_ids, wall_ids, deck_map, codes))
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+# 导入即向 PLANNERS 注册
+import backend.autorun.util.chiitoi_recommender  # noqa: F401
+import backend.autorun.util.optimal_planner  # noqa: F401
+import backend.autorun.util.suannkou_recommender  # noqa: F401
+from backend.autorun.util.planner_registry import PLANNERS, PlannerRegistry, PlannerSpec
+from backend.autorun.util.recommend_cache import RecommendCache, cached_plan, relevant_effect_ids
+from backend.model.tiles import encode_deck
+
+
+@dataclass(frozen=True)
+class RecommendSnapshot:
+    """
+    一次摸牌事件时的局面快照（只读副本，可以安全地交给工作线程）
+    """
+    hand_tiles: Tuple[int, ...]
+    wall_tiles: Tuple[int, ...]
+    deck_map: Dict[int, str]
+    codes: bytes = b""  # tile id → 牌码；bytes 不可变，直接共享
+    effect_ids: Tuple[int, ...] = ()  # 影响推荐的护身符 id（缓存键用）
+
+    @classmethod
+    def from_game_state(cls, gs) -> "RecommendSnapshot":
+        return cls(
+            hand_tiles=tuple(gs.hand_tiles),
+            wall_tiles=tuple(gs.wall_tiles),
+            deck_map=dict(gs.deck_map),
+            codes=gs.tile_codes,
+            effect_ids=relevant_effect_ids(gs.effect_list),
+        )
+
+
+class _Stale(Exception):
+    """任务已被更新的摸牌事件取代"""
+
+
+def current_discard(plan: dict) -> int | None:
+    if not isinstance(plan, dict):
+        return None
+    if plan.get("status") != "plan":
+        return None
+    d = plan.get("discards") or []
+    return int(d[0]) if d else None
+
+
+def wrap_entry(yaku_key: str, plan: dict) -> dict:
+    entry = {
+        "status": plan.get("status"),
+        "draws_needed": plan.get("draws_needed"),
+        "target14": plan.get("target14") or [],
+        "discards": plan.get("discards") or [],
+    }
+    # 可选字段（仅存在时写入）
+    if "pair_hint" in plan: entry["pair_hint"] = plan["pair_hint"]
+    if "mode" in plan: entry["mode"] = plan["mode"]
+    if "reason" in plan: entry["reason"] = plan["reason"]
+    # 附带当前一步要打的牌（方便前端直接取）
+    cur = current_discard(plan)
+    if cur is not None:
+        entry["discard"] = cur
+    return {"yaku": yaku_key, "data": entry}
+
+
+class RecommendEngine:
+    """
+    在线程池里计算打牌推荐，避免阻塞 mitmproxy 的事件循环。
+      - submit() 只做快照与投递，立即返回
+      - 新的摸牌事件到来时，旧任务作废：未开始的直接取消，已开始的结果丢弃
+      - 已启用的规划器（见 planner_registry）并行计算，各自有时间预算；
+        超时的先不放进本次结果，算完后再单独补发一条 late=True 的推荐
+      - 每个规划器同时只占一个线程：上一轮还没算完时，本轮排在它后面（只留最新的一份），
+        新的摸牌事件到来时还没开始的直接取消，慢的规划器不会挤掉快的
+      - 计算完成后通过 loop.call_soon_threadsafe 把 payload 交回调用方所在的事件循环
+    """
+
+    def __init__(
+            self,
+            max_workers: int = 1,
+            cache: Optional[RecommendCache] = None,
+            registry: PlannerRegistry = PLANNERS,
+            planner_workers: int = 4,
+    ):
+        # 调度线程只负责投递与收集，单线程 + 作废旧任务即可
+        self.cache = cache
+        self.registry = registry
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="recommend")
+        # 规划器线程：每个规划器最多占一个，线程数不少于规划器个数，快的不用排在慢的后面
+        self._planners = ThreadPoolExecutor(
+            max_workers=max(planner_workers, len(registry.enabled())), thread_name_prefix="planner",
+        )
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._pending: Optional[Future] = None
+        self._busy: Set[str] = set()  # 正在算的规划器名
+        self._queued: Dict[str, Tuple[Future, RecommendSnapshot, bytes]] = {}  # 名字 -> 等它让出线程的下一份
+        self._outs: List[Future] = []  # 当前这一轮各规划器的结果
+
+    def _check(self, seq: int) -> None:
+        if seq != self._seq:
+            raise _Stale()
+
+    def _run_planner(self, spec: PlannerSpec, snap: RecommendSnapshot, codes: bytes) -> dict:
+        return cached_plan(
+            self.cache, spec.name, spec.fn,
+            list(snap.hand_tiles), list(snap.wall_tiles), snap.deck_map, codes, snap.effect_ids,
+        )
+
+    def _fly(self, spec: PlannerSpec, out: Future, snap: RecommendSnapshot, codes: bytes) -> None:
+        # 在规划器线程上依次跑完排给这个规划器的任务，排空后才让出线程
+        while True:
+            if out.set_running_or_notify_cancel():
+                try:
+                    out.set_result(self._run_planner(spec, snap, codes))
+                except Exception as e:
+                    out.set_exception(e)
+            with self._lock:
+                nxt = self._queued.pop(spec.name, None)
+                if nxt is None:
+                    self._busy.discard(spec.name)
+                    return
+            out, snap, codes = nxt
+
+    def _start(self, spec: PlannerSpec, snap: RecommendSnapshot, codes: bytes, seq: Optional[int]) -> Future:
+        out: Future = Future()
+        with self._lock:
+            if seq is not None and seq != self._seq:
+                out.cancel()
+                return out
+            self._outs.append(out)
+            if spec.name in self._busy:
+                old = self._queued.pop(spec.name, None)
+                if old is not None:
+                    old[0].cancel()
+                self._queued[spec.name] = (out, snap, codes)
+                return out
+            self._busy.add(spec.name)
+        self._planners.submit(self._fly, spec, out, snap, codes)
+        return out
+
+    def _cancel_planners(self) -> None:
+        # 调用方持有 self._lock；已经在算的取消不了，让它算完
+        for out in self._outs:
+            out.cancel()
+        self._outs = []
+        self._queued.clear()
+
+    def compute(
+            self,
+            snap: RecommendSnapshot,
+            seq: Optional[int] = None,
+            on_late: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        并行跑所有已启用的规划器，按各自预算收集结果。
+        超出预算的规划器不出现在返回值里；若给了 on_late，它算完后以单条 payload 回调。
+        """
+        codes = snap.codes or encode_deck(snap.deck_map)
+        started = time.monotonic()
+        futs = [(spec, self._start(spec, snap, codes, seq)) for spec in self.registry.enabled()]
+
+        entries: List[dict] = []
+        late: List[Tuple[PlannerSpec, Future]] = []
+        for spec, fut in futs:
+            remaining = spec.budget_ms / 1000 - (time.monotonic() - started)
+            try:
+                plan = fut.result(timeout=max(0.0, remaining))
+            except FutureTimeout:
+                logger.warning(f"planner {spec.name} over budget ({spec.budget_ms} ms); sending partial result")
+                late.append((spec, fut))
+                continue
+            except CancelledError:
+                # 更新的摸牌事件已经到了
+                continue
+            except Exception as e:
+                logger.opt(exception=e).error(f"planner {spec.name} failed")
+                continue
+            entries.append(wrap_entry(spec.name, plan))
+        if seq is not None: self._check(seq)
+
+        if on_late is not None:
+            for spec, fut in late:
+                fut.add_done_callback(lambda f, name=spec.name: self._deliver_late(name, f, seq, on_late))
+        return {"type": "discard_recommendation", "data": entries}
+
+    def _deliver_late(self, name: str, fut: Future, seq: Optional[int], on_late) -> None:
+        if fut.cancelled() or fut.exception() is not None:
+            return
+        if seq is not None and seq != self._seq:
+            return
+        on_late({"type": "discard_recommendation", "data": [wrap_entry(name, fut.result())], "late": True})
+
+    def submit(
+            self,
+            snap: RecommendSnapshot,
+            on_done: Callable[[Dict[str, Any]], None],
+            loop: Optional[asyncio.AbstractEventLoop] = None,
+    ) -> int:
+        """
+        投递一次推荐计算；返回本次任务的序号。
+        on_done(payload) 在 loop 上执行（不传 loop 则在工作线程里直接回调）。
+        超预算的规划器算完后会再以 late=True 的 payload 调一次 on_done。
+        """
+
+        def _post(payload: Dict[str, Any]) -> None:
+            if loop is None:
+                on_done(payload)
+                return
+            try:
+                loop.call_soon_threadsafe(on_done, payload)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            if self._pending is not None:
+                self._pending.cancel()
+            self._cancel_planners()
+            fut = self._pool.submit(self.compute, snap, seq, _post)
+            self._pending = fut
+
+        def _done(f: Future):
+            if f.cancelled():
+                return
+            exc = f.exception()
+            if isinstance(exc, _Stale):
+                logger.debug(f"recommendation #{seq} superseded")
+                return
+            if exc is not None:
+                logger.opt(exception=exc).error("recommendation failed")
+                return
+            if seq != self._seq:
+                logger.debug(f"recommendation #{seq} finished but superseded")
+                return
+            _post(f.result())
+
+        fut.add_done_callback(_done)
+        return seq
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._seq += 1
+            if self._pending is not None:
+                self._pending.cancel()
+                self._pending = None
+            self._cancel_planners()
+
+    def shutdown(self) -> None:
+        self.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._planners.shutdown(wait=False, cancel_futures=True)
+
+
+def pick_best_plan(entries: List[dict]) -> Optional[dict]:
+    """在各役的 plan 中取摸牌数最少的一条（draws_needed 为空视为无穷大）"""
+    plan_candidates = [
+        e for e in entries
+        if e["data"].get("status") == "plan" and isinstance(e["data"].get("discards"), list) and e["data"]["discards"]
+    ]
+    if not plan_candidates:
+        return None
+    plan_candidates.sort(
+        key=lambda e: (e["data"].get("draws_needed") if e["data"].get("draws_needed") is not None else 10 ** 9)
+    )
+    return plan_candidates[0]
@@ -1,207 +1,198 @@
 from collections import OrderedDict
-from itertools import combinations
-from typing import List, Counter, Optional, Dict, Tuple
+from typing import List, Optional, Dict, Tuple
+
+from backend.autorun.util.planner_registry import register_planner
+from backend.model.tiles import JOKER, PIN_RANK, RED, encode_deck
+
+_BD = -1  # 癞子的点数标记；0 表示非饼子
+
+# 牌码 -> 点数：饼子 1..9（0p → 5），非饼 0，癞子 _BD
+_RANK: List[int] = list(PIN_RANK)
+_RANK[JOKER] = _BD
+
+
+def _pinzu_deficit(cnt: List[int]) -> int:
+    """min_pinzu_deficit 的只求值版本（不构造方案），供逐前缀判定使用"""
+    a = [0] * 10
+    for r in range(1, 10):
+        c = cnt[r]
+        a[r] = 3 - c if c < 3 else 0
+    order = sorted(range(1, 10), key=a.__getitem__)
+    pre4 = a[order[0]] + a[order[1]] + a[order[2]] + a[order[3]]
+    pre3 = pre4 - a[order[3]]
+    pre5 = pre4 + a[order[4]]
+    top3, top4 = order[:3], order[:4]
+    best = 99
+    for p in range(1, 10):
+        c = cnt[p]
+        d_out = (2 - c if c < 2 else 0) + (pre5 - a[p] if p in top4 else pre4)
+        d_in = (5 - c if c < 5 else 0) + (pre4 - a[p] if p in top3 else pre3)
+        if d_out < best: best = d_out
+        if d_in < best: best = d_in
+    return best
+
+
+def min_pinzu_deficit(cnt: List[int]) -> Tuple[int, Tuple[int, ...], int]:
+    """
+    给定饼子计数向量 cnt（长度 10，cnt[1..9] 为各点数自然张数），
+    求组成“4 个不同点数的刻子 + 1 个雀头”所需的最少癞子数。
+    返回 (最少癞子数, 刻子点数(升序), 雀头点数)。
+
+    设 a[r]=max(0,3-c[r]) 为刻子缺口：
+      - 雀头不与刻子同点数：缺口 = max(0,2-c[p]) + (除 p 外 4 个最小的 a)
+      - 雀头与某刻子同点数：缺口 = max(0,5-c[p]) + (除 p 外 3 个最小的 a)
+    对 9 个雀头点数各算两种情况取最小（同缺口时取点数字典序最小的方案）。
+    """
+    a = [0] + [max(0, 3 - cnt[r]) for r in range(1, 10)]
+    order = sorted(range(1, 10), key=lambda r: (a[r], r))
+    pos = [0] * 10
+    pre = [0] * 10
+    for i, r in enumerate(order):
+        pos[r] = i
+        pre[i + 1] = pre[i] + a[r]
+    best = None
+    for p in range(1, 10):
+        # 除 p 外最小的 4 个 / 3 个刻子缺口：p 不在前 n 名时直接取前缀和，否则多取一名再扣掉 p
+        d_out = max(0, 2 - cnt[p]) + (pre[4] if pos[p] >= 4 else pre[5] - a[p])
+        d_in = max(0, 5 - cnt[p]) + (pre[3] if pos[p] >= 3 else pre[4] - a[p])
+        if best is not None and min(d_out, d_in) > best[0]:
+            continue
+        t4 = [r for r in order[:5] if r != p][:4]
+        t3 = [r for r in order[:4] if r != p][:3]
+        for d, trip in ((d_out, tuple(sorted(t4))), (d_in, tuple(sorted(t3 + [p])))):
+            key = (d, trip, p)
+            if best is None or key < best:
+                best = key
+    return best
 
 
 def plan_pure_pinzu_suu_ankou(
         hand_tiles: List[int],
         future_draw_ids: List[int],
         deck_map: "OrderedDict[int, str]",
+        codes: Optional[bytes] = None,
 ) -> Optional[Dict]:
     """
     规划：只追求【纯饼四暗刻】，bd 仅可当作任意饼子；0p 视为 5p，打 5p 时优先打 5p 而不是 0p。
     若无法在未来摸牌内达成，返回 None。
     返回的 discards 是【要打出去的牌 id 列表】（从当前这一步开始，直到自摸前一手）。
-    """
 
-    def face_of(i: int) -> str:
-        return deck_map[i]
-
-    def is_pinzu(face: str) -> bool:
-        # 仅 p 花色；0p 当 5p；bd 单独处理
-        return (len(face) == 2 and face.endswith("p")) or face == "0p"
-
-    def pin_rank(face: str) -> Optional[int]:
-        # 返回 1..9；0p → 5；非饼/癞子返回 None
-        if face == "0p":
-            return 5
-        if len(face) == 2 and face[1] == "p" and face[0].isdigit():
-            d = int(face[0])
-            if 1 <= d <= 9:
-                return d
-        return None
-
-    def normalize_pin(face: str) -> Optional[str]:
-        # 统一饼子牌面：'0p' 统一为 '5p'
-        r = pin_rank(face)
-        return f"{r}p" if r is not None else None
-
-    def count_pin_and_bd(ids: List[int]) -> Tuple[Counter, int, Counter]:
-        """
-        统计：各饼子点数的自然张数（'1p'..'9p'），以及 bd 数量。
-        同时返回 0p/5p 的来源计数（用于丢牌时优先打 5p 而不是 0p）。
-        """
-        pin_counter = Counter()
-        five_sources = Counter()  # {"5p": 非红五自然5p数量, "0p": 红五数量}
-        bd_cnt = 0
+    全程使用 9 槽整数计数向量：牌山前缀逐张累加，每个前缀用 min_pinzu_deficit 做 O(1) 判定。
+    codes 为 GameState.tile_codes（tile id -> 牌码）；不传则由 deck_map 现算。
+    """
+    if codes is None:
+        codes = encode_deck(deck_map)
+    rank_of: Dict[int, int] = {}
+    for i in hand_tiles:
+        rank_of[i] = _RANK[codes[i]]
+    for i in future_draw_ids:
+        rank_of[i] = _RANK[codes[i]]
+
+    def count(ids) -> Tuple[List[int], int]:
+        c = [0] * 10
+        bd = 0
         for i in ids:
-            f = face_of(i)
-            if f == "bd":
-                bd_cnt += 1
-            else:
-                r = pin_rank(f)
-                if r is not None:
-                    if f == "0p":
-                        pin_counter["5p"] += 1
-                        five_sources["0p"] += 1
-                    else:
-                        norm = normalize_pin(f)
-                        pin_counter[norm] += 1
-                        if norm == "5p":
-                            five_sources["5p"] += 1
-        return pin_counter, bd_cnt, five_sources
-
-    def available_after_k(hand_ids: List[int], k: int) -> Tuple[Counter, int, Counter]:
-        pool = hand_ids + future_draw_ids[:k]
-        return count_pin_and_bd(pool)
-
-    def exists_pure_pinzu_suuankou(pin_counter: Counter, bd_cnt: int) -> Optional[Dict]:
-        """
-        给定“可用池”（当前 + 前 k 摸），判断是否存在纯饼四暗刻（4刻 + 1雀头）目标。
-        只从饼子里选；bd 只能补到饼子。
-        返回一个 dict:
-          {
-            "need": {"1p":3, "3p":3, "7p":3, "9p":3, "5p":2},  # 例
-            "bd_used": N,
-          }
-        若不可行，返回 None。
-        """
-        ranks = [f"{d}p" for d in range(1, 10)]
-
-        # 选择 4 个不同的刻子点数
-        for triplet_ranks in combinations(ranks, 4):
-            # 雀头可以与刻子点数重复（需要 5 张该点数；bd 可补）
-            for pair_r in ranks:
-                need = Counter()
-                for tr in triplet_ranks:
-                    need[tr] += 3
-                need[pair_r] += 2
-
-                # 仅使用饼子与 bd 补足
-                deficit = 0
-                for r in ranks:
-                    have = pin_counter.get(r, 0)
-                    req = need.get(r, 0)
-                    if req > have:
-                        deficit += (req - have)
-
-                if deficit <= bd_cnt:
-                    return {"need": need, "bd_used": deficit}
-        return None
-
+            r = rank_of[i]
+            if r == _BD:
+                bd += 1
+            elif r:
+                c[r] += 1
+        return c, bd
+
+    # 逐步加入牌山前缀，找到最早可行的 k
+    pin_cnt, bd_cnt = count(hand_tiles)
+    usable = sum(pin_cnt) + bd_cnt  # 饼子 + 癞子不足 14 张时必然不可行
     k_found = None
     target = None
     for k in range(0, len(future_draw_ids) + 1):
-        pin_cnt, bd_cnt, _ = available_after_k(hand_tiles, k)
-        tgt = exists_pure_pinzu_suuankou(pin_cnt, bd_cnt)
-        if tgt is not None:
+        if k:
+            r = rank_of[future_draw_ids[k - 1]]
+            if r == _BD:
+                bd_cnt += 1
+            elif r:
+                pin_cnt[r] += 1
+            if r:
+                usable += 1
+        if usable >= 14 and _pinzu_deficit(pin_cnt) <= bd_cnt:
             k_found = k
-            target = tgt
+            _, trip, pair = min_pinzu_deficit(pin_cnt)
+            target = (trip, pair)
             break
 
     if target is None:
         return None
 
-    pin_all, bd_all, five_src_all = available_after_k(hand_tiles, k_found)
-    need = target["need"].copy()
-    nat_need = Counter()
-    for r in list(need.keys()):
-        use_nat = min(need[r], pin_all.get(r, 0))
-        nat_need[r] += use_nat
-        need[r] -= use_nat
+    need = [0] * 10
+    for r in target[0]:
+        need[r] += 3
+    need[target[1]] += 2
+    pin_all = pin_cnt
+    nat_need = [min(need[r], pin_all[r]) for r in range(10)]
 
     discards: List[int] = []
     cur_ids = list(hand_tiles)
 
-    def still_feasible_after_discard(discard_id: int, future_rest_ids: List[int]) -> bool:
-        # 丢掉 discard_id 后，看“当前剩余 + 未来剩余”是否仍能满足 nat_need + bd 补足总目标
-        tmp_ids = [x for x in cur_ids if x != discard_id]  # 移除一个该 id
-        pin_c, bd_c, _ = count_pin_and_bd(tmp_ids + future_rest_ids)
-
-        for r in nat_need:
-            if pin_c.get(r, 0) < nat_need[r]:
-                return False
-
-        total_need = target["need"].copy()
-        deficit = 0
-        for r in [f"{d}p" for d in range(1, 10)]:
-            have = pin_c.get(r, 0)
-            req = total_need.get(r, 0)
-            if have < req:
-                deficit += (req - have)
-        return deficit <= bd_c
+    def pick_discard(future_rest_ids: List[int]) -> int:
+        # “当前剩余 + 未来剩余”的计数只算一次，逐个候选只做 O(9) 的增减
+        pool_c, pool_bd = count(cur_ids + future_rest_ids)
 
-    def discard_score(tile_id: int, future_rest_ids: List[int]) -> Tuple[int, int, int, int]:
-        f = face_of(tile_id)
-        # 非饼 & 非 bd：最优先丢
-        if f != "bd" and not is_pinzu(f):
-            return (0, 0, 0, tile_id)
+        base_ok = all(pool_c[r] >= nat_need[r] for r in range(1, 10))
+        base_deficit = sum(need[r] - pool_c[r] for r in range(1, 10) if pool_c[r] < need[r])
 
-        if f == "bd":
-            return (3, 0, 0, tile_id)
-
-        r = normalize_pin(f)  # '1p'..'9p'
-        need_total = target["need"].get(r, 0)
-
-        cur_pin_counts, _, cur_five_src = count_pin_and_bd(cur_ids)
-        fut_pin_counts, _, _ = count_pin_and_bd(future_rest_ids)
-        naturals_total = cur_pin_counts.get(r, 0) + fut_pin_counts.get(r, 0)
-
-        over = max(0, naturals_total - need_total)
-        # 基础分：越“超编”越该丢
-        base = 1 if over > 0 else 2
-
-        is_five = (r == "5p")
-        is_red = (f == "0p")
-        red_bias = 1 if (is_five and is_red) else 0
-
-        # 再给一个稳定 tie-breaker
-        return (base, red_bias, 0 if r else 1, tile_id)
-
-    if k_found > 0:
-        future_rest = future_draw_ids[:k_found]
-        candidates = [x for x in set(cur_ids) if still_feasible_after_discard(x, future_rest)]
+        def still_feasible_after_discard(discard_id: int) -> bool:
+            # 丢掉一张只影响它自己那一格：缺口至多 +1
+            if not base_ok:
+                return False
+            r0 = rank_of[discard_id]
+            if r0 == _BD:
+                return base_deficit <= pool_bd - 1
+            if r0 == 0:
+                return base_deficit <= pool_bd
+            have = pool_c[r0] - 1
+            if have < nat_need[r0]:
+                return False
+            return base_deficit + (1 if have < need[r0] else 0) <= pool_bd
+
+        def discard_score(tile_id: int) -> Tuple[int, int, int, int]:
+            r = rank_of[tile_id]
+            # 非饼 & 非 bd：最优先丢
+            if r == 0:
+                return (0, 0, 0, tile_id)
+            if r == _BD:
+                return (3, 0, 0, tile_id)
+            over = max(0, pool_c[r] - need[r])
+            # 基础分：越“超编”越该丢
+            base = 1 if over > 0 else 2
+            red_bias = 1 if codes[tile_id] & RED else 0
+            # 再给一个稳定 tie-breaker
+            return (base, red_bias, 0, tile_id)
+
+        candidates = [x for x in set(cur_ids) if still_feasible_after_discard(x)]
         if not candidates:
             # 理论上不会发生：因为整体是可行的
             candidates = list(set(cur_ids))
+        return min(candidates, key=discard_score)
 
-        best = min(candidates, key=lambda t: discard_score(t, future_rest))
+    if k_found > 0:
+        best = pick_discard(future_draw_ids[:k_found])
         discards.append(best)
         cur_ids.remove(best)  # 移除一个 best
 
     for j in range(k_found):
-        draw_id = future_draw_ids[j]
-        cur_ids.append(draw_id)
-        future_rest = future_draw_ids[j + 1:k_found]
+        cur_ids.append(future_draw_ids[j])
 
         if j == k_found - 1:
             break
 
         # 选一张要丢的，保持“仍可达成目标”
-        candidates = [x for x in set(cur_ids) if still_feasible_after_discard(x, future_rest)]
-        if not candidates:
-            # 兜底
-            candidates = list(set(cur_ids))
-
-        best = min(candidates, key=lambda t: discard_score(t, future_rest))
+        best = pick_discard(future_draw_ids[j + 1:k_found])
         discards.append(best)
         cur_ids.remove(best)
 
     # 生成解释性的 target14
     target_face = []
     for d in range(1, 10):
-        r = f"{d}p"
-        target_face += [r] * target["need"].get(r, 0)
+        target_face += [f"{d}p"] * need[d]
 
     return {
         "draws_needed": k_found,
@@ -210,8 +201,9 @@ def plan_pure_pinzu_suu_ankou(
     }
 
 
-def plan_pure_pinzu_suu_ankou_v2(hand_tiles, future_draw_ids, deck_map):
-    base = plan_pure_pinzu_suu_ankou(hand_tiles, future_draw_ids, deck_map)
+@register_planner("suuannkou", order=20)
+def plan_pure_pinzu_suu_ankou_v2(hand_tiles, future_draw_ids, deck_map, codes=None):
+    base = plan_pure_pinzu_suu_ankou(hand_tiles, future_draw_ids, deck_map, codes)
     if base is None:
         return {
             "status": "impossible",  # 无论怎么摸都做不成“纯饼四暗刻”
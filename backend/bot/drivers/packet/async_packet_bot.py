@@ -0,0 +1,58 @@
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from .packet_bot import PacketBot
+
+
+class AsyncPacketBot(PacketBot):
+    """
+    PacketBot 的协程版：动作方法（start_game、buy_pack、heartbeat……）的参数和校验都与 PacketBot 相同，
+    只是返回协程，需要 await：基类上标注的 -> Tuple[bool, str, Optional[dict]] 在这里实际是
+    -> Awaitable[Tuple[bool, str, Optional[dict]]]（动作方法只经 _inject_and_wait / _result 出结果，本类把这两个改成 async）。
+
+    等响应不占线程：inject_now 把帧交给 mitm 循环，响应到达时 WsAddon.websocket_message
+    经 call_soon_threadsafe 回填到调用方循环上的 future。互不依赖的请求可以 asyncio.gather 一起发，
+    例如 fetch_amulet_activity_data 和 heartbeat。
+    """
+
+    @staticmethod
+    async def _result(ok: bool, reason: str, resp: Optional[dict]) -> Tuple[bool, str, Optional[dict]]:
+        return ok, reason, resp
+
+    async def _inject_and_wait(
+            self, *, method: str, data: dict,
+            delay_sec: float, timeout: Optional[float] = None
+    ) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        addon = self.get_addon()
+        if not addon:
+            return False, "addon-or-flow-not-ready", None
+
+        peer_key = self._get_peer_key()
+        if not peer_key:
+            return False, "no-preferred-flow", None
+
+        # waiter 在帧交给 mitm 循环之前就登记好，快速返回的响应不会落空
+        ok, reason, msg_id, fut = addon.inject_req(
+            method=method,
+            data=data,
+            wait="async",
+            peer_key=peer_key,
+        )
+        if not ok or msg_id < 0:
+            return False, f"inject-failed:{reason}", None
+
+        to = float(delay_sec) if timeout is None else float(timeout)
+        timed_out = False
+        try:
+            resp = await asyncio.wait_for(fut, to)
+            return self._check_resp(resp, method, data)
+        except asyncio.TimeoutError:
+            timed_out = True
+            return False, "timeout", None
+        except Exception as e:
+            logger.exception(f"wait-error: {method} (id={msg_id})")
+            return False, f"wait-error:{e}", None
+        finally:
+            addon.discard_waiter_async(msg_id, fut, timed_out=timed_out)
@@ -8,6 +8,11 @@ from ...core.interfaces import GameBot
 
 
 class PacketBot(GameBot):
+    """
+    注入 Req 直接操作游戏。各动作方法只经 _inject_and_wait（发包等响应）或 _result（不发包的结果）返回，
+    标注的返回类型是本类的同步约定；AsyncPacketBot 覆盖这两个方法，同样的动作方法就返回可 await 的协程。
+    """
+
     def __init__(
             self,
             addon_getter: Callable[[], WsAddon],
@@ -78,6 +83,18 @@ class PacketBot(GameBot):
             logger.error("failed to get tile label")
             return "??"
 
+    @staticmethod
+    def _result(ok: bool, reason: str, resp: Optional[dict]) -> Tuple[bool, str, Optional[dict]]:
+        # 不发包就能给出的结果（阶段不对、金币不够……）；AsyncPacketBot 里包成协程
+        return ok, reason, resp
+
+    def _check_resp(self, resp: dict, method: str, data: dict) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        if resp.get('data', {}).get('error', None) is not None:
+            logger.error(f"error occurred: {resp.get('data', {}).get('error')}")
+            logger.debug(f"game state while error occurred: {self._state().to_dict()}, method: {method}, data: {data}")
+            return False, f"error code: {resp.get('data', {}).get('error', {}).get('code', 0)}", None
+        return True, "ok", resp
+
     def _inject_and_wait(
             self, *, method: str, data: dict,
             delay_sec: float, timeout: Optional[float] = None
@@ -90,30 +107,25 @@ class PacketBot(GameBot):
         if not peer_key:
             return False, "no-preferred-flow", None
 
-        ok, reason, msg_id = addon.inject_now(
+        # waiter 在帧交给 mitm 循环之前就登记好，快速返回的响应不会落空
+        ok, reason, msg_id, ev = addon.inject_req(
             method=method,
             data=data,
-            t="Req",
+            wait="sync",
             peer_key=peer_key,
         )
         if not ok or msg_id < 0:
             return False, f"inject-failed:{reason}", None
 
-        ev = addon.register_waiter_sync(msg_id)
         to = float(delay_sec) if timeout is None else float(timeout)
         try:
             signaled = ev.wait(to)
             if not signaled:
-                addon.discard_waiter_sync(msg_id)
+                addon.discard_waiter_sync(msg_id, timed_out=True)
                 return False, "timeout", None
-            resp = addon.pop_waiter_sync_resp(msg_id)
-            if resp.get('data', {}).get('error', None) is not None:
-                logger.error(f"error occurred: {resp.get('data', {}).get('error')}")
-                logger.debug(f"game state while error occurred: {self._state().to_dict()}, method: {method}, data: {data}")
-                return False, f"error code: {resp.get('data', {}).get('error', {}).get('code', 0)}", None
-            return True, "ok", resp
+            return self._check_resp(addon.pop_waiter_sync_resp(msg_id), method, data)
         except Exception as e:
-            logger.error(f"wait-error")
+            logger.exception(f"wait-error: {method} (id={msg_id})")
             addon.discard_waiter_sync(msg_id)
             return False, f"wait-error:{e}", None
 
@@ -128,28 +140,25 @@ class PacketBot(GameBot):
         )
 
     def heartbeat(self, delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
-        ok, reason, resp = self._inject_and_wait(
+        return self._inject_and_wait(
             method=".lq.Route.heartbeat",
             data={"delay": 100, "platform": 5, "networkQuality": 100, "noOperationCounter": 0},
             delay_sec=delay_sec
         )
-        return ok, reason, resp
 
     def giveup(self, delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
-        ok, reason, resp = self._inject_and_wait(
+        return self._inject_and_wait(
             method=".lq.Lobby.amuletActivityGiveup",
             data={"activityId": self.activity_id},
             delay_sec=delay_sec
         )
-        return ok, reason, resp
 
     def start_game(self, delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
-        ok, reason, resp = self._inject_and_wait(
+        return self._inject_and_wait(
             method=".lq.Lobby.amuletActivityStartGame",
             data={"activityId": self.activity_id},
             delay_sec=delay_sec
         )
-        return ok, reason, resp
 
     def op_tsumo(self, delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
         t = self.op_code.get("tsumo")
@@ -157,9 +166,8 @@ class PacketBot(GameBot):
             raise NotImplementedError("PacketBot.op_tsumo: no op_code 'tsumo'")
         if not self._ops_allow(t):
             logger.error("gamestate disallow tsumo")
-            return False, "gamestate disallow discard", None
-        ok, reason, resp = self._operate(pkt_type=t, tile_list=[], delay_sec=delay_sec)
-        return ok, reason, resp
+            return self._result(False, "gamestate disallow discard", None)
+        return self._operate(pkt_type=t, tile_list=[], delay_sec=delay_sec)
 
     def op_skip_change(self, delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
         t = self.op_code.get("skip_replace")
@@ -167,9 +175,8 @@ class PacketBot(GameBot):
             raise NotImplementedError("PacketBot.op_skip_replace: no op_code 'skip_replace'")
         if not self._ops_allow(t):
             logger.error("gamestate disallow skip-replace")
-            return False, "gamestate disallow discard", None
-        ok, reason, resp = self._operate(pkt_type=t, tile_list=[], delay_sec=delay_sec)
-        return ok, reason, resp
+            return self._result(False, "gamestate disallow discard", None)
+        return self._operate(pkt_type=t, tile_list=[], delay_sec=delay_sec)
 
     def op_change(self, tile_ids: List[int], delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
         t = self.op_code.get("replace")
@@ -177,9 +184,8 @@ class PacketBot(GameBot):
             raise NotImplementedError("PacketBot.op_replace: no op_code 'replace'")
         if not self._ops_allow(t):
             logger.error("gamestate disallow replace")
-            return False, "gamestate disallow discard", None
-        ok, reason, resp = self._operate(pkt_type=t, tile_list=tile_ids, delay_sec=delay_sec)
-        return ok, reason, resp
+            return self._result(False, "gamestate disallow discard", None)
+        return self._operate(pkt_type=t, tile_list=tile_ids, delay_sec=delay_sec)
 
     def discard_by_tile_id(
             self,
@@ -190,112 +196,101 @@ class PacketBot(GameBot):
         t = self.op_code.get("discard", 1)
         if not self._ops_allow(t):
             logger.error("gamestate disallow discard")
-            return False, "gamestate disallow discard", None
-        ok, reason, resp = self._operate(pkt_type=t, tile_list=[tile_id], delay_sec=delay_sec)
-        return ok, reason, resp
+            return self._result(False, "gamestate disallow discard", None)
+        return self._operate(pkt_type=t, tile_list=[tile_id], delay_sec=delay_sec)
 
     def select_free_effect(self, selected_id: int, delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
         st = self._state()
         if not self._check_stage(1):
-            return False, "in the illegal stage", None
+            return self._result(False, "in the illegal stage", None)
         if any(effect.get("id") == selected_id for effect in st.candidate_effect_list):
-            ok, reason, resp = self._inject_and_wait(method=".lq.Lobby.amuletActivitySelectFreeEffect", data={"activityId": self.activity_id, "selectedId": selected_id}, delay_sec=delay_sec)
-            return ok, reason, resp
-        return False, "unknown id", None
+            return self._inject_and_wait(method=".lq.Lobby.amuletActivitySelectFreeEffect", data={"activityId": self.activity_id, "selectedId": selected_id}, delay_sec=delay_sec)
+        return self._result(False, "unknown id", None)
 
     def select_reward_effect(self, selected_id: int, delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
         st = self._state()
         if not self._check_stage(7):
-            return False, "in the illegal stage", None
+            return self._result(False, "in the illegal stage", None)
         if int(selected_id) == 0 or any(effect.get("id") == selected_id for effect in st.candidate_effect_list):
-            ok, reason, resp = self._inject_and_wait(method=".lq.Lobby.amuletActivitySelectRewardPack", data={"activityId": self.activity_id, "id": selected_id}, delay_sec=delay_sec)
-            return ok, reason, resp
-        return False, "unknown id", None
+            return self._inject_and_wait(method=".lq.Lobby.amuletActivitySelectRewardPack", data={"activityId": self.activity_id, "id": selected_id}, delay_sec=delay_sec)
+        return self._result(False, "unknown id", None)
 
     def select_effect(self, selected_id: int, delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
         st = self._state()
         if not self._check_stage(5):
-            return False, "in the illegal stage", None
+            return self._result(False, "in the illegal stage", None)
         if int(selected_id) == 0:
             logger.warning("select_effect: selected_id is 0")
         if int(selected_id) == 0 or any(effect.get("id") == selected_id for effect in st.candidate_effect_list):
-            ok, reason, resp = self._inject_and_wait(method=".lq.Lobby.amuletActivitySelectPack", data={"activityId": self.activity_id, "id": selected_id}, delay_sec=delay_sec)
-            return ok, reason, resp
-        return False, "unknown id", None
+            return self._inject_and_wait(method=".lq.Lobby.amuletActivitySelectPack", data={"activityId": self.activity_id, "id": selected_id}, delay_sec=delay_sec)
+        return self._result(False, "unknown id", None)
 
     def buy_pack(self, good_id: int, delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
         st = self._state()
         if not self._check_stage(4):
-            return False, "in the illegal stage", None
+            return self._result(False, "in the illegal stage", None)
         good = next((g for g in st.goods if g.get("id") == good_id and g.get("sold") is False), None)
         if good:
             if good.get("price", 0) <= st.coin:
-                ok, reason, resp = self._inject_and_wait(
+                return self._inject_and_wait(
                     method=".lq.Lobby.amuletActivityBuy",
                     data={"activityId": self.activity_id, "id": good_id},
                     delay_sec=delay_sec
                 )
-                return ok, reason, resp
-            return False, "coin not enough", None
-        return False, "unknown id", None
+            return self._result(False, "coin not enough", None)
+        return self._result(False, "unknown id", None)
 
     def refresh_shop(self, delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
         st = self._state()
         if not self._check_stage(4):
-            return False, "in the illegal stage", None
+            return self._result(False, "in the illegal stage", None)
         if st.coin >= st.refresh_price:
-            ok, reason, resp = self._inject_and_wait(method=".lq.Lobby.amuletActivityRefreshShop", data={"activityId": self.activity_id}, delay_sec=delay_sec)
-            return ok, reason, resp
-        return False, "coin not enough", None
+            return self._inject_and_wait(method=".lq.Lobby.amuletActivityRefreshShop", data={"activityId": self.activity_id}, delay_sec=delay_sec)
+        return self._result(False, "coin not enough", None)
 
     def sell_effect(self, uid: int, delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
         st = self._state()
         if any(effect.get("uid") == uid for effect in st.effect_list):
-            ok, reason, resp = self._inject_and_wait(method=".lq.Lobby.amuletActivitySellEffect", data={"activityId": self.activity_id, "id": uid}, delay_sec=delay_sec)
-            return ok, reason, resp
-        return False, "unknown id", None
+            return self._inject_and_wait(method=".lq.Lobby.amuletActivitySellEffect", data={"activityId": self.activity_id, "id": uid}, delay_sec=delay_sec)
+        return self._result(False, "unknown id", None)
 
     def sort_effect(self, sorted_uid: List[int], delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
         st = self._state()
         try:
             cur_uids = [int(e.get("uid")) for e in (st.effect_list or []) if e.get("uid") is not None]
         except Exception:
-            return False, "bad-effect-list", None
+            return self._result(False, "bad-effect-list", None)
         if not cur_uids:
-            return False, "no-effects", None
+            return self._result(False, "no-effects", None)
         try:
             in_uids = [int(x) for x in (sorted_uid or [])]
         except Exception:
-            return False, "sorted_uid-not-integers", None
+            return self._result(False, "sorted_uid-not-integers", None)
         if len(in_uids) != len(set(in_uids)):
-            return False, "sorted_uid-has-duplicates", None
+            return self._result(False, "sorted_uid-has-duplicates", None)
         if set(in_uids) != set(cur_uids):
-            return False, "sorted_uid-mismatch-current-effects", None
+            return self._result(False, "sorted_uid-mismatch-current-effects", None)
         if in_uids == cur_uids:
-            return True, "already sorted", None
-        ok, reason, resp = self._inject_and_wait(
+            return self._result(True, "already sorted", None)
+        return self._inject_and_wait(
             method=".lq.Lobby.amuletActivityEffectSort",
             data={"activityId": self.activity_id, "sortedId": in_uids},
             delay_sec=delay_sec
         )
-        return ok, reason, resp
 
     def end_shopping(self, delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
         if not self._check_stage(4):
-            return False, "in the illegal stage", None
-        ok, reason, resp = self._inject_and_wait(method=".lq.Lobby.amuletActivityEndShopping", data={"activityId": self.activity_id}, delay_sec=delay_sec)
-        return ok, reason, resp
+            return self._result(False, "in the illegal stage", None)
+        return self._inject_and_wait(method=".lq.Lobby.amuletActivityEndShopping", data={"activityId": self.activity_id}, delay_sec=delay_sec)
 
     def next_level(self, delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
         if not self._check_stage(6):
-            return False, "in the illegal stage", None
-        ok, reason, resp = self._inject_and_wait(method=".lq.Lobby.amuletActivityUpgrade", data={"activityId": self.activity_id}, delay_sec=delay_sec)
-        return ok, reason, resp
+            return self._result(False, "in the illegal stage", None)
+        return self._inject_and_wait(method=".lq.Lobby.amuletActivityUpgrade", data={"activityId": self.activity_id}, delay_sec=delay_sec)
 
     def fetch_amulet_activity_data(self, delay_sec: float = 3) -> Tuple[bool, str, Optional[dict]]:
-        ok, reason, resp = self._inject_and_wait(
+        return self._inject_and_wait(
             method=".lq.Lobby.fetchAmuletActivityData",
             data={"activityId": self.activity_id},
             delay_sec=delay_sec
-        )
-        return ok, reason, resp
\ No newline at end of file
+        )
\ No newline at end of file
@@ -1,7 +1,6 @@
 from typing import Dict, List, Tuple
 
-# 花色与权重：m=万, p=筒, s=索, z=字；bd(癞子)最左且不可打出
-_SUIT_WEIGHT = {"bd": -1, "m": 0, "p": 1, "s": 2, "z": 3}
+from backend.model.tiles import face_sort_key
 
 
 def _tile_key(label: str) -> Tuple[int, int]:
@@ -12,38 +11,9 @@ def _tile_key(label: str) -> Tuple[int, int]:
       - "1p..9p"，'0p' 在 4 之后
       - "1s..9s"，'0s' 在 4 之后
       - "1z..7z"  字牌
-    返回 (大类序, 同类内序)
+    返回 (大类序, 同类内序)；未知格式放到最后。排序键按牌码预先建表，见 backend.model.tiles。
     """
-    if label == "bd":
-        return _SUIT_WEIGHT["bd"], -999
-
-    if len(label) != 2:
-        # 容错：未知格式，放到最后
-        return 999, 999
-
-    rank_ch, suit = label[0], label[1]
-    if suit not in ("m", "p", "s", "z"):
-        return 999, 999
-
-    suit_w = _SUIT_WEIGHT[suit]
-
-    # 字牌：1z..7z
-    if suit == "z":
-        if rank_ch.isdigit():
-            r = int(rank_ch)
-            return suit_w, r
-        return suit_w, 99
-
-    # 数牌：1..9，红五 0*
-    if rank_ch == "0":
-        # 红五介于 4 与 5 之间，设为 45
-        r = 45
-    elif rank_ch.isdigit():
-        r = int(rank_ch) * 10  # *10 让 45 能插在 40 和 50 之间
-    else:
-        r = 999
-
-    return suit_w, r
+    return face_sort_key(label)
 
 
 def sort_hand_labels(hand_labels: List[str]) -> List[str]:
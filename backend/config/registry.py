@@ -20,6 +20,7 @@ def build_manager(conf_dir: Path) -> ConfigManager:
         ConfigTable("general", file=conf_dir / "general.json")
         .add("debug", False, desc="调试模式", kind="bool")
         .add("error_code_test", 0, desc="错误测试", kind="number")
+        .add("record_frames", False, desc="录制原始帧（用于离线回放）", kind="bool")
     )
     mgr.add_table(
         ConfigTable("backend", file=conf_dir / "backend.json")
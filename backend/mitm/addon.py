@@ -1,13 +1,16 @@
 import json
 import threading
-from typing import Callable, Tuple, Any, Dict, List, Optional
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Tuple, Any, Dict, FrozenSet, List, Optional
 import asyncio
 
 from loguru import logger
 from mitmproxy import http, ctx
 
-import backend.app
+from backend import startup
 from backend.mitm.codec import LiqiCodec
+from backend.mitm.recorder import FrameRecorder
 
 HookFn = Callable[[Dict], Tuple[str, Any]]
 
@@ -27,6 +30,13 @@ ignore_methods = [
 ]
 
 
+def _app():
+    # 用到时才导入：backend.app → autorun.runner → packet_bot 会回头导入本模块，顶层导入会形成循环，
+    # 只用 codec 的脚本也不必带起整个后端
+    import backend.app
+    return backend.app
+
+
 def _peer_key_ws(flow: http.HTTPFlow) -> str:
     try:
         cip = flow.client_conn.address[0]
@@ -36,11 +46,21 @@ def _peer_key_ws(flow: http.HTTPFlow) -> str:
         return "n/a"
 
 
+def _set_result(fut: asyncio.Future, resp) -> None:
+    if not fut.done():  # 调用方可能已超时取消
+        fut.set_result(resp)
+
+
 class WsAddon:
     def __init__(self, codec: LiqiCodec):
-        self.codec = codec
+        self.codec = codec  # 模板：各连接的 codec 由它 fork，自身只用于不属于任何连接的组帧
+        self._codecs: Dict[str, LiqiCodec] = {}  # flow.id -> 该连接的 codec（Req/Res id 配对状态互不干扰）
+        self._codecs_lock = threading.Lock()
         self.on_outbound: Optional[HookFn] = None
         self.on_inbound: Optional[HookFn] = None
+        # hook 关心的 method（由 MitmBridge.set_hooks 预先给出）；None = 每帧都调用 hook
+        self.outbound_methods: Optional[FrozenSet[str]] = None
+        self.inbound_methods: Optional[FrozenSet[str]] = None
         self.subscribers: List[Callable[[Dict], None]] = []
         self._flows: Dict[str, http.HTTPFlow] = {}  # peer_key -> flow
         self.last_flow: Optional[http.HTTPFlow] = None  # 最近一次触达的 flow
@@ -48,9 +68,15 @@ class WsAddon:
         self._waiters: Dict[int, asyncio.Future] = {}
         self._waiters_sync: dict[int, dict] = {}
         self._waiters_lock = threading.Lock()
+        self._inject_lock = threading.Lock()  # 分配 id、组帧登记、登记 waiter 三步一起做
+        self._inflight: "OrderedDict[int, float]" = OrderedDict()  # 带 waiter 注入的 Req：id -> 发出时刻
+        self._waiter_stats: Counter = Counter()  # registered / resolved / timeout / late
         self.master = None
         self.preferred_flow: Optional[http.HTTPFlow] = None
         self.preferred_peer_key: Optional[str] = None
+        self.recorder: Optional[FrameRecorder] = None  # general.record_frames 打开时录制原始帧
+        self._held: set = set()  # 等熔断确认的 task（"hold"）
+        self._released: Dict[str, List[bytes]] = {}  # flow.id -> 确认后重新发出的帧（回到这里时不再处理）
 
         global WS_ADDON_INSTANCE
         WS_ADDON_INSTANCE = self
@@ -58,6 +84,11 @@ class WsAddon:
     def set_master(self, master):
         self.master = master
 
+    def running(self):
+        # mitmproxy 在各监听端口就绪后调用：记下“到开始监听”的耗时，再在后台导入 schema，第一帧就不必等
+        startup.mark("proxy listening")
+        threading.Thread(target=self.codec.warm_up, name="codec-warm-up", daemon=True).start()
+
     def register_waiter_sync(self, msg_id: int):
         ev = threading.Event()
         with self._waiters_lock:
@@ -77,9 +108,103 @@ class WsAddon:
             item = self._waiters_sync.pop(msg_id, None)
             return None if item is None else item.get("resp")
 
-    def discard_waiter_sync(self, msg_id: int):
+    def discard_waiter_sync(self, msg_id: int, timed_out: bool = False):
+        with self._waiters_lock:
+            if self._waiters_sync.pop(msg_id, None) is not None and timed_out:
+                self._waiter_stats["timeout"] += 1
+
+    def register_waiter_async(self, msg_id: int) -> asyncio.Future:
+        # future 建在调用方（AsyncPacketBot 所在的 UI 循环）上，响应到达时从 mitm 循环 call_soon_threadsafe 回填
+        fut = asyncio.get_running_loop().create_future()
+        with self._waiters_lock:
+            self._waiters[msg_id] = fut
+        return fut
+
+    def discard_waiter_async(self, msg_id: int, fut: asyncio.Future, timed_out: bool = False):
+        with self._waiters_lock:
+            if self._waiters.get(msg_id) is fut:
+                del self._waiters[msg_id]
+                if timed_out:
+                    self._waiter_stats["timeout"] += 1
+
+    def resolve_waiters(self, msg_id: int, resp):
+        """唤醒等这个 id 的调用方：PacketBot 的 Event 与 AsyncPacketBot 的 future"""
+        with self._waiters_lock:
+            sent = self._inflight.pop(msg_id, None)
+            item = self._waiters_sync.get(msg_id)
+            fut = self._waiters.pop(msg_id, None)
+            woke = fut is not None or (item is not None and not item["ev"].is_set())
+            if sent is not None:
+                self._waiter_stats["resolved" if woke else "late"] += 1
+        if sent is not None and not woke:
+            # 自己注入的请求，响应回来时已经没人等（调用方超时放弃了）
+            logger.warning(f"[waiter] late response id={msg_id} after {(time.monotonic() - sent) * 1e3:.0f} ms")
+        if item is not None:
+            item["resp"] = resp
+            item["ev"].set()
+        if fut is not None:
+            try:
+                fut.get_loop().call_soon_threadsafe(_set_result, fut, resp)
+            except RuntimeError:
+                pass  # 调用方的循环已关闭
+
+    def waiter_stats(self) -> Dict[str, int]:
         with self._waiters_lock:
-            self._waiters_sync.pop(msg_id, None)
+            return {
+                "registered": self._waiter_stats["registered"],
+                "resolved": self._waiter_stats["resolved"],
+                "timeout": self._waiter_stats["timeout"],
+                "late": self._waiter_stats["late"],
+                "waiting": len(self._waiters_sync) + len(self._waiters),
+            }
+
+    def _register_waiter(self, msg_id: int, wait: str):
+        waiter = self.register_waiter_async(msg_id) if wait == "async" else self.register_waiter_sync(msg_id)
+        with self._waiters_lock:
+            self._inflight.pop(msg_id, None)
+            self._inflight[msg_id] = time.monotonic()
+            while len(self._inflight) > 1024:  # 一直没有响应的 id 不无限累积
+                self._inflight.popitem(last=False)
+            self._waiter_stats["registered"] += 1
+        return waiter
+
+    def _discard_waiter(self, msg_id: int, waiter) -> None:
+        with self._waiters_lock:
+            self._inflight.pop(msg_id, None)
+        if isinstance(waiter, asyncio.Future):
+            self.discard_waiter_async(msg_id, waiter)
+        else:
+            self.discard_waiter_sync(msg_id)
+
+    def _sync_recorder(self) -> Optional[FrameRecorder]:
+        # 跟随配置开关：打开时新建一个录制文件，关闭时收尾
+        try:
+            enabled = bool(_app().MANAGER.get("general.record_frames"))
+        except Exception:
+            enabled = False
+        if enabled and self.recorder is None:
+            name = time.strftime("%Y%m%d_%H%M%S") + ".lqfr"
+            try:
+                self.recorder = FrameRecorder(_app().DATA_ROOT / "captures" / name)
+            except Exception as e:
+                logger.error(f"open frame recorder failed: {e}")
+        elif not enabled and self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        return self.recorder
+
+    def codec_for(self, flow: http.HTTPFlow) -> LiqiCodec:
+        # 同一台机器上的网页版与客户端 peer_key 相同，所以按 flow.id 而不是 peer_key 分
+        with self._codecs_lock:
+            codec = self._codecs.get(flow.id)
+            if codec is None:
+                codec = self._codecs[flow.id] = self.codec.fork()
+            return codec
+
+    def codec_stats(self) -> Dict[str, dict]:
+        with self._codecs_lock:
+            codecs = dict(self._codecs)
+        return {key: codec.req_id_stats() for key, codec in codecs.items()}
 
     def subscribe(self, cb: Callable[[Dict], None]):
         self.subscribers.append(cb)
@@ -108,8 +233,23 @@ class WsAddon:
 
         message = flow.websocket.messages[-1]
 
+        # 熔断确认放行后重新发出的原帧：第一次经过时已录制、解析、跑过 hook
+        if message.injected:
+            released = self._released.get(flow.id)
+            if released and message.content in released:
+                released.remove(message.content)
+                return
+
+        recorder = self._sync_recorder()
+        if recorder is not None:
+            try:
+                recorder.write(message.content, message.from_client, message.timestamp)
+            except Exception as e:
+                logger.error(f"record frame failed: {e}")
+
+        codec = self.codec_for(flow)
         try:
-            view = self.codec.parse_frame(message.content, message.from_client)
+            view = codec.parse_frame(message.content, message.from_client)
         except Exception as e:
             logger.error(
                 f"parse error for ws message from {flow.client_conn.address} -> "
@@ -140,7 +280,7 @@ class WsAddon:
                 logger.error(f"subscriber error: {e}")
 
         try:
-            if backend.app.MANAGER.get("general.debug"):
+            if _app().MANAGER.get("general.debug"):
                 if view.get('method') not in ignore_methods:
                     logger.debug(f"{'已发送' if message.from_client else '接收到'}：{view.get('method')} (id={view.get('id')})")
                     import json
@@ -161,24 +301,34 @@ class WsAddon:
         except Exception as e:
             logger.error(f"logging full message failed: {e}")
 
-        hook = self.on_outbound if message.from_client else self.on_inbound
+        # 不在 hook 关心范围内的帧直接放行：view.data 始终没人读，payload 也就不解码
+        if message.from_client:
+            hook, methods = self.on_outbound, self.outbound_methods
+        else:
+            hook, methods = self.on_inbound, self.inbound_methods
+        if methods is not None and view.get("method") not in methods:
+            hook = None
         action, payload = self._apply(hook, view)
 
         # 如果要 drop，先尝试唤醒 waiter 再返回，避免调用侧超时
         if action == "drop":
-            if (not message.from_client) and view.get("type") in ("Res", "Notify") and isinstance(view.get("id"), int):
+            if (not message.from_client) and flow is self.preferred_flow and view.get("type") in ("Res", "Notify") and isinstance(view.get("id"), int):
                 try:
-                    self.resolve_waiter_sync(int(view["id"]), view)
+                    self.resolve_waiters(int(view["id"]), view)
                 except Exception:
                     pass
             message.drop()
             logger.success(f"{'已发送' if message.from_client else '接收到'}(drop)：{view.get('method')}")
             return
 
+        if action == "hold" and payload is not None:
+            self._hold_message(flow, message, view, codec, payload)
+            return
+
         if action == "modify" and payload is not None:
             new_view = dict(view, data=payload)
             try:
-                message.content = self.codec.build_frame(new_view)
+                message.content = codec.build_frame(new_view)
                 view = new_view
                 logger.success(f"{'已发送' if message.from_client else '接收到'}(modify)：{new_view.get('method')}")
             except Exception as e:
@@ -187,18 +337,52 @@ class WsAddon:
         if action == "inject" and payload:
             for inj in payload:
                 try:
-                    inj_bytes = self.codec.build_frame(inj)
+                    inj_bytes = codec.build_frame(inj)
                     to_client = (inj["type"] in ("Notify", "Res"))
                     ctx.master.commands.call("inject.websocket", flow, to_client, inj_bytes, False)
                     logger.success(f"已注入：{inj.get('method')} -> {'client' if to_client else 'server'}")
                 except Exception as e:
                     logger.error(f"注入失败：{e}")
+        # 注入只发往 preferred_flow，waiter 也只认这条连接上的响应（别的连接可能正好用到同一个 id）
         try:
-            if (not message.from_client) and view.get("type") in ("Res", "Notify") and isinstance(view.get("id"), int):
-                self.resolve_waiter_sync(int(view["id"]), view)
+            if (not message.from_client) and flow is self.preferred_flow and view.get("type") in ("Res", "Notify") and isinstance(view.get("id"), int):
+                self.resolve_waiters(int(view["id"]), view)
         except Exception:
             pass
 
+    def _hold_message(self, flow: http.HTTPFlow, message, view, codec: LiqiCodec, wait: Callable):
+        """
+        先把这条消息扣下（drop），在后台等 wait() 的结果：True 原样重新发出，False/异常就此丢弃。
+        websocket_message 直接返回，同一连接上的心跳和其它消息照常转发，不会因为确认框卡住。
+        """
+        content, to_client = message.content, not message.from_client
+        method = view.get("method")
+        message.drop()
+        logger.info(f"等待熔断确认：{method} (id={view.get('id')})")
+
+        async def _decide():
+            try:
+                ok = bool(await wait())
+            except Exception:
+                logger.exception(f"熔断确认失败：{method}")
+                ok = False
+            if ok and flow.websocket is not None and flow.websocket.timestamp_end is None:
+                self._released.setdefault(flow.id, []).append(content)
+                try:
+                    self.master.commands.call("inject.websocket", flow, to_client, content, False)
+                    logger.success(f"熔断确认放行：{method}")
+                    return
+                except Exception as e:
+                    self._released.get(flow.id, []).remove(content)
+                    logger.error(f"熔断确认后重新发出失败：{e}")
+            logger.success(f"{'已发送' if not to_client else '接收到'}(drop)：{method}")
+            if view.get("type") == "Req" and isinstance(view.get("id"), int):
+                codec.discard_req(view["id"])  # 请求没发出去，不会有响应
+
+        task = asyncio.get_running_loop().create_task(_decide())
+        self._held.add(task)
+        task.add_done_callback(self._held.discard)
+
     def _pick_flow(self, peer_key: Optional[str]):
         if peer_key:
             return self._flows.get(peer_key)
@@ -211,8 +395,12 @@ class WsAddon:
         except Exception:
             peer_key = None
 
-        if peer_key and peer_key in self._flows:
+        if peer_key and self._flows.get(peer_key) is flow:
             self._flows.pop(peer_key, None)
+        with self._codecs_lock:
+            self._codecs.pop(flow.id, None)
+        self._client_last_req_id.pop(id(flow), None)
+        self._released.pop(flow.id, None)
 
         if getattr(self, "preferred_flow", None) is flow:
             self.preferred_flow = None
@@ -222,6 +410,9 @@ class WsAddon:
         if getattr(self, "last_flow", None) is flow:
             self.last_flow = None
 
+        if self.recorder is not None:
+            self.recorder.flush()
+
     def websocket_error(self, flow: http.HTTPFlow):
         self.websocket_end(flow)
 
@@ -237,12 +428,37 @@ class WsAddon:
         立即注入一条帧到当前/指定 flow：
           - t: "Req" | "Res" | "Notify"
           - method: 例如 ".lq.Lobby.amuletActivitySelectPack"
-          - data:   Protobuf 对应的 dict（由 codec.build_frame 负责序列化）
+          - data:   Protobuf 对应的 dict（由 codec.build_frame 负责序列化；Req 按模板拼帧并直接登记响应类型）
           - peer_key: "clientIP|serverHost"；不传则用最近活跃 flow
           - force_id: 可选，强制使用某个 msg_id（不传则用 last_req_id+偏移）
         返回: (ok: bool, detail: str, msg_id: int|-1)
         """
+        ok, detail, msg_id, _ = self._inject(method=method, data=data, t=t, force_id=force_id)
+        return ok, detail, msg_id
 
+    def inject_req(
+            self, *,
+            method: str,
+            data: dict,
+            wait: str = "sync",
+            peer_key: Optional[str] = None,
+    ) -> tuple[bool, str, int, Any]:
+        """
+        注入一条 Req 并等它的响应：id 分配、登记配对表和登记 waiter 在同一把锁里完成，之后才把帧交给 mitm 循环，
+        响应再快也不会赶在 waiter 之前到达。
+          - wait: "sync" 返回 threading.Event（PacketBot）；"async" 返回调用方循环上的 future（AsyncPacketBot）
+        返回: (ok, detail, msg_id, waiter)；失败时 waiter 为 None
+        """
+        return self._inject(method=method, data=data, t="Req", wait=wait)
+
+    def _inject(
+            self, *,
+            method: str,
+            data: dict,
+            t: str,
+            force_id: Optional[int] = None,
+            wait: Optional[str] = None,
+    ) -> tuple[bool, str, int, Any]:
         def _ctx(extra: str = "") -> str:
             pf = self.preferred_flow
             try:
@@ -260,46 +476,44 @@ class WsAddon:
         flow = self.preferred_flow
         if not flow or not getattr(flow, "websocket", None):
             logger.error(f"inject_now: no preferred websocket flow. {_ctx()}")
-            return False, "no-preferred-websocket-flow", -1
+            return False, "no-preferred-websocket-flow", -1, None
+
+        master = self.master
+        if not master or not getattr(master, "event_loop", None):
+            logger.error(f"inject_now: no master loop. {_ctx()}")
+            return False, "inject-failed:no-master-loop", -1, None
 
+        codec = self.codec_for(flow)
         inj = {"type": t, "method": method, "data": data}
         msg_id = -1
+        waiter = None
+
+        with self._inject_lock:
+            if t in ("Req", "Res"):
+                if force_id is not None:
+                    msg_id = int(force_id) & 0xFFFF
+                else:
+                    base = self._client_last_req_id.get(
+                        id(flow),
+                        getattr(codec, "_last_req_id", 0) or 0
+                    )
+                    # 紧挨客户端最近的 id 往下取；被占用（还在等响应）时由配对表给一个空闲 id
+                    msg_id = codec.allocate_req_id(int(base) - 1)
+                inj["id"] = msg_id
 
-        if t in ("Req", "Res"):
-            if force_id is not None:
-                msg_id = int(force_id) & 0xFFFF
-            else:
-                base = self._client_last_req_id.get(
-                    id(flow),
-                    getattr(self.codec, "_last_req_id", 0) or 0
-                )
-                candidate = (int(base) - 1) & 0xFFFF
-                busy = getattr(self.codec, "_res_map", {})
-                tries = 0
-                # 尽量避开当前“忙碌”的 id
-                while candidate in busy and tries < 16:
-                    candidate = (candidate - 1) & 0xFFFF
-                    tries += 1
-                msg_id = candidate
-            inj["id"] = msg_id
-
-        try:
-            inj_bytes = self.codec.build_frame(inj)
-        except Exception as e:
-            logger.exception("build-frame-failed")
-            logger.exception(f"inject_now: build-frame-failed. {_ctx()}")
-            return False, f"build-frame-failed: {e}", -1
-
-        try:
-            # 对“请求”必须用 from_client=True 才会登记 _res_map
-            self.codec.parse_frame(inj_bytes, from_client=(t == "Req"))
-        except Exception:
-            pass
+            try:
+                inj_bytes = codec.build_frame(inj)
+            except Exception as e:
+                logger.exception("build-frame-failed")
+                logger.exception(f"inject_now: build-frame-failed. {_ctx()}")
+                return False, f"build-frame-failed: {e}", -1, None
 
-        master = self.master
-        if not master or not getattr(master, "event_loop", None):
-            logger.error(f"inject_now: no master loop. {_ctx()}")
-            return False, "inject-failed:no-master-loop", -1
+            if t == "Res":
+                # 替服务端回了这个 id：它不再等响应
+                codec.discard_req(msg_id)
+            elif wait is not None:
+                # 帧还没交给 mitm 循环，waiter 一定先于响应登记
+                waiter = self._register_waiter(msg_id, wait)
 
         loop = master.event_loop
 
@@ -314,10 +528,14 @@ class WsAddon:
 
         try:
             loop.call_soon_threadsafe(_do_inject)
-            return True, "ok", msg_id
+            return True, "ok", msg_id, waiter
         except Exception as e:
             logger.error(f"inject_now: call_soon_threadsafe failed: {e}. {_ctx()}")
-            return False, f"inject-failed:{e}", -1
+            if waiter is not None:
+                self._discard_waiter(msg_id, waiter)
+            if t == "Req":
+                codec.discard_req(msg_id)
+            return False, f"inject-failed:{e}", -1, None
 
     _MAX_LOG_BODY = 64 * 1024  # 64 KB
 
@@ -7,6 +7,7 @@ from mitmproxy.tools.dump import DumpMaster
 
 from backend.mitm.addon import WsAddon
 from backend.mitm.codec import LiqiCodec
+from backend.mitm.pbconv import log_backend
 
 
 class MitmBridge:
@@ -55,6 +56,7 @@ class MitmBridge:
                 except Exception:
                     pass
 
+            log_backend()
             logger.info(f"MitmBridge starting on {self.host}:{self.port}")
 
             import contextlib, os
@@ -81,9 +83,12 @@ class MitmBridge:
     def on_event(self, fn: Callable[[Dict[str, Any]], None]):
         self._listeners.append(fn)
 
-    def set_hooks(self, on_outbound=None, on_inbound=None):
+    def set_hooks(self, on_outbound=None, on_inbound=None, outbound_methods=None, inbound_methods=None):
+        """*_methods：hook 关心的 method 集合，其余帧不调用 hook；None 表示每帧都调用"""
         self.addon.on_outbound = on_outbound
         self.addon.on_inbound = on_inbound
+        self.addon.outbound_methods = frozenset(outbound_methods) if outbound_methods is not None else None
+        self.addon.inbound_methods = frozenset(inbound_methods) if inbound_methods is not None else None
 
     def build(self, view_like: Dict[str, Any]) -> bytes:
         return self.codec.build_frame(view_like)
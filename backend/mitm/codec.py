@@ -1,21 +1,34 @@
-import base64, json, os, struct
+import base64, json, struct, time
+from collections.abc import Mapping
 from enum import Enum
-from typing import List, Dict, Tuple, Any
-from google.protobuf.json_format import MessageToDict, ParseDict
+from functools import lru_cache, partial
+from typing import Dict, Tuple, Any, Callable, Iterable, Optional
+from google.protobuf import message_factory
+from google.protobuf.message import Message
+from loguru import logger
 
-from proto import liqi_pb2 as pb
+from backend.mitm.pbconv import message_to_dict, parse_dict
+from backend.mitm.reqtable import RequestIdTable
 
-_DEFAULT_LIQI_JSON = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../proto/liqi.json"))
 _KEYS = [0x84, 0x5e, 0x4e, 0x42, 0x39, 0xa2, 0x1f, 0x60, 0x1c]
 
 
+@lru_cache(maxsize=512)
+def _xor_mask(n: int) -> int:
+    # 掩码只取决于长度 n：按 n 生成一次，存成小端整数
+    base = 23 ^ n
+    keys = _KEYS
+    k = len(keys)
+    mask = bytes((base + 5 * i + keys[i % k]) & 255 for i in range(n))
+    return int.from_bytes(mask, "little")
+
+
 def _xor(data: bytes) -> bytes:
-    b = bytearray(data)
-    n = len(b)
-    for i in range(n):
-        u = (23 ^ n) + 5 * i + _KEYS[i % len(_KEYS)] & 255
-        b[i] ^= u
-    return bytes(b)
+    n = len(data)
+    if not n:
+        return b""
+    # 整段当作一个大整数做一次异或，代替逐字节循环
+    return (int.from_bytes(data, "little") ^ _xor_mask(n)).to_bytes(n, "little")
 
 
 def _to_varint(x: int) -> bytes:
@@ -41,25 +54,31 @@ def _parse_varint(buf, p):
     return x, p
 
 
-def _from_protobuf(buf: bytes) -> List[Dict]:
+def _envelope(buf: memoryview) -> Tuple[memoryview, memoryview]:
+    """
+    外层信封只有两个 length-delimited 字段：1=方法名、2=payload。
+    直接返回两段 memoryview（不复制）；字段缺失时对应返回空视图。
+    """
+    method = payload = buf[:0]
     p = 0
-    out = []
-    while p < len(buf):
+    n = len(buf)
+    while p < n:
         tag = buf[p]
         p += 1
         typ = tag & 7
-        fid = tag >> 3
         if typ == 0:
-            val, p = _parse_varint(buf, p)
-            out.append({"id": fid, "type": "varint", "data": val})
-        elif typ == 2:
-            ln, p = _parse_varint(buf, p)
-            data = buf[p:p + ln]
-            p += ln
-            out.append({"id": fid, "type": "string", "data": data})
-        else:
+            _, p = _parse_varint(buf, p)
+            continue
+        if typ != 2:
             raise ValueError(f"wire={typ}")
-    return out
+        ln, p = _parse_varint(buf, p)
+        fid = tag >> 3
+        if fid == 1:
+            method = buf[p:p + ln]
+        elif fid == 2:
+            payload = buf[p:p + ln]
+        p += ln
+    return method, payload
 
 
 def _to_protobuf(fields):
@@ -75,42 +94,314 @@ def _to_protobuf(fields):
     return bytes(out)
 
 
+@lru_cache(maxsize=None)
+def liqi_pb2():
+    """
+    首次用到时才导入 proto.liqi_pb2：400 KB 的生成代码，导入时要建整个 descriptor pool。
+    放在启动路径上会推迟代理开始监听；现在由第一帧（或监听后的预热线程）触发。
+    """
+    t0 = time.perf_counter()
+    from proto import liqi_pb2 as pb
+    logger.info(f"[codec] liqi_pb2 loaded in {(time.perf_counter() - t0) * 1e3:.0f} ms")
+    return pb
+
+
+def _message_class(desc):
+    pb = liqi_pb2()
+    if desc.containing_type is None and hasattr(pb, desc.name):
+        return getattr(pb, desc.name)
+    return message_factory.GetMessageClass(desc)
+
+
+def method_index() -> Dict[str, Tuple[Any, Any]]:
+    """
+    由 liqi_pb2.DESCRIPTOR 的 service 描述建 ".lq.Lobby.fetchXxx" -> (请求类, 响应类)。
+    与 liqi.json 里 methods 的 requestType / responseType 一一对应，运行时不再需要那份 JSON。
+    """
+    out = {}
+    for svc in liqi_pb2().DESCRIPTOR.services_by_name.values():
+        for m in svc.methods:
+            out[f".{svc.full_name}.{m.name}"] = (_message_class(m.input_type), _message_class(m.output_type))
+    return out
+
+
+@lru_cache(maxsize=None)
+def method_index_from_json(path: str) -> Dict[str, Tuple[Any, Any]]:
+    pb = liqi_pb2()
+    with open(path, "r", encoding="utf-8") as f:
+        proto = json.load(f)
+    out = {}
+    for lq, pkg in proto["nested"].items():
+        for svc, node in pkg.get("nested", {}).items():
+            for rpc, dom in (node.get("methods") or {}).items():
+                out[f".{lq}.{svc}.{rpc}"] = (getattr(pb, dom["requestType"]), getattr(pb, dom["responseType"]))
+    return out
+
+
+@lru_cache(maxsize=None)
+def default_method_index() -> Dict[str, Tuple[Any, Any]]:
+    return method_index()
+
+
+@lru_cache(maxsize=None)
+def message_classes() -> Dict[str, Any]:
+    """Notify 与 ActionPrototype 内层消息按短名查类"""
+    pb = liqi_pb2()
+    return {name: getattr(pb, name) for name in pb.DESCRIPTOR.message_types_by_name}
+
+
+class ReqTemplate:
+    """
+    某个 method 的 Req 帧模板：帧头之后的 method 段是定值，预先编好；payload 按顶层字段分段编码。
+    protobuf 序列化就是各字段编码按字段号顺序拼接，所以每个字段单独编码再按字段号拼起来，与整条
+    SerializeToString 的结果逐字节相同。标量字段（activityId、id、type……）的分段按 (字段, 类型, 值) 缓存，
+    PacketBot 反复发的同一批请求几乎只剩一次 varint 拼接；列表与子消息每次现编。
+    """
+    MAX_SEGMENTS = 4096
+
+    __slots__ = ("method", "req_cls", "resp_cls", "_head", "_numbers", "_segments")
+
+    def __init__(self, method: str, req_cls, resp_cls):
+        self.method = method
+        self.req_cls = req_cls
+        self.resp_cls = resp_cls
+        # 外层 Wrapper：field 1 = method，field 2 = payload（这里只放 tag，长度随 payload）
+        self._head = _to_protobuf([{"id": 1, "type": "string", "data": method.encode()}]) + b"\x12"
+        self._numbers = {}
+        for f in req_cls.DESCRIPTOR.fields:
+            self._numbers[f.name] = f.number
+            self._numbers[f.json_name] = f.number
+        self._segments: Dict[Tuple[str, type, Any], bytes] = {}
+
+    def _segment(self, key: str, value) -> bytes:
+        if type(value) not in (int, str, bool):
+            return parse_dict({key: value}, self.req_cls).SerializeToString()
+        k = (key, type(value), value)  # 带上类型：True 与 1 的 hash 相同，但编码/校验结果不同
+        seg = self._segments.get(k)
+        if seg is None:
+            seg = parse_dict({key: value}, self.req_cls).SerializeToString()
+            if len(self._segments) < self.MAX_SEGMENTS:
+                self._segments[k] = seg
+        return seg
+
+    def payload(self, data: dict) -> bytes:
+        numbers = self._numbers
+        parts = []
+        for key, value in data.items():
+            num = numbers.get(key)
+            if num is None or value is None:
+                # 未知字段 / null：交给 parse_dict 给出与整条编码相同的结果或报错
+                return parse_dict(data, self.req_cls).SerializeToString()
+            parts.append((num, self._segment(key, value)))
+        if len(parts) > 1:
+            parts.sort(key=lambda p: p[0])
+            if any(parts[i][0] == parts[i + 1][0] for i in range(len(parts) - 1)):
+                # 同一字段同时用了 json 名与字段名：按整条编码处理
+                return parse_dict(data, self.req_cls).SerializeToString()
+        return b"".join(seg for _, seg in parts)
+
+    def frame(self, data: dict, msg_id: int) -> bytes:
+        payload = self.payload(data)
+        return b"\x02" + struct.pack("<H", msg_id) + self._head + _to_varint(len(payload)) + payload
+
+
 class MsgType(Enum):
     Notify = 1
     Req = 2
     Res = 3
 
 
+def dirty_value(parent, name: str, default=None):
+    """
+    读 *Dirty 包装字段（UInt32Dirty、XxxArrayDirty……）的 .value：未设置返回 default。
+    消息元素转成 dict（数组转成 dict 列表），与整条 MessageToDict 后再取该字段的结果相同。
+    """
+    if not parent.HasField(name):
+        return default
+    v = getattr(parent, name).value
+    if isinstance(v, (int, str, bool, float)):
+        return v
+    if isinstance(v, Message):
+        return message_to_dict(v)
+    return [message_to_dict(x) if isinstance(x, Message) else x for x in v]
+
+
+def _raw_dict(payload, dbg: Optional[dict] = None) -> dict:
+    d = {"_raw": base64.b64encode(payload).decode()}
+    if dbg is not None:
+        d["_dbg"] = dbg
+    return d
+
+
+_UNSET = object()
+
+
+class FrameView(Mapping):
+    """
+    parse_frame 的结果，按只读 dict 使用（view["method"]、view.get("data")、dict(view) 都照旧）。
+    id/type/method/from_client/raw 解析信封时就有，payload 按需解码：
+      - view.message：Req/Res 的 liqi_pb2 消息对象（只 FromString），hook 直接按属性读字段
+      - view["data"]：MessageToDict 后的 dict，第一次读取时才转换
+      - view.first_event(t) / events_of(t)：ResAmuletEventResponse 按事件 type 取事件，
+        第一次调用时遍历一趟 events 建 {type: [事件]} 索引（hook 分发时按声明的类型预先建好）
+    心跳、登录、统计之类没有 hook 关心的帧从头到尾不解码。要改 data 请用 dict(view, data=...) 另建。
+    """
+    __slots__ = ("id", "type", "method", "from_client", "raw", "_decode", "_cls", "_payload", "_message", "_data", "_events")
+    _FIELDS = ("id", "type", "method", "data", "from_client", "raw")
+
+    def __init__(
+            self,
+            msg_id,
+            mt: str,
+            method: str,
+            from_client: bool,
+            raw: bytes,
+            decode: Optional[Callable[[], dict]] = None,
+            cls=None,
+            payload=b"",
+    ):
+        self.id = msg_id
+        self.type = mt
+        self.method = method
+        self.from_client = from_client
+        self.raw = raw
+        self._decode = decode  # 给定时 data 由它生成（Notify、配不上 Req 的 Res）
+        self._cls = cls
+        self._payload = payload
+        self._message = None
+        self._data = _UNSET
+        self._events = None  # (只收的类型 或 None, {type: [事件]})
+
+    @property
+    def payload(self):
+        """信封里的 payload（原始帧上的 memoryview）"""
+        return self._payload
+
+    @property
+    def message(self):
+        """Req/Res 的消息对象；Notify 与配不上 Req 的 Res 为 None"""
+        msg = self._message
+        if msg is None and self._cls is not None:
+            msg = self._message = self._cls.FromString(self._payload)
+        return msg
+
+    @property
+    def data(self) -> dict:
+        d = self._data
+        if d is _UNSET:
+            d = self._data = self._decode() if self._decode is not None else message_to_dict(self.message)
+        return d
+
+    def index_events(self, types: Iterable[int] = ()) -> Dict[int, list]:
+        """遍历一趟 message.events 建 {type: [事件]}（保持原顺序）；types 非空时只收这些类型"""
+        wanted = frozenset(types) if types else None
+        idx: Dict[int, list] = {}
+        for e in self.message.events:
+            t = e.type
+            if wanted is None or t in wanted:
+                lst = idx.get(t)
+                if lst is None:
+                    idx[t] = [e]
+                else:
+                    lst.append(e)
+        self._events = (wanted, idx)
+        return idx
+
+    def events_of(self, t: int) -> list:
+        if self._events is None:
+            self.index_events()
+        wanted, idx = self._events
+        if wanted is not None and t not in wanted:
+            raise KeyError(f"event type {t} 不在 hook 声明的 events 里：{sorted(wanted)}")
+        return idx.get(t, [])
+
+    def first_event(self, t: int):
+        """第一个 type == t 的事件，没有则 None（相当于 next((e for e in events if e.type == t), None)）"""
+        lst = self.events_of(t)
+        return lst[0] if lst else None
+
+    @property
+    def decoded(self) -> bool:
+        """data 是否已转成 dict"""
+        return self._data is not _UNSET
+
+    def __getitem__(self, key):
+        if key == "data":
+            return self.data
+        if key in self._FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._FIELDS)
+
+    def __len__(self):
+        return len(self._FIELDS)
+
+    def __contains__(self, key):
+        return key in self._FIELDS
+
+    def __repr__(self):
+        data = "<lazy>" if self._data is _UNSET else repr(self._data)
+        return f"FrameView(type={self.type!r}, method={self.method!r}, id={self.id!r}, data={data})"
+
+
 class LiqiCodec:
-    def __init__(self, liqi_json_path=None):
-        self.liqi_json_path = liqi_json_path or _DEFAULT_LIQI_JSON
-        self.jsonProto = json.load(open(self.liqi_json_path, "r", encoding="utf-8"))
-        self._res_map = {}
+    def __init__(self, liqi_json_path=None, methods: Optional[Dict[str, Tuple[Any, Any]]] = None):
+        # 默认直接用 liqi_pb2 里的 service 描述；显式给了 liqi.json 才按它建表（类仍取自 liqi_pb2）
+        # 不传 methods 时到第一次查表才建（见 liqi_pb2()），构造 codec 不碰 schema
+        self.liqi_json_path = liqi_json_path
+        self._methods = methods
+        self._templates: Dict[str, ReqTemplate] = {}  # method -> Req 帧模板，fork 出来的 codec 共用
+        self._res_map = RequestIdTable()  # 等响应的 Req：id -> (method, 响应类)，有容量上限与 TTL
         self._last_req_id = 1
 
-    def parse_frame(self, content: bytes, from_client: bool) -> Dict[str, Any]:
+    def fork(self) -> "LiqiCodec":
+        """共用同一份 method 索引、id 配对状态全新的 codec：每条 WebSocket 连接各用一个"""
+        codec = LiqiCodec(self.liqi_json_path, methods=self._methods)
+        codec._templates = self._templates
+        return codec
+
+    def _load_methods(self) -> Dict[str, Tuple[Any, Any]]:
+        if self._methods is None:
+            path = self.liqi_json_path
+            self._methods = method_index_from_json(path) if path else default_method_index()
+        return self._methods
+
+    def warm_up(self) -> None:
+        """提前导入 schema、建好索引（代理开始监听后在后台调用，第一帧就不必等）"""
+        t0 = time.perf_counter()
+        self._load_methods()
+        message_classes()
+        logger.info(f"[codec] schema ready in {(time.perf_counter() - t0) * 1e3:.0f} ms")
+
+    def parse_frame(self, content: bytes, from_client: bool) -> FrameView:
         if not content: raise ValueError("empty")
         mt = MsgType(content[0])
+        # 全程在原始帧的 memoryview 上切片：方法名与 payload 都是视图，交给 FromString 前不复制
+        mv = memoryview(content)
         if mt == MsgType.Notify:
             msg_id = None
-            envelope = content[1:]
+            envelope = mv[1:]
         else:
-            msg_id = struct.unpack("<H", content[1:3])[0]
-            envelope = content[3:]
-        msg_block = _from_protobuf(envelope)
-        method = msg_block[0]["data"].decode(errors="ignore")
-        payload = msg_block[1]["data"]
+            msg_id = struct.unpack_from("<H", content, 1)[0]
+            envelope = mv[3:]
+        method_view, payload = _envelope(envelope)
+        method = str(method_view, "utf-8", "ignore")
 
+        # 这里只做必须立即完成的部分（方法名、Req/Res 的 id 配对）；payload 的解码推迟到读取 data 时
         if mt == MsgType.Notify:
-            data = self._decode_notify(method, payload)
-        elif mt == MsgType.Req:
-            method, data = self._decode_req(msg_id, method, payload)
+            return FrameView(None, mt.name, method, from_client, content,
+                             decode=partial(self._decode_notify, method, payload), payload=payload)
+        if mt == MsgType.Req:
+            method, cls = self._decode_req(msg_id, method, payload)
             self._last_req_id = msg_id
         else:
-            method, data = self._decode_res(msg_id, method, payload)
-
-        return {"id": msg_id, "type": mt.name, "method": method, "data": data,
-                "from_client": from_client, "raw": content}
+            method, cls = self._decode_res(msg_id, method, payload)
+        if cls is None:
+            return FrameView(msg_id, mt.name, method, from_client, content,
+                             decode=partial(_raw_dict, payload, self._unmatched_dbg()), payload=payload)
+        return FrameView(msg_id, mt.name, method, from_client, content, cls=cls, payload=payload)
 
     def build_frame(self, view: Dict[str, Any]) -> bytes:
         t = view["type"]
@@ -122,70 +413,83 @@ class LiqiCodec:
         if t == "Res": return self._compose_reqres("Res", method, data, msg_id)
         raise ValueError("unknown type")
 
+    def allocate_req_id(self, hint: int) -> int:
+        """注入 Req 用的空闲 id：优先 hint，被占用时取最近释放的 id"""
+        return self._res_map.allocate(hint)
+
+    def discard_req(self, msg_id: int) -> None:
+        """不再等 msg_id 的响应（例如已经替服务端回过了）"""
+        self._res_map.pop(msg_id)
+
+    def req_id_stats(self) -> dict:
+        return self._res_map.stats()
+
     def _decode_notify(self, method: str, payload: bytes) -> dict:
-        name = method.split(".")[-1]
-        if hasattr(pb, name):
-            obj = getattr(pb, name).FromString(payload)
-            d = MessageToDict(obj, always_print_fields_with_no_presence=True)
+        cls = message_classes().get(method.rsplit(".", 1)[-1])
+        if cls is not None:
+            obj = cls.FromString(payload)
+            d = message_to_dict(obj)
             if "data" in d:
                 raw = base64.b64decode(d["data"])
                 inner = d.get("name")
-                if inner and hasattr(pb, inner):
-                    inner_obj = getattr(pb, inner).FromString(_xor(raw))
-                    d["data"] = MessageToDict(inner_obj, always_print_fields_with_no_presence=True)
+                inner_cls = message_classes().get(inner) if inner else None
+                if inner_cls is not None:
+                    inner_obj = inner_cls.FromString(_xor(raw))
+                    d["data"] = message_to_dict(inner_obj)
             return d
-        return {"_raw": base64.b64encode(payload).decode()}
+        return _raw_dict(payload)
 
     def _decode_req(self, msg_id: int, method: str, payload: bytes):
-        lq, svc, rpc = self._split(method)
-        dom = self.jsonProto["nested"][lq]["nested"][svc]["methods"][rpc]
-        req_t, resp_t = dom["requestType"], dom["responseType"]
-        req_cls, resp_cls = getattr(pb, req_t), getattr(pb, resp_t)
-        obj = req_cls.FromString(payload)
-        d = MessageToDict(obj, always_print_fields_with_no_presence=True)
-        self._res_map[msg_id] = (method, resp_cls)
-        return method, d
+        # 返回 (method, 消息类)：只查类并登记 _res_map，FromString / MessageToDict 都留给 FrameView
+        req_cls, resp_cls = self._classes(method)
+        self._res_map.put(msg_id, method, resp_cls)
+        return method, req_cls
 
     def _decode_res(self, msg_id: int, method: str, payload: bytes):
-        if msg_id not in self._res_map:
-            dbg = {"last_req_id": getattr(self, "_last_req_id", None),
-                   "res_map_size": len(self._res_map)}
-            return method or "(unknown_res)", {"_raw": base64.b64encode(payload).decode(), "_dbg": dbg}
-        m, cls = self._res_map.pop(msg_id)
-        obj = cls.FromString(payload)
-        d = MessageToDict(obj, always_print_fields_with_no_presence=True)
-        return m, d
+        # 配不上 Req 时返回 (method, None)，data 退回原始 payload
+        item = self._res_map.pop(msg_id)
+        if item is None:
+            return method or "(unknown_res)", None
+        return item
+
+    def _unmatched_dbg(self) -> dict:
+        return {"last_req_id": getattr(self, "_last_req_id", None),
+                "res_map_size": len(self._res_map)}
 
     # === encode ===
+    def req_template(self, method: str) -> ReqTemplate:
+        tpl = self._templates.get(method)
+        if tpl is None:
+            req_cls, resp_cls = self._classes(method)
+            tpl = self._templates[method] = ReqTemplate(method, req_cls, resp_cls)
+        return tpl
+
     def _compose_reqres(self, t: str, method: str, data: dict, msg_id: int) -> bytes:
-        lq, svc, rpc = self._split(method)
-        dom = self.jsonProto["nested"][lq]["nested"][svc]["methods"][rpc]
-        name = dom["requestType"] if t == "Req" else dom["responseType"]
-        obj = ParseDict(data, getattr(pb, name)())
+        if t == "Req":
+            # 按模板拼帧，并直接登记响应类型（不必再把自己组的帧解一遍）
+            tpl = self.req_template(method)
+            frame = tpl.frame(data, msg_id)
+            self._res_map.put(msg_id, method, tpl.resp_cls)
+            self._last_req_id = msg_id
+            return frame
+        _, resp_cls = self._classes(method)
+        obj = parse_dict(data, resp_cls)
         blk = [
             {"id": 1, "type": "string", "data": method.encode()},
             {"id": 2, "type": "string", "data": obj.SerializeToString()},
         ]
-        head = b"\x02" if t == "Req" else b"\x03"
-
-        if t == "Req":
-            resp_t = dom["responseType"]
-            resp_cls = getattr(pb, resp_t)
-            self._res_map[msg_id] = (method, resp_cls)
-            self._last_req_id = msg_id
-
-        return head + struct.pack("<H", msg_id) + _to_protobuf(blk)
+        return b"\x03" + struct.pack("<H", msg_id) + _to_protobuf(blk)
 
     def _compose_notify(self, method: str, data: dict) -> bytes:
-        name = method.split(".")[-1]
+        cls = message_classes().get(method.rsplit(".", 1)[-1])
         if "data" in data and "name" in data:
-            inner = data["name"]
-            if hasattr(pb, inner):
-                inner_obj = ParseDict(data["data"], getattr(pb, inner)())
+            inner_cls = message_classes().get(data["name"])
+            if inner_cls is not None:
+                inner_obj = parse_dict(data["data"], inner_cls)
                 raw = inner_obj.SerializeToString()
                 data["data"] = base64.b64encode(_xor(raw))
-        if hasattr(pb, name):
-            outer = ParseDict(data, getattr(pb, name)())
+        if cls is not None:
+            outer = parse_dict(data, cls)
             payload = outer.SerializeToString()
         else:
             payload = base64.b64decode(data.get("_raw", b""))
@@ -193,6 +497,15 @@ class LiqiCodec:
                {"id": 2, "type": "string", "data": payload}]
         return b"\x01" + _to_protobuf(blk)
 
+    def _classes(self, method: str) -> Tuple[Any, Any]:
+        # 绝大多数帧是 ".lq.Lobby.xxx"，一次 dict 查找；其余写法（如 ".lq.Lobby/xxx"）规范化后再查
+        methods = self._methods or self._load_methods()
+        cls = methods.get(method)
+        if cls is None:
+            lq, svc, rpc = self._split(method)
+            cls = methods[f".{lq}.{svc}.{rpc}"]
+        return cls
+
     @staticmethod
     def _split(method: str) -> Tuple[str, str, str]:
         if "/" in method:
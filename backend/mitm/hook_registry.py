@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+# 处理函数调用约定：handler(view) -> (action, payload)，action 为 "pass" | "drop" | "modify" | "inject" | "hold"
+Handler = Callable[[Any], Tuple[str, Any]]
+
+PASS: Tuple[str, Any] = ("pass", None)
+
+
+@dataclass
+class HookStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, dt: float) -> None:
+        self.count += 1
+        self.total += dt
+        if dt > self.max:
+            self.max = dt
+
+
+@dataclass
+class HookSpec:
+    type: str  # "Req"（客户端发出）| "Res"（服务端返回）
+    method: str  # 例如 ".lq.Lobby.amuletActivityOperate"
+    fn: Handler
+    events: Tuple[int, ...] = ()  # 处理的 AmuletEventData.type；不看事件的 RPC 为空
+    stats: HookStats = field(default_factory=HookStats)
+
+    @property
+    def name(self) -> str:
+        return self.fn.__name__
+
+
+class HookRegistry:
+    """
+    (type, method) -> 处理函数。hooks 模块导入时用 register_hook 登记；
+    on_outbound / on_inbound 只做一次 dict 查找再 call，并按函数累计耗时。
+    """
+
+    def __init__(self):
+        self._by_key: Dict[Tuple[str, str], HookSpec] = {}
+
+    def get(self, t: str, method: str) -> Optional[HookSpec]:
+        return self._by_key.get((t, method))
+
+    def methods(self, t: str) -> FrozenSet[str]:
+        """某一类帧上登记过处理函数的 method（addon 只把这些帧交给 hook）"""
+        return frozenset(m for (tt, m) in self._by_key if tt == t)
+
+    def call(self, spec: HookSpec, view) -> Tuple[str, Any]:
+        t0 = time.perf_counter()
+        try:
+            if spec.events:
+                # 声明了事件类型的 handler：先一趟建好 {type: [事件]}，handler 里按 type 直接取
+                view.index_events(spec.events)
+            return spec.fn(view)
+        finally:
+            spec.stats.add(time.perf_counter() - t0)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        out = []
+        for s in self._by_key.values():
+            st = s.stats
+            out.append({
+                "type": s.type,
+                "method": s.method,
+                "handler": s.name,
+                "events": list(s.events),
+                "count": st.count,
+                "total_ms": st.total * 1e3,
+                "avg_us": st.total / st.count * 1e6 if st.count else 0.0,
+                "max_us": st.max * 1e6,
+            })
+        return sorted(out, key=lambda r: r["total_ms"], reverse=True)
+
+
+HOOKS = HookRegistry()
+
+
+def register_hook(t: str, method: str, *, events: Tuple[int, ...] = ()):
+    """装饰器：handler(view) 作为 (t, method) 帧的处理函数；events 为它要按 type 取的 AmuletEventData.type"""
+
+    def deco(fn: Handler) -> Handler:
+        old = HOOKS._by_key.get((t, method))
+        if old is not None:
+            raise ValueError(f"重复的 hook: {t} {method}（已由 {old.name} 处理）")
+        HOOKS._by_key[(t, method)] = HookSpec(type=t, method=method, fn=fn, events=tuple(events))
+        return fn
+
+    return deco
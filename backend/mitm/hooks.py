@@ -1,8 +1,8 @@
 import asyncio
 import ctypes
 import platform
-from collections import OrderedDict
-from typing import Tuple, Any, Dict, List, Set, Iterable, Optional, Union
+from functools import partial
+from typing import Tuple, Any, Callable, Dict, List, Set, Iterable, Optional, Union
 
 from loguru import logger
 from mitmproxy import ctx
@@ -10,9 +10,11 @@ from mitmproxy import ctx
 import backend.app
 import backend.mitm.addon as _addon
 from backend.app import AMULET_REG, BADGE_REG, pipeline
-from backend.app import MANAGER, GAME_STATE, broadcast
-from backend.autorun.util.suannkou_recommender import plan_pure_pinzu_suu_ankou_v2
-from backend.autorun.util.chiitoi_recommender import chiitoi_recommendation_json
+from backend.app import MANAGER, GAME_STATE, RECOMMENDER, broadcast
+from backend.autorun.util.recommend_engine import RecommendSnapshot, pick_best_plan
+from backend.mitm.codec import dirty_value, message_to_dict
+from backend.mitm.hook_registry import HOOKS, register_hook
+from backend.model.tiles import UNKNOWN, WALL_RANK, encode_deck
 from backend.msgbox import _ui_confirm_blocking
 
 ID_KAVI = 230
@@ -161,6 +163,15 @@ def _confirm(title: str, msg: str) -> bool:
     return ctypes.windll.user32.MessageBoxW(0, str(msg), str(title), flags) == 6
 
 
+def _hold(confirm: Callable[..., bool], *args, **kwargs) -> Tuple[str, Any]:
+    """
+    熔断确认：返回 ("hold", 等待函数)。addon 只扣下这一条消息，在后台线程里等确认框的结果
+    （confirm 本身是阻塞的：MessageBoxW / _ui_confirm_blocking），True 再原样发出，False 丢弃；
+    mitmproxy 事件循环不被卡住，心跳等其它消息照常收发。
+    """
+    return "hold", partial(asyncio.to_thread, confirm, *args, **kwargs)
+
+
 def _build_kavi_msg(is_plus: bool, min_cnt: int, cnt: int, left: Optional[dict], right: Optional[dict]) -> str:
     lines: List[str] = [f"检测到：传导卡维已装备（{'Plus' if is_plus else '普通'}）", f"传导卡数量：{cnt}（阈值：{min_cnt}）"]
     lines += ["", "邻位：",
@@ -226,600 +237,626 @@ def _must_pick_guard(selected_raw_id: int) -> tuple[bool, bool, str]:
     return hit_exist, picked_is_hit, ""
 
 
+def _on_discard_recommendation(payload: Dict) -> None:
+    """
+    打牌推荐计算完成后的回调（由 RECOMMENDER 投递回 mitm 事件循环执行）
+    """
+    loop = asyncio.get_running_loop()
+    # 广播一次即可
+    loop.create_task(broadcast(payload))
+    if payload.get("late"):
+        # 超预算规划器的补发结果只用于展示，自动操作以主结果为准
+        return
+
+    win_entries = [e for e in payload["data"] if e["data"].get("status") == "win_now"]
+
+    if win_entries:
+        if MANAGER.get("game.auto_tsumo"):
+            peer_key = None
+            addon_now = _addon.WS_ADDON_INSTANCE
+            if addon_now and addon_now.last_flow:
+                f = addon_now.last_flow
+                peer_key = f"{f.client_conn.address[0]}|{f.server_conn.address[0]}"
+
+            def _do_inject():
+                addon = _addon.WS_ADDON_INSTANCE
+                if not addon:
+                    logger.warning("WS_ADDON_INSTANCE not ready; skip inject")
+                    return
+                ok, reason, _ = addon.inject_now(
+                    method=".lq.Lobby.amuletActivityOperate",
+                    data={"activityId": 250811, "type": 8, "tileList": []},
+                    t="Req",
+                    peer_key=peer_key,
+                )
+                logger.info(f"success: {ok}, reason: {reason}")
+
+            ctx.master.event_loop.call_later(0.3, _do_inject)
+
+    else:
+        if MANAGER.get("game.auto_discard"):
+            best = pick_best_plan(payload["data"])
+            if best:
+                discard_id = int(best["data"]["discards"][0])
+
+                def _do():
+                    pipeline.click_discard_by_tile_id(
+                        tile_id=discard_id,
+                        hand_ids_with_draw=GAME_STATE.hand_tiles,
+                        id2label=GAME_STATE.deck_map,
+                        allow_tsumogiri=True
+                    )
+
+                loop.call_later(1, _do)
+
+
+# ---------- 客户端发出的请求（熔断） ----------
+
+@register_hook("Req", ".lq.Lobby.amuletActivitySelectPack")
+def _req_select_pack(view) -> Tuple[str, Any]:
+    data = view.get("data") or {}
+    raw_id = int(data.get("id", 0))
+    cfg = MANAGER.to_table_payload("fuse") or {}
+    if raw_id == 0:
+        if bool(cfg.get("enable_skip_guard", True)):
+            a, b, text = _fuse_hits()
+            if a or b:
+                return _hold(_confirm, "熔断确认：跳过卡包？", text)
+        return "pass", None
+    if bool(cfg.get("enable_shop_force_pick", False)):
+        hit_exist, picked_is_hit, msg = _must_pick_guard(raw_id)
+        if hit_exist and not picked_is_hit:
+            return _hold(_confirm, "熔断确认：购物必须选择监控项", msg)
+
+    return "pass", None
+
+
+@register_hook("Req", ".lq.Lobby.amuletActivityUpgrade")
+def _req_upgrade(view) -> Tuple[str, Any]:
+    cfg = MANAGER.to_table_payload("fuse") or {}
+    ef = _effects()
+    if bool(cfg.get("enable_prestart_kavi_guard", True)):
+        has_kavi = any(_base(e.get("id")) == ID_KAVI and _bid(e) == BADGE_CONDUCTION for e in ef)
+        if has_kavi:
+            min_cnt = int(cfg.get("conduction_min_count", 3))
+            cnt = sum(1 for e in ef if _bid(e) == BADGE_CONDUCTION)
+            if cnt >= min_cnt:
+                nb = _neighbors_of_kavi()
+                if nb["kavi_index"] >= 0:
+                    left, right = nb["left"], nb["right"]
+                    if not ((left is not None and _bid(left) == 0) or (right is not None and _bid(right) == 0)):
+                        msg = _build_kavi_msg(_plus(nb["kavi_raw_id"]), min_cnt, cnt, left, right)
+                        return _hold(_confirm, "熔断确认：确认开局？", msg)
+    if bool(cfg.get("enable_kavi_plus_buffer_guard", True)):
+        # 找到卡维 Plus
+        try:
+            k_idx = next((i for i, e in enumerate(ef) if _base(e.get("id")) == ID_KAVI and _plus(e.get("id"))), -1)
+        except Exception:
+            k_idx = -1
+        if k_idx >= 0:
+            # 只有场上真的存在膨胀时才需要检查
+            if any(_bid(e) == BADGE_EXPANSION for e in ef):
+                n = len(ef)
+
+                def first_seen(step: int) -> tuple[str, dict | None]:
+                    j = k_idx + step
+                    while 0 <= j < n:
+                        row = ef[j]
+                        return "hit" if _bid(row) == BADGE_EXPANSION else "ok", row
+                    return "none", None
+
+                l_state, l_row = first_seen(-1)
+                r_state, r_row = first_seen(1)
+
+                # 只要有一侧“紧邻即膨胀”（无缓冲），就提示
+                if l_state == "hit" or r_state == "hit":
+                    msg2 = _build_kavi_plus_buffer_msg(l_row, r_row, l_state, r_state)
+                    return _hold(_confirm, "熔断确认：确认开局？", msg2)
+
+    return "pass", None
+
+
+# 黑客、不稳定存的第一个数据为复制或变身的护身符：{"id":2320,"store":[2290,1234]} 229为盗印，不稳定228、黑客232、卡维230
+@register_hook("Req", ".lq.Lobby.amuletActivityOperate")
+def _req_operate(view) -> Tuple[str, Any]:
+    cfg = MANAGER.to_table_payload("fuse") or {}
+    if not bool(cfg.get("enable_anti_steal_eat", True)):
+        return "pass", None
+    if view.get("data").get("type") != 8:
+        return "pass", None
+    prot_badges: List[int] = list(map(int, [BADGE_CONDUCTION, BADGE_CONDUCTION]))
+
+    ef = _effects()
+
+    kavi_idxs: List[int] = []
+    for i, r in enumerate(ef):
+        if _base(r.get("id")) == ID_KAVI and _bid(r) in prot_badges:
+            kavi_idxs.append(i)
+    if not kavi_idxs:
+        return "pass", None
+
+    def theft_like(row: Optional[dict]) -> bool:
+        if not isinstance(row, dict): return False
+        b = _base(row.get("id"))
+        if b == ID_THEFT: return True
+        if b in (ID_HACKER, ID_UNSTABLE) and _first_src_base(row) == ID_THEFT: return True
+        return False
+
+    n = len(ef)
+    risky_pairs: List[tuple[Optional[dict], dict, Optional[dict]]] = []
+    for i in kavi_idxs:
+        left = ef[i - 1] if i - 1 >= 0 else None
+        right = ef[i + 1] if i + 1 < n else None
+        if theft_like(right):
+            risky_pairs.append((left, ef[i], right))
+
+    if not risky_pairs:
+        return "pass", None
+
+    # 组织提示
+    lines: List[str] = ["检测到：盗印/伪装盗印与卡维相邻，可能吃掉受保护印章。", "受保护印章：{}".format("、".join(str(x) for x in prot_badges)), ""]
+    for (l, k, r) in risky_pairs:
+        lines.append(f"卡维：{_name(k)}，印章：{_badge_label(k)}")
+        lines.append(f"  左邻：{_name(l)}，印章：{_badge_label(l)}")
+        lines.append(f"  右邻：{_name(r)}，印章：{_badge_label(r)}")
+        lines.append("")
+    lines.append("是否仍然继续和牌？")
+
+    return _hold(_confirm, "熔断确认：可能吞噬卡维印章", "\n".join(lines))
+
+
+@register_hook("Req", ".lq.Lobby.amuletActivityEndShopping")
+def _req_end_shopping(view) -> Tuple[str, Any]:
+    cfg = MANAGER.to_table_payload("fuse") or {}
+    if not bool(cfg.get("enable_exit_life_guard", True)):
+        return "pass", None
+    ef = _effects()
+    has_life = any(_bid(e) == BADGE_LIFE for e in ef)
+    if has_life:
+        return "pass", None
+
+    amulets_payload = [
+        {
+            "name": _name(r),
+            "badgeLabel": _badge_label(r),
+            "baseId": _base(r.get("id", 0)),
+            "rawId": int(r.get("id", 0) or 0),
+        }
+        for r in ef
+    ]
+    return _hold(
+        _ui_confirm_blocking,
+        title_key="fuse.guard.noLife.title",
+        message_key="fuse.guard.noLife.message",
+        values={
+            "lifeBadgeId": BADGE_LIFE,
+            "amulets": amulets_payload,
+        },
+        ok_key="common.continue",
+        cancel_key="common.cancel",
+        timeout=45.0,
+    )
+
+
 def on_outbound(view: Dict) -> Tuple[str, Any]:
     if backend.app.AUTORUNNER.running:
         return "pass", None
-    try:
-        if view.get("type") == "Req" and view.get("method") == ".lq.Lobby.amuletActivitySelectPack":
-            data = view.get("data") or {}
-            raw_id = int(data.get("id", 0))
-            cfg = MANAGER.to_table_payload("fuse") or {}
-            if raw_id == 0:
-                if bool(cfg.get("enable_skip_guard", True)):
-                    a, b, text = _fuse_hits()
-                    if a or b:
-                        return ("pass", None) if _confirm("熔断确认：跳过卡包？", text) else ("drop", None)
-                return "pass", None
-            if bool(cfg.get("enable_shop_force_pick", False)):
-                hit_exist, picked_is_hit, msg = _must_pick_guard(raw_id)
-                if hit_exist and not picked_is_hit:
-                    return ("pass", None) if _confirm("熔断确认：购物必须选择监控项", msg) else ("drop", None)
-
-            return "pass", None
-
-        if view.get("type") == "Req" and view.get("method") == ".lq.Lobby.amuletActivityUpgrade":
-            cfg = MANAGER.to_table_payload("fuse") or {}
-            ef = _effects()
-            if bool(cfg.get("enable_prestart_kavi_guard", True)):
-                has_kavi = any(_base(e.get("id")) == ID_KAVI and _bid(e) == BADGE_CONDUCTION for e in ef)
-                if has_kavi:
-                    min_cnt = int(cfg.get("conduction_min_count", 3))
-                    cnt = sum(1 for e in ef if _bid(e) == BADGE_CONDUCTION)
-                    if cnt >= min_cnt:
-                        nb = _neighbors_of_kavi()
-                        if nb["kavi_index"] >= 0:
-                            left, right = nb["left"], nb["right"]
-                            if not ((left is not None and _bid(left) == 0) or (right is not None and _bid(right) == 0)):
-                                msg = _build_kavi_msg(_plus(nb["kavi_raw_id"]), min_cnt, cnt, left, right)
-                                return ("pass", None) if _confirm("熔断确认：确认开局？", msg) else ("drop", None)
-            if bool(cfg.get("enable_kavi_plus_buffer_guard", True)):
-                # 找到卡维 Plus
-                try:
-                    k_idx = next((i for i, e in enumerate(ef) if _base(e.get("id")) == ID_KAVI and _plus(e.get("id"))), -1)
-                except Exception:
-                    k_idx = -1
-                if k_idx >= 0:
-                    # 只有场上真的存在膨胀时才需要检查
-                    if any(_bid(e) == BADGE_EXPANSION for e in ef):
-                        n = len(ef)
-
-                        def first_seen(step: int) -> tuple[str, dict | None]:
-                            j = k_idx + step
-                            while 0 <= j < n:
-                                row = ef[j]
-                                return "hit" if _bid(row) == BADGE_EXPANSION else "ok", row
-                            return "none", None
-
-                        l_state, l_row = first_seen(-1)
-                        r_state, r_row = first_seen(1)
-
-                        # 只要有一侧“紧邻即膨胀”（无缓冲），就提示
-                        if l_state == "hit" or r_state == "hit":
-                            msg2 = _build_kavi_plus_buffer_msg(l_row, r_row, l_state, r_state)
-                            return ("pass", None) if _confirm("熔断确认：确认开局？", msg2) else ("drop", None)
-
-            return "pass", None
-        # 黑客、不稳定存的第一个数据为复制或变身的护身符：{"id":2320,"store":[2290,1234]} 229为盗印，不稳定228、黑客232、卡维230
-        if view.get("type") == "Req" and view.get("method") == ".lq.Lobby.amuletActivityOperate":
-            cfg = MANAGER.to_table_payload("fuse") or {}
-            if not bool(cfg.get("enable_anti_steal_eat", True)):
-                return "pass", None
-            if view.get("data").get("type") != 8:
-                return "pass", None
-            prot_badges: List[int] = list(map(int, [BADGE_CONDUCTION, BADGE_CONDUCTION]))
-
-            ef = _effects()
-
-            kavi_idxs: List[int] = []
-            for i, r in enumerate(ef):
-                if _base(r.get("id")) == ID_KAVI and _bid(r) in prot_badges:
-                    kavi_idxs.append(i)
-            if not kavi_idxs:
-                return "pass", None
-
-            def theft_like(row: Optional[dict]) -> bool:
-                if not isinstance(row, dict): return False
-                b = _base(row.get("id"))
-                if b == ID_THEFT: return True
-                if b in (ID_HACKER, ID_UNSTABLE) and _first_src_base(row) == ID_THEFT: return True
-                return False
-
-            n = len(ef)
-            risky_pairs: List[tuple[Optional[dict], dict, Optional[dict]]] = []
-            for i in kavi_idxs:
-                left = ef[i - 1] if i - 1 >= 0 else None
-                right = ef[i + 1] if i + 1 < n else None
-                if theft_like(right):
-                    risky_pairs.append((left, ef[i], right))
-
-            if not risky_pairs:
-                return "pass", None
-
-            # 组织提示
-            lines: List[str] = ["检测到：盗印/伪装盗印与卡维相邻，可能吃掉受保护印章。", "受保护印章：{}".format("、".join(str(x) for x in prot_badges)), ""]
-            for (l, k, r) in risky_pairs:
-                lines.append(f"卡维：{_name(k)}，印章：{_badge_label(k)}")
-                lines.append(f"  左邻：{_name(l)}，印章：{_badge_label(l)}")
-                lines.append(f"  右邻：{_name(r)}，印章：{_badge_label(r)}")
-                lines.append("")
-            lines.append("是否仍然继续和牌？")
-
-            return ("pass", None) if _confirm("熔断确认：可能吞噬卡维印章", "\n".join(lines)) else ("drop", None)
-        if view.get("type") == "Req" and view.get("method") == ".lq.Lobby.amuletActivityEndShopping":
-            cfg = MANAGER.to_table_payload("fuse") or {}
-            if not bool(cfg.get("enable_exit_life_guard", True)):
-                return "pass", None
-            ef = _effects()
-            has_life = any(_bid(e) == BADGE_LIFE for e in ef)
-            if has_life:
-                return "pass", None
-
-            amulets_payload = [
-                {
-                    "name": _name(r),
-                    "badgeLabel": _badge_label(r),
-                    "baseId": _base(r.get("id", 0)),
-                    "rawId": int(r.get("id", 0) or 0),
-                }
-                for r in ef
-            ]
-            logger.info("run _ui_confirm_blocking")
-            ok = _ui_confirm_blocking(
-                title_key="fuse.guard.noLife.title",
-                message_key="fuse.guard.noLife.message",
-                values={
-                    "lifeBadgeId": BADGE_LIFE,
-                    "amulets": amulets_payload,
-                },
-                ok_key="common.continue",
-                cancel_key="common.cancel",
-                timeout=45.0,
-            )
-            logger.info(f"result: {ok}")
-            return ("pass", None) if ok else ("drop", None)
+    spec = HOOKS.get(view.get("type"), view.get("method"))
+    if spec is None:
         return "pass", None
+    try:
+        return HOOKS.call(spec, view)
     except Exception:
         logger.exception("error occurred")
         return "pass", None
 
 
-def on_inbound(view: Dict) -> Tuple[str, Any]:
-    """
-    .lq.Lobby.fetchAmuletActivityData           进入青云之志界面
-    .lq.Lobby.amuletActivityGiveup              放弃
-    .lq.Lobby.amuletActivityOperate             游戏中打牌等操作
-    .lq.Lobby.amuletActivityStartGame           游戏开始，这回合获得的牌山数组似乎没有任何作用
-    .lq.Lobby.amuletActivityUpgrade             回合开始
-
-    .lq.Lobby.amuletActivitySelectFreeEffect    选择免费的卡包
-    .lq.Lobby.amuletActivityBuy                 购买卡包
-    .lq.Lobby.amuletActivitySelectPack          选择卡护身符、跳过
-    .lq.Lobby.amuletActivitySellEffect          卖出护身符
-    .lq.Lobby.amuletActivityEffectSort          对护身符排序
-    .lq.Lobby.amuletActivityUpgradeShopBuff     升级增益
-    .lq.Lobby.amuletActivityRefreshShop         刷新商店
-    .lq.Lobby.amuletActivityEndShopping         购买结束
-    """
-    if dict(view["data"]).get("error", None) is not None:
-        logger.error(f"error occurred: {dict(view['data'])['error']}")
-        return "pass", None
-    # 服务器下发公告
-    if view["type"] == "Res" and view["method"] == ".lq.Lobby.fetchAnnouncement" and MANAGER.get("game.modify_announcement"):
-        newd = dict(view["data"])
-        anns: List[Dict] = newd.get("announcements", [])
-        anns.insert(0, {
-            "id": 9999,
-            "title": "欢迎使用向听镜·向聴レンズへようこそ",
-            "content": "向听镜已启动，祝各位大大欧气满满！\n向聴レンズが起動しました！みなさんにガチャ運がモリモリ湧いてきますように！",
-            "headerImage": "internal://2.jpg"
-        })
-        return "modify", newd
-    # 开始新游戏
-    if view["type"] == "Res" and view["method"] == ".lq.Lobby.amuletActivityUpgrade":
-        data = dict(view["data"])
-        modify = False
-        events = data.get("events", [])
-        matched = next((e for e in events if e.get("type") == 23), None)
-        if matched:
-            value_changes = matched.get("valueChanges", {})
-            round_info = value_changes.get("round", {})
-            total_change_tile_count = round_info.get("totalChangeTileCount", {}).get("value", None)
-            change_tile_count = round_info.get("changeTileCount", {}).get("value", None)
-            hands = round_info.get("hands", {}).get("value", None)
-            pool = round_info.get("pool", {}).get("value", None)
-            ting_list = round_info.get("tingList", {}).get("value", None)
-            next_operation = round_info.get("nextOperation", {}).get("value", None)
-            locked_tiles = round_info.get("lockedTile", {}).get("value", None)
-            effect_list = value_changes.get("effect", {}).get("effectList", {}).get("value", None)
-            game = value_changes.get("game", {})
-            boss_buff = game.get("bossBuff", {}).get("value", None)
-            record = value_changes.get("record", None)
-            GAME_STATE.update_record(record)
-            if hands and pool:
-                GAME_STATE.update_pool(pool, hand_tiles=hands, locked_tiles=locked_tiles, push_gamestate=False)
-                new_wall = reorder_wall_tiles_by_amulet221(GAME_STATE.deck_map, GAME_STATE.wall_tiles, GAME_STATE.effect_list)
-                GAME_STATE.update_wall(new_wall)
-                desktop_remain = round_info.get("desktopRemain", {}).get("value", 0)
-                level = value_changes.get("game", {}).get("level", {}).get("value", 0)
-                # 进入换牌阶段
-                switch_stage_event = next((e for e in events if e.get("type") == 19), None)
-                if switch_stage_event:
-                    value_changes_19 = switch_stage_event.get("valueChanges", {})
-                    stage = value_changes_19.get("stage", -1)
-                    ended = value_changes_19.get("ended", False)
-                    GAME_STATE.update_other_info(desktop_remain=desktop_remain, stage=stage, ended=ended, level=level, effect_list=effect_list, ting_list=ting_list, next_operation=next_operation, total_change_tile_count=total_change_tile_count, change_tile_count=change_tile_count, boss_buff=boss_buff, reason=".lq.Lobby.amuletActivityUpgrade:19")
-                else:
-                    GAME_STATE.update_other_info(desktop_remain=desktop_remain, level=level, effect_list=effect_list, ting_list=ting_list, next_operation=next_operation, total_change_tile_count=total_change_tile_count, change_tile_count=change_tile_count, boss_buff=boss_buff, reason=".lq.Lobby.amuletActivityUpgrade:23")
-                if MANAGER.get("game.public_all"):
-                    show_desktop_tiles = round_info.get("showDesktopTiles", {}).get("value", [])
-                    show_desktop_tiles.clear()
-                    pos = len(GAME_STATE.wall_tiles) + len(GAME_STATE.locked_tiles) - 1
-
-                    for tile in GAME_STATE.wall_tiles:
-                        show_desktop_tiles.append({"id": tile, "pos": pos})
-                        pos -= 1
-                    for tile in GAME_STATE.locked_tiles:
-                        show_desktop_tiles.append({"id": tile, "pos": pos})
-                        pos -= 1
-                    if has_amulet_221(GAME_STATE.effect_list):
-                        event_3 = next((e for e in events if e.get("type") == 3), None)
-                        if event_3:
-                            show_desktop_tiles_list = [
-                                event_3.get("valueChanges", {}).get("round", {}).get("showDesktopTiles", {}).get("value", []),
-                                next(iter(event_3.get("effectedHooks", []))).get("result", {}).get("modifyChangeDesktop", {}).get("showDesktopTiles", [])
-                            ]
-                            for tile_list in show_desktop_tiles_list:
-                                tile_list.clear()
-                                for tile in show_desktop_tiles:
-                                    tile_list.append(tile)
-                    modify = True
-        matched = next((e for e in events if e.get("type") == 48), None)
-        if matched:
-            value_changes = matched.get("valueChanges", {})
-            coin = int(value_changes.get("game", {}).get("coin", {}).get("value", None))
-            GAME_STATE.update_other_info(coin=coin, reason=".lq.Lobby.amuletActivityUpgrade:48")
-        matched = next((e for e in events if e.get("type") == 49), None)
-        if matched:
-            value_changes = matched.get("valueChanges", {})
-            stage = value_changes.get("stage", -1)
-            GAME_STATE.update_other_info(stage=stage, reason=".lq.Lobby.amuletActivityUpgrade:49")
-        if modify:
-            return "modify", data
-    # 游戏中打牌等操作
-    if view["type"] == "Res" and view["method"] == ".lq.Lobby.amuletActivityOperate":
-        data = view.get("data", {})
-        events = data.get("events", [])
-        # type = 100: 游戏结束
-        end_event = next((e for e in events if e.get("type") == 100), None)
-        if end_event:
-            value_changes = end_event.get("valueChanges", {})
-            stage = value_changes.get("stage", -1)
-            ended = value_changes.get("ended", True)
-            GAME_STATE.update_other_info(stage=stage, ended=ended, reason=".lq.Lobby.amuletActivityOperate:100")
-            return "pass", None
-        # type = 4: 换牌
-        switch_event = next((e for e in events if e.get("type") == 4), None)
-        if switch_event:
-            value_changes = switch_event.get("valueChanges", {})
-            round_info = value_changes.get("round", {})
-            change_tile_count = round_info.get("changeTileCount", {}).get("value", None)
-            used = round_info.get("used", {}).get("value", [])
-            GAME_STATE.update_switch_used_tiles(used=used, push_gamestate=False, reason=".lq.Lobby.amuletActivityOperate:4")
-            hands = round_info.get("hands", {}).get("value", [])
-            GAME_STATE.update_hand_tiles(hand_tiles=hands, push_gamestate=False)
-            stage = value_changes.get("stage", -1)
-            next_operation = round_info.get("nextOperation", {}).get("value", None)
-            ting_list = round_info.get("tingList", {}).get("value", None)
-            GAME_STATE.update_other_info(stage=stage, change_tile_count=change_tile_count, next_operation=next_operation, ting_list=ting_list)
-
-        # type = 6: 摸牌
-        draw_event = next((e for e in events if e.get("type") == 6), None)
-        if draw_event:
-            value_changes = draw_event.get("valueChanges", {})
-            round_info = value_changes.get("round", {})
-            desktop_remain = round_info.get("desktopRemain", {}).get("value", 0)
-            stage = value_changes.get("stage", -1)
-            ended = value_changes.get("ended", False)
-            effect_list = value_changes.get("effect", {}).get("effectList", {}).get("value", None)
-            ting_list = round_info.get("tingList", {}).get("value", None)
-            next_operation = round_info.get("nextOperation", {}).get("value", None)
-            after_draw_hands = round_info.get("hands", {}).get("value", None)
-            if after_draw_hands:
-                GAME_STATE.on_draw_tile(after_draw_hands, after_draw_hands[len(after_draw_hands) - 1], push_gamestate=False)
-
-            GAME_STATE.update_other_info(desktop_remain=desktop_remain, stage=stage, ended=ended, effect_list=effect_list, ting_list=ting_list, next_operation=next_operation, reason=".lq.Lobby.amuletActivityOperate:6")
-
-            def ids_to_tiles(id_list: List[int], deck_map: "OrderedDict[int, str]") -> List[str]:
-                """
-                把 [id] 按顺序转换成 [tile]（不做任何规范化，0p 仍是 '0p'）
-                """
-                try:
-                    return [deck_map[i] for i in id_list]
-                except KeyError as e:
-                    raise ValueError(f"deck_map 缺少 id={e.args[0]} 的映射") from None
-
-            chiitoi = chiitoi_recommendation_json(GAME_STATE.deck_map, GAME_STATE.hand_tiles, GAME_STATE.wall_tiles)
-            suuannkou = plan_pure_pinzu_suu_ankou_v2(GAME_STATE.hand_tiles, GAME_STATE.wall_tiles, GAME_STATE.deck_map)
-
-            loop = asyncio.get_running_loop()
-            loop.create_task(broadcast(chiitoi))
-
-            def _current_discard(plan: dict) -> int | None:
-                if not isinstance(plan, dict):
-                    return None
-                if plan.get("status") != "plan":
-                    return None
-                d = plan.get("discards") or []
-                return int(d[0]) if d else None
-
-            def _wrap_entry(yaku_key: str, plan: dict) -> dict:
-                entry = {
-                    "status": plan.get("status"),
-                    "draws_needed": plan.get("draws_needed"),
-                    "target14": plan.get("target14") or [],
-                    "discards": plan.get("discards") or [],
-                }
-                # 可选字段（仅存在时写入）
-                if "pair_hint" in plan: entry["pair_hint"] = plan["pair_hint"]
-                if "mode" in plan: entry["mode"] = plan["mode"]
-                if "reason" in plan: entry["reason"] = plan["reason"]
-                # 附带当前一步要打的牌（方便前端直接取）
-                cur = _current_discard(plan)
-                if cur is not None:
-                    entry["discard"] = cur
-                return {"yaku": yaku_key, "data": entry}
-
-            payload = {
-                "type": "discard_recommendation",
-                "data": [
-                    _wrap_entry("chiitoi", chiitoi),
-                    _wrap_entry("suuannkou", suuannkou),
-                ],
-            }
+def _error_of(view) -> Optional[dict]:
+    msg = view.message
+    if msg is None:
+        return dict(view["data"]).get("error", None)
+    if "error" in msg.DESCRIPTOR.fields_by_name and msg.HasField("error"):
+        return message_to_dict(msg.error)
+    return None
 
-            # 广播一次即可
-            loop = asyncio.get_running_loop()
-            loop.create_task(broadcast(payload))
-
-            win_entries = [e for e in payload["data"] if e["data"].get("status") == "win_now"]
-
-            if win_entries:
-                if MANAGER.get("game.auto_tsumo"):
-                    peer_key = None
-                    addon_now = _addon.WS_ADDON_INSTANCE
-                    if addon_now and addon_now.last_flow:
-                        f = addon_now.last_flow
-                        peer_key = f"{f.client_conn.address[0]}|{f.server_conn.address[0]}"
-
-                    def _do_inject():
-                        addon = _addon.WS_ADDON_INSTANCE
-                        if not addon:
-                            logger.warning("WS_ADDON_INSTANCE not ready; skip inject")
-                            return
-                        ok, reason, _ = addon.inject_now(
-                            method=".lq.Lobby.amuletActivityOperate",
-                            data={"activityId": 250811, "type": 8, "tileList": []},
-                            t="Req",
-                            peer_key=peer_key,
-                        )
-                        logger.info(f"success: {ok}, reason: {reason}")
-
-                    ctx.master.event_loop.call_later(0.3, _do_inject)
 
+def _stage_ended(event, ended_default: bool = False) -> Tuple[int, bool]:
+    # 事件没带 valueChanges 时沿用原先 dict 写法的默认值（stage=-1）
+    if not event.HasField("value_changes"):
+        return -1, ended_default
+    return event.value_changes.stage, event.value_changes.ended
+
+
+def _record_dict(value_changes) -> Optional[dict]:
+    return message_to_dict(value_changes.record) if value_changes.HasField("record") else None
+
+
+def _set_show_desktop_tiles(field, tiles: List[Dict[str, int]]) -> None:
+    del field[:]
+    for t in tiles:
+        field.add(id=t["id"], pos=t["pos"])
+
+
+# ---------- 服务端返回的响应（更新 GAME_STATE / 改包） ----------
+# amuletActivity* 响应（ResAmuletEventResponse）直接读 view.message 的属性，
+# 只有交给 GAME_STATE 的片段（dirty_value）和要改包时才转成 dict。
+# 事件按 type 用 view.first_event(t) 取：分发时已按 register_hook 声明的 events 一趟建好索引。
+
+@register_hook("Res", ".lq.Lobby.fetchAnnouncement")
+def _res_fetch_announcement(view) -> Tuple[str, Any]:
+    """服务器下发公告"""
+    if not MANAGER.get("game.modify_announcement"):
+        return "pass", None
+    newd = dict(view["data"])
+    anns: List[Dict] = newd.get("announcements", [])
+    anns.insert(0, {
+        "id": 9999,
+        "title": "欢迎使用向听镜·向聴レンズへようこそ",
+        "content": "向听镜已启动，祝各位大大欧气满满！\n向聴レンズが起動しました！みなさんにガチャ運がモリモリ湧いてきますように！",
+        "headerImage": "internal://2.jpg"
+    })
+    return "modify", newd
+
+
+@register_hook("Res", ".lq.Lobby.amuletActivityUpgrade", events=(23, 19, 3, 48, 49))
+def _res_upgrade(view) -> Tuple[str, Any]:
+    """回合开始"""
+    msg = view.message
+    modify = False
+    matched = view.first_event(23)
+    if matched:
+        value_changes = matched.value_changes
+        round_info = value_changes.round
+        total_change_tile_count = dirty_value(round_info, "total_change_tile_count")
+        change_tile_count = dirty_value(round_info, "change_tile_count")
+        hands = dirty_value(round_info, "hands")
+        pool = dirty_value(round_info, "pool")
+        ting_list = dirty_value(round_info, "ting_list")
+        next_operation = dirty_value(round_info, "next_operation")
+        locked_tiles = dirty_value(round_info, "locked_tile")
+        effect_list = dirty_value(value_changes.effect, "effect_list")
+        game = value_changes.game
+        boss_buff = dirty_value(game, "boss_buff")
+        record = _record_dict(value_changes)
+        GAME_STATE.update_record(record)
+        if hands and pool:
+            GAME_STATE.update_pool(pool, hand_tiles=hands, locked_tiles=locked_tiles, push_gamestate=False)
+            new_wall = reorder_wall_tiles_by_amulet221(GAME_STATE.deck_map, GAME_STATE.wall_tiles, GAME_STATE.effect_list, GAME_STATE.tile_codes)
+            GAME_STATE.update_wall(new_wall)
+            desktop_remain = dirty_value(round_info, "desktop_remain", 0)
+            level = dirty_value(game, "level", 0)
+            # 进入换牌阶段
+            switch_stage_event = view.first_event(19)
+            if switch_stage_event:
+                stage, ended = _stage_ended(switch_stage_event)
+                GAME_STATE.update_other_info(desktop_remain=desktop_remain, stage=stage, ended=ended, level=level, effect_list=effect_list, ting_list=ting_list, next_operation=next_operation, total_change_tile_count=total_change_tile_count, change_tile_count=change_tile_count, boss_buff=boss_buff, reason=".lq.Lobby.amuletActivityUpgrade:19")
             else:
-                if MANAGER.get("game.auto_discard"):
-                    plan_candidates = [
-                        e for e in payload["data"]
-                        if e["data"].get("status") == "plan" and isinstance(e["data"].get("discards"), list) and e["data"]["discards"]
-                    ]
-                    if plan_candidates:
-                        plan_candidates.sort(
-                            key=lambda e: (e["data"].get("draws_needed") if e["data"].get("draws_needed") is not None else 10 ** 9)
-                        )
-                        best = plan_candidates[0]
-                        discard_id = int(best["data"]["discards"][0])
-
-                        def _do():
-                            pipeline.click_discard_by_tile_id(
-                                tile_id=discard_id,
-                                hand_ids_with_draw=GAME_STATE.hand_tiles,
-                                id2label=GAME_STATE.deck_map,
-                                allow_tsumogiri=True
-                            )
-
-                        loop.call_later(1, _do)
-        coin_event = next((e for e in events if e.get("type") == 11), None)
-        if coin_event:
-            value_changes = coin_event.get("valueChanges", {})
-            effect_list = value_changes.get("effect", {}).get("effectList", {}).get("value", None)
-            coin = int(value_changes.get("game", {}).get("coin", {}).get("value", None))
-            GAME_STATE.update_other_info(coin=coin, effect_list=effect_list, reason=".lq.Lobby.amuletActivityOperate:11")
-        shop_event = next((e for e in events if e.get("type") == 12), None)
-        if shop_event:
-            value_changes = shop_event.get("valueChanges", {})
-            shop = value_changes.get("shop", {})
-            goods = shop.get("goods", {}).get("value", None)
-            refresh_price = shop.get("refreshPrice", {}).get("value", None)
-            GAME_STATE.update_other_info(goods=goods, refresh_price=refresh_price, reason=".lq.Lobby.amuletActivityOperate:12")
-        reward_pack_event = next((e for e in events if e.get("type") == 15), None)
-        if reward_pack_event:
-            value_changes = reward_pack_event.get("valueChanges", {})
-            effect = value_changes.get("effect", {})
-            level_reward_candidates = effect.get("levelRewardCandidates", {}).get("value", None)
-            stage = value_changes.get("stage", -1)
-            GAME_STATE.update_other_info(candidate_effect_list=level_reward_candidates, stage=stage, reason=".lq.Lobby.amuletActivityOperate:15")
-        finish_event = next((e for e in events if e.get("type") == 24), None)
-        if finish_event:
-            value_changes = finish_event.get("valueChanges", {})
-            stage = value_changes.get("stage", -1)
-            GAME_STATE.update_other_info(stage=stage, reason=".lq.Lobby.amuletActivityOperate:24")
-    # 进入青云之志界面时获取已经开始的游戏数据
-    if view["type"] == "Res" and view["method"] == ".lq.Lobby.fetchAmuletActivityData":
-        data = view.get("data", {}).get("data", {})
-        game = data.get("game", None)
-        if game:
-            round_info = game.get("round", {})
-            hands = round_info.get("hands", [])
-            pool = round_info.get("pool", [])
-            locked_tiles = round_info.get("lockedTile", [])
-            effect_list = game.get("effect", {}).get("effectList", None)
-            total_chance_tile_count = round_info.get("totalChangeTileCount", None)
-            chance_tile_count = round_info.get("changeTileCount", None)
-            GAME_STATE.update_pool(pool, hand_tiles=hands, locked_tiles=locked_tiles, push_gamestate=False, reason=".lq.Lobby.fetchAmuletActivityData")
-            desktop_remain = round_info.get("desktopRemain", 0)
-            stage = game.get("stage", -1)
-            ended = game.get("ended", False)
-            coin = int(game.get("game", {}).get("coin", ""))
-            boss_buff = game.get("game", {}).get("bossBuff", None)
-            level = game.get("level", None)
-            shop = game.get("shop", {})
-            free_candidate_effect_list = game.get("effect", {}).get("freeRewardCandidates", None)
-            max_effect_volume = game.get("effect", {}).get("maxEffectVolume", 0)
-            candidate_effect_list = shop.get("candidateEffectList", [])
-            if free_candidate_effect_list:
-                candidate_effect_list = free_candidate_effect_list
-            goods = shop.get("goods", [])
-            refresh_price = shop.get("refreshPrice", 0)
-            record = game.get("record", None)
-            ting_list = round_info.get("tingList", None)
-            next_operation = round_info.get("nextOperation", None)
-            GAME_STATE.update_record(record)
-            if desktop_remain < 36:
-                GAME_STATE.update_other_info(desktop_remain=desktop_remain, stage=stage, ended=ended, level=level, effect_list=effect_list, candidate_effect_list=candidate_effect_list, coin=coin, ting_list=ting_list, next_operation=next_operation, goods=goods, refresh_price=refresh_price, total_change_tile_count=total_chance_tile_count, change_tile_count=chance_tile_count, max_effect_volume=max_effect_volume, boss_buff=boss_buff, push_gamestate=False)
-                new_wall = reorder_wall_tiles_by_amulet221(GAME_STATE.deck_map, GAME_STATE.wall_tiles, effect_list)
-                GAME_STATE.update_wall(new_wall)
-                GAME_STATE.refresh_wall_by_remaning()
-            else:
-                new_wall = reorder_wall_tiles_by_amulet221(GAME_STATE.deck_map, GAME_STATE.wall_tiles, effect_list)
-                GAME_STATE.update_wall(new_wall)
-                GAME_STATE.update_other_info(desktop_remain=desktop_remain, stage=stage, ended=ended, level=level, effect_list=effect_list, candidate_effect_list=candidate_effect_list, coin=coin, ting_list=ting_list, next_operation=next_operation, goods=goods, refresh_price=refresh_price, total_change_tile_count=total_chance_tile_count, change_tile_count=chance_tile_count, max_effect_volume=max_effect_volume, boss_buff=boss_buff, push_gamestate=True)
-            error_number_test = MANAGER.get("general.error_code_test")
-            if error_number_test != 0:
-                return "modify", dict({"error": {"code": error_number_test, "u32Params": [], "strParams": [], "jsonParam": ""}})
-    # 只是用来更新一下状态
-    if view["type"] == "Res" and view["method"] == ".lq.Lobby.amuletActivityGiveup":
-        GAME_STATE.on_giveup()
-    if view["type"] == "Res" and view["method"] == ".lq.Lobby.amuletActivitySelectFreeEffect":
-        data = view.get("data", {})
-        events = data.get("events", [])
-        start_event = next((e for e in events if e.get("type") == 2), None)
-        value_changes = start_event.get("valueChanges", {})
-        stage = value_changes.get("stage", -1)
-        effect_list = value_changes.get("effect", {}).get("effectList", {}).get("value", None)
-        ended = value_changes.get("ended", False)
-        record = value_changes.get("record", None)
+                GAME_STATE.update_other_info(desktop_remain=desktop_remain, level=level, effect_list=effect_list, ting_list=ting_list, next_operation=next_operation, total_change_tile_count=total_change_tile_count, change_tile_count=change_tile_count, boss_buff=boss_buff, reason=".lq.Lobby.amuletActivityUpgrade:23")
+            if MANAGER.get("game.public_all"):
+                show_desktop_tiles = []
+                pos = len(GAME_STATE.wall_tiles) + len(GAME_STATE.locked_tiles) - 1
+
+                for tile in GAME_STATE.wall_tiles:
+                    show_desktop_tiles.append({"id": tile, "pos": pos})
+                    pos -= 1
+                for tile in GAME_STATE.locked_tiles:
+                    show_desktop_tiles.append({"id": tile, "pos": pos})
+                    pos -= 1
+                if round_info.HasField("show_desktop_tiles"):
+                    _set_show_desktop_tiles(round_info.show_desktop_tiles.value, show_desktop_tiles)
+                if has_amulet_221(GAME_STATE.effect_list):
+                    event_3 = view.first_event(3)
+                    if event_3:
+                        round_3 = event_3.value_changes.round
+                        if round_3.HasField("show_desktop_tiles"):
+                            _set_show_desktop_tiles(round_3.show_desktop_tiles.value, show_desktop_tiles)
+                        hook_result = event_3.effected_hooks[0].result
+                        if hook_result.HasField("modify_change_desktop"):
+                            _set_show_desktop_tiles(hook_result.modify_change_desktop.show_desktop_tiles, show_desktop_tiles)
+                modify = True
+    matched = view.first_event(48)
+    if matched:
+        coin = int(dirty_value(matched.value_changes.game, "coin"))
+        GAME_STATE.update_other_info(coin=coin, reason=".lq.Lobby.amuletActivityUpgrade:48")
+    matched = view.first_event(49)
+    if matched:
+        stage, _ = _stage_ended(matched)
+        GAME_STATE.update_other_info(stage=stage, reason=".lq.Lobby.amuletActivityUpgrade:49")
+    if modify:
+        # 只有要改包时才整条转成 dict
+        return "modify", message_to_dict(msg)
+    return "pass", None
+
+
+@register_hook("Res", ".lq.Lobby.amuletActivityOperate", events=(100, 4, 6, 11, 12, 15, 24))
+def _res_operate(view) -> Tuple[str, Any]:
+    """游戏中打牌等操作"""
+    # type = 100: 游戏结束
+    end_event = view.first_event(100)
+    if end_event:
+        stage, ended = _stage_ended(end_event, ended_default=True)
+        GAME_STATE.update_other_info(stage=stage, ended=ended, reason=".lq.Lobby.amuletActivityOperate:100")
+        return "pass", None
+    # type = 4: 换牌
+    switch_event = view.first_event(4)
+    if switch_event:
+        value_changes = switch_event.value_changes
+        round_info = value_changes.round
+        change_tile_count = dirty_value(round_info, "change_tile_count")
+        used = dirty_value(round_info, "used", [])
+        GAME_STATE.update_switch_used_tiles(used=used, push_gamestate=False, reason=".lq.Lobby.amuletActivityOperate:4")
+        hands = dirty_value(round_info, "hands", [])
+        GAME_STATE.update_hand_tiles(hand_tiles=hands, push_gamestate=False)
+        stage, _ = _stage_ended(switch_event)
+        next_operation = dirty_value(round_info, "next_operation")
+        ting_list = dirty_value(round_info, "ting_list")
+        GAME_STATE.update_other_info(stage=stage, change_tile_count=change_tile_count, next_operation=next_operation, ting_list=ting_list)
+
+    # type = 6: 摸牌
+    draw_event = view.first_event(6)
+    if draw_event:
+        value_changes = draw_event.value_changes
+        round_info = value_changes.round
+        desktop_remain = dirty_value(round_info, "desktop_remain", 0)
+        stage, ended = _stage_ended(draw_event)
+        effect_list = dirty_value(value_changes.effect, "effect_list")
+        ting_list = dirty_value(round_info, "ting_list")
+        next_operation = dirty_value(round_info, "next_operation")
+        after_draw_hands = dirty_value(round_info, "hands")
+        if after_draw_hands:
+            GAME_STATE.on_draw_tile(after_draw_hands, after_draw_hands[len(after_draw_hands) - 1], push_gamestate=False)
+
+        GAME_STATE.update_other_info(desktop_remain=desktop_remain, stage=stage, ended=ended, effect_list=effect_list, ting_list=ting_list, next_operation=next_operation, reason=".lq.Lobby.amuletActivityOperate:6")
+
+        RECOMMENDER.submit(
+            RecommendSnapshot.from_game_state(GAME_STATE),
+            on_done=_on_discard_recommendation,
+            loop=asyncio.get_running_loop(),
+        )
+    coin_event = view.first_event(11)
+    if coin_event:
+        value_changes = coin_event.value_changes
+        effect_list = dirty_value(value_changes.effect, "effect_list")
+        coin = int(dirty_value(value_changes.game, "coin"))
+        GAME_STATE.update_other_info(coin=coin, effect_list=effect_list, reason=".lq.Lobby.amuletActivityOperate:11")
+    shop_event = view.first_event(12)
+    if shop_event:
+        shop = shop_event.value_changes.shop
+        goods = dirty_value(shop, "goods")
+        refresh_price = dirty_value(shop, "refresh_price")
+        GAME_STATE.update_other_info(goods=goods, refresh_price=refresh_price, reason=".lq.Lobby.amuletActivityOperate:12")
+    reward_pack_event = view.first_event(15)
+    if reward_pack_event:
+        level_reward_candidates = dirty_value(reward_pack_event.value_changes.effect, "level_reward_candidates")
+        stage, _ = _stage_ended(reward_pack_event)
+        GAME_STATE.update_other_info(candidate_effect_list=level_reward_candidates, stage=stage, reason=".lq.Lobby.amuletActivityOperate:15")
+    finish_event = view.first_event(24)
+    if finish_event:
+        stage, _ = _stage_ended(finish_event)
+        GAME_STATE.update_other_info(stage=stage, reason=".lq.Lobby.amuletActivityOperate:24")
+    return "pass", None
+
+
+@register_hook("Res", ".lq.Lobby.fetchAmuletActivityData")
+def _res_fetch_activity_data(view) -> Tuple[str, Any]:
+    """进入青云之志界面时获取已经开始的游戏数据"""
+    data = view.get("data", {}).get("data", {})
+    game = data.get("game", None)
+    if game:
+        round_info = game.get("round", {})
+        hands = round_info.get("hands", [])
+        pool = round_info.get("pool", [])
+        locked_tiles = round_info.get("lockedTile", [])
+        effect_list = game.get("effect", {}).get("effectList", None)
+        total_chance_tile_count = round_info.get("totalChangeTileCount", None)
+        chance_tile_count = round_info.get("changeTileCount", None)
+        GAME_STATE.update_pool(pool, hand_tiles=hands, locked_tiles=locked_tiles, push_gamestate=False, reason=".lq.Lobby.fetchAmuletActivityData")
+        desktop_remain = round_info.get("desktopRemain", 0)
+        stage = game.get("stage", -1)
+        ended = game.get("ended", False)
+        coin = int(game.get("game", {}).get("coin", ""))
+        boss_buff = game.get("game", {}).get("bossBuff", None)
+        level = game.get("level", None)
+        shop = game.get("shop", {})
+        free_candidate_effect_list = game.get("effect", {}).get("freeRewardCandidates", None)
+        max_effect_volume = game.get("effect", {}).get("maxEffectVolume", 0)
+        candidate_effect_list = shop.get("candidateEffectList", [])
+        if free_candidate_effect_list:
+            candidate_effect_list = free_candidate_effect_list
+        goods = shop.get("goods", [])
+        refresh_price = shop.get("refreshPrice", 0)
+        record = game.get("record", None)
+        ting_list = round_info.get("tingList", None)
+        next_operation = round_info.get("nextOperation", None)
+        GAME_STATE.update_record(record)
+        if desktop_remain < 36:
+            GAME_STATE.update_other_info(desktop_remain=desktop_remain, stage=stage, ended=ended, level=level, effect_list=effect_list, candidate_effect_list=candidate_effect_list, coin=coin, ting_list=ting_list, next_operation=next_operation, goods=goods, refresh_price=refresh_price, total_change_tile_count=total_chance_tile_count, change_tile_count=chance_tile_count, max_effect_volume=max_effect_volume, boss_buff=boss_buff, push_gamestate=False)
+            new_wall = reorder_wall_tiles_by_amulet221(GAME_STATE.deck_map, GAME_STATE.wall_tiles, effect_list, GAME_STATE.tile_codes)
+            GAME_STATE.update_wall(new_wall)
+            GAME_STATE.refresh_wall_by_remaning()
+        else:
+            new_wall = reorder_wall_tiles_by_amulet221(GAME_STATE.deck_map, GAME_STATE.wall_tiles, effect_list, GAME_STATE.tile_codes)
+            GAME_STATE.update_wall(new_wall)
+            GAME_STATE.update_other_info(desktop_remain=desktop_remain, stage=stage, ended=ended, level=level, effect_list=effect_list, candidate_effect_list=candidate_effect_list, coin=coin, ting_list=ting_list, next_operation=next_operation, goods=goods, refresh_price=refresh_price, total_change_tile_count=total_chance_tile_count, change_tile_count=chance_tile_count, max_effect_volume=max_effect_volume, boss_buff=boss_buff, push_gamestate=True)
+        error_number_test = MANAGER.get("general.error_code_test")
+        if error_number_test != 0:
+            return "modify", dict({"error": {"code": error_number_test, "u32Params": [], "strParams": [], "jsonParam": ""}})
+    return "pass", None
+
+
+@register_hook("Res", ".lq.Lobby.amuletActivityGiveup")
+def _res_giveup(view) -> Tuple[str, Any]:
+    """放弃：只是用来更新一下状态"""
+    GAME_STATE.on_giveup()
+    return "pass", None
+
+
+@register_hook("Res", ".lq.Lobby.amuletActivitySelectFreeEffect", events=(2,))
+def _res_select_free_effect(view) -> Tuple[str, Any]:
+    """选择免费的卡包"""
+    start_event = view.first_event(2)
+    value_changes = start_event.value_changes
+    stage, ended = _stage_ended(start_event)
+    effect_list = dirty_value(value_changes.effect, "effect_list")
+    record = _record_dict(value_changes)
+    GAME_STATE.update_record(record)
+    GAME_STATE.update_other_info(stage=stage, ended=ended, effect_list=effect_list, reason=".lq.Lobby.amuletActivitySelectFreeEffect:2")
+    return "pass", None
+
+
+@register_hook("Res", ".lq.Lobby.amuletActivityStartGame", events=(1,))
+def _res_start_game(view) -> Tuple[str, Any]:
+    """游戏开始，这回合获得的牌山数组似乎没有任何作用"""
+    start_event = view.first_event(1)
+    result = start_event.result
+    if result.HasField("new_game_result"):
+        new_game = result.new_game_result
+        stage, ended = new_game.stage, new_game.ended
+        record = message_to_dict(new_game.record) if new_game.HasField("record") else None
+        effect = new_game.effect if new_game.HasField("effect") else None
+    else:
+        stage, ended, record, effect = -1, False, None, None
+    free_candidate_effect_list = [message_to_dict(c) for c in effect.free_reward_candidates]
+    max_effect_volume = effect.max_effect_volume
+    GAME_STATE.update_record(record)
+    GAME_STATE.update_other_info(stage=stage, ended=ended, candidate_effect_list=free_candidate_effect_list, max_effect_volume=max_effect_volume, reason=".lq.Lobby.amuletActivityStartGame:1")
+    return "pass", None
+
+
+@register_hook("Res", ".lq.Lobby.amuletActivityBuy", events=(13,))
+def _res_buy(view) -> Tuple[str, Any]:
+    """购买卡包"""
+    buy_amulet_event = view.first_event(13)
+    if buy_amulet_event:
+        value_changes = buy_amulet_event.value_changes
+        stage, ended = _stage_ended(buy_amulet_event)
+        coin = int(dirty_value(value_changes.game, "coin"))
+        shop = value_changes.shop
+        goods = dirty_value(shop, "goods")
+        record = _record_dict(value_changes)
+        GAME_STATE.update_record(record)
+        candidate_effect_list = dirty_value(shop, "candidate_effect_list")
+        GAME_STATE.update_other_info(stage=stage, coin=coin, ended=ended, candidate_effect_list=candidate_effect_list, goods=goods, reason=".lq.Lobby.amuletActivityBuy:13")
+    return "pass", None
+
+
+@register_hook("Res", ".lq.Lobby.amuletActivitySelectPack", events=(14,))
+def _res_select_pack(view) -> Tuple[str, Any]:
+    """选择卡护身符、跳过"""
+    select_amulet_event = view.first_event(14)
+    if select_amulet_event:
+        value_changes = select_amulet_event.value_changes
+        effect_list = dirty_value(value_changes.effect, "effect_list")
+        stage, _ = _stage_ended(select_amulet_event)
+        record = _record_dict(value_changes)
         GAME_STATE.update_record(record)
-        GAME_STATE.update_other_info(stage=stage, ended=ended, effect_list=effect_list, reason=".lq.Lobby.amuletActivitySelectFreeEffect:2")
-    if view["type"] == "Res" and view["method"] == ".lq.Lobby.amuletActivityStartGame":
-        data = view.get("data", {})
-        events = data.get("events", [])
-        start_event = next((e for e in events if e.get("type") == 1), None)
-        result = start_event.get("result", {}).get("newGameResult", {})
-        stage = result.get("stage", -1)
-        ended = result.get("ended", False)
-        record = result.get("record", None)
-        effect = result.get("effect", None)
-        free_candidate_effect_list = effect.get("freeRewardCandidates", [])
-        max_effect_volume = effect.get("maxEffectVolume", None)
+        GAME_STATE.update_other_info(stage=stage, effect_list=effect_list, reason=".lq.Lobby.amuletActivitySelectPack:14")
+    return "pass", None
+
+
+@register_hook("Res", ".lq.Lobby.amuletActivitySellEffect", events=(17,))
+def _res_sell_effect(view) -> Tuple[str, Any]:
+    """卖出护身符"""
+    sell_amulet_event = view.first_event(17)
+    if sell_amulet_event:
+        value_changes = sell_amulet_event.value_changes
+        stage, ended = _stage_ended(sell_amulet_event)
+        coin = int(dirty_value(value_changes.game, "coin"))
+        effect_list = dirty_value(value_changes.effect, "effect_list")
+        record = _record_dict(value_changes)
+        goods = dirty_value(value_changes.shop, "goods")
         GAME_STATE.update_record(record)
-        GAME_STATE.update_other_info(stage=stage, ended=ended, candidate_effect_list=free_candidate_effect_list, max_effect_volume=max_effect_volume, reason=".lq.Lobby.amuletActivityStartGame:1")
-    if view["type"] == "Res" and view["method"] == ".lq.Lobby.amuletActivityBuy":
-        data = dict(view["data"])
-        events = data.get("events", [])
-        buy_amulet_event = next((e for e in events if e.get("type") == 13), None)
-        if buy_amulet_event:
-            value_changes = buy_amulet_event.get("valueChanges", {})
-            stage = value_changes.get("stage", -1)
-            game = value_changes.get("game", {})
-            ended = value_changes.get("ended", False)
-            coin = int(game.get("coin", {}).get("value", None))
-            shop = value_changes.get("shop", {})
-            goods = shop.get("goods", {}).get("value", None)
-            record = value_changes.get("record", None)
-            GAME_STATE.update_record(record)
-            candidate_effect_list = shop.get("candidateEffectList", {}).get("value", None)
-            GAME_STATE.update_other_info(stage=stage, coin=coin, ended=ended, candidate_effect_list=candidate_effect_list, goods=goods, reason=".lq.Lobby.amuletActivityBuy:13")
-    if view["type"] == "Res" and view["method"] == ".lq.Lobby.amuletActivitySelectPack":
-        data = view.get("data", {})
-        events = data.get("events", [])
-        select_amulet_event = next((e for e in events if e.get("type") == 14), None)
-        if select_amulet_event:
-            value_changes = select_amulet_event.get("valueChanges", {})
-            effect_list = value_changes.get("effect", {}).get("effectList", {}).get("value", None)
-            stage = value_changes.get("stage", -1)
-            record = value_changes.get("record", None)
-            GAME_STATE.update_record(record)
-            GAME_STATE.update_other_info(stage=stage, effect_list=effect_list, reason=".lq.Lobby.amuletActivitySelectPack:14")
-    if view["type"] == "Res" and view["method"] == ".lq.Lobby.amuletActivitySellEffect":
-        data = dict(view["data"])
-        events = data.get("events", [])
-        sell_amulet_event = next((e for e in events if e.get("type") == 17), None)
-        if sell_amulet_event:
-            value_changes = sell_amulet_event.get("valueChanges", {})
-            game = value_changes.get("game", {})
-            stage = value_changes.get("stage", -1)
-            coin = int(game.get("coin", {}).get("value", None))
-            effect_list = value_changes.get("effect", {}).get("effectList", {}).get("value", None)
-            ended = value_changes.get("ended", False)
-            record = value_changes.get("record", None)
-            shop = value_changes.get("shop", {})
-            goods = shop.get("goods", {}).get("value", None)
-            GAME_STATE.update_record(record)
-            GAME_STATE.update_other_info(stage=stage, coin=coin, ended=ended, effect_list=effect_list, goods=goods, reason=".lq.Lobby.amuletActivitySellEffect:17")
-    if view["type"] == "Res" and view["method"] == ".lq.Lobby.amuletActivityRefreshShop":
-        data = dict(view["data"])
-        events = data.get("events", [])
-        refresh_shop_event = next((e for e in events if e.get("type") == 18), None)
-        if refresh_shop_event:
-            value_changes = refresh_shop_event.get("valueChanges", {})
-            game = value_changes.get("game", {})
-            stage = value_changes.get("stage", -1)
-            coin = int(game.get("coin", {}).get("value", None))
-            record = value_changes.get("record", None)
-            shop = value_changes.get("shop", {})
-            goods = shop.get("goods", {}).get("value", None)
-            refresh_price = shop.get("refreshPrice", {}).get("value", None)
-            GAME_STATE.update_record(record)
-            GAME_STATE.update_other_info(stage=stage, coin=coin, goods=goods, refresh_price=refresh_price, reason=".lq.Lobby.amuletActivitySellEffect:18")
-    if view["type"] == "Res" and view["method"] == ".lq.Lobby.amuletActivityEndShopping":
-        data = view.get("data", {})
-        events = data.get("events", [])
-        end_shopping_event = next((e for e in events if e.get("type") == 22), None)
-        if end_shopping_event:
-            value_changes = end_shopping_event.get("valueChanges", {})
-            stage = value_changes.get("stage", -1)
-            GAME_STATE.update_other_info(stage=stage, reason=".lq.Lobby.amuletActivityEndShopping:22")
-    if view["type"] == "Res" and view["method"] == ".lq.Lobby.amuletActivityEffectSort":
-        data = view.get("data", {})
-        events = data.get("events", [])
-        amulet_sort_event = next((e for e in events if e.get("type") == 20), None)
-        if amulet_sort_event:
-            value_changes = amulet_sort_event.get("valueChanges", {})
-            effect_list = value_changes.get("effect", {}).get("effectList", {}).get("value", None)
-            GAME_STATE.update_other_info(effect_list=effect_list, reason=".lq.Lobby.amuletActivityEffectSort:20")
-    if view["type"] == "Res" and view["method"] == ".lq.Lobby.amuletActivitySelectRewardPack":
-        data = view.get("data", {})
-        events = data.get("events", [])
-        select_reward_event = next((e for e in events if e.get("type") == 16), None)
-        if select_reward_event:
-            value_changes = select_reward_event.get("valueChanges", {})
-            effect = value_changes.get("effect", {})
-            effect_list = effect.get("effectList", {}).get("value", None)
-            level_reward_candidates = effect.get("levelRewardCandidates", {}).get("value", None)
-            GAME_STATE.update_other_info(effect_list=effect_list, candidate_effect_list=level_reward_candidates, reason=".lq.Lobby.amuletActivitySelectRewardPack:16")
-        shop_event = next((e for e in events if e.get("type") == 12), None)
-        if shop_event:
-            value_changes = shop_event.get("valueChanges", {})
-            stage = value_changes.get("stage", -1)
-            shop = value_changes.get("shop", {})
-            goods = shop.get("goods", {}).get("value", None)
-            refresh_price = shop.get("refreshPrice", {}).get("value", None)
-            ended = shop_event.get("ended", False)
-            GAME_STATE.update_other_info(stage=stage, goods=goods, refresh_price=refresh_price, ended=ended, reason=".lq.Lobby.amuletActivitySelectRewardPack:12")
-    if view["type"] == "Res" and view["method"] == ".lq.Lobby.amuletActivityUpgradeShopBuff":
-        data = view.get("data", {})
-        events = data.get("events", [])
-        upgrade_shop_buff = next((e for e in events if e.get("type") == 21), None)
-        if upgrade_shop_buff:
-            value_changes = upgrade_shop_buff.get("valueChanges", {})
-            game = value_changes.get("game", {})
-            coin = int(game.get("coin", {}).get("value", None))
-            record = value_changes.get("record", None)
-            GAME_STATE.update_record(record)
-            GAME_STATE.update_other_info(coin=coin, reason=".lq.Lobby.amuletActivityUpgradeShopBuff:21")
+        GAME_STATE.update_other_info(stage=stage, coin=coin, ended=ended, effect_list=effect_list, goods=goods, reason=".lq.Lobby.amuletActivitySellEffect:17")
     return "pass", None
 
 
+@register_hook("Res", ".lq.Lobby.amuletActivityRefreshShop", events=(18,))
+def _res_refresh_shop(view) -> Tuple[str, Any]:
+    """刷新商店"""
+    refresh_shop_event = view.first_event(18)
+    if refresh_shop_event:
+        value_changes = refresh_shop_event.value_changes
+        stage, _ = _stage_ended(refresh_shop_event)
+        coin = int(dirty_value(value_changes.game, "coin"))
+        record = _record_dict(value_changes)
+        shop = value_changes.shop
+        goods = dirty_value(shop, "goods")
+        refresh_price = dirty_value(shop, "refresh_price")
+        GAME_STATE.update_record(record)
+        GAME_STATE.update_other_info(stage=stage, coin=coin, goods=goods, refresh_price=refresh_price, reason=".lq.Lobby.amuletActivitySellEffect:18")
+    return "pass", None
+
+
+@register_hook("Res", ".lq.Lobby.amuletActivityEndShopping", events=(22,))
+def _res_end_shopping(view) -> Tuple[str, Any]:
+    """购买结束"""
+    end_shopping_event = view.first_event(22)
+    if end_shopping_event:
+        stage, _ = _stage_ended(end_shopping_event)
+        GAME_STATE.update_other_info(stage=stage, reason=".lq.Lobby.amuletActivityEndShopping:22")
+    return "pass", None
+
+
+@register_hook("Res", ".lq.Lobby.amuletActivityEffectSort", events=(20,))
+def _res_effect_sort(view) -> Tuple[str, Any]:
+    """对护身符排序"""
+    amulet_sort_event = view.first_event(20)
+    if amulet_sort_event:
+        effect_list = dirty_value(amulet_sort_event.value_changes.effect, "effect_list")
+        GAME_STATE.update_other_info(effect_list=effect_list, reason=".lq.Lobby.amuletActivityEffectSort:20")
+    return "pass", None
+
+
+@register_hook("Res", ".lq.Lobby.amuletActivitySelectRewardPack", events=(16, 12))
+def _res_select_reward_pack(view) -> Tuple[str, Any]:
+    """选择关卡奖励"""
+    select_reward_event = view.first_event(16)
+    if select_reward_event:
+        effect = select_reward_event.value_changes.effect
+        effect_list = dirty_value(effect, "effect_list")
+        level_reward_candidates = dirty_value(effect, "level_reward_candidates")
+        GAME_STATE.update_other_info(effect_list=effect_list, candidate_effect_list=level_reward_candidates, reason=".lq.Lobby.amuletActivitySelectRewardPack:16")
+    shop_event = view.first_event(12)
+    if shop_event:
+        stage, _ = _stage_ended(shop_event)
+        shop = shop_event.value_changes.shop
+        goods = dirty_value(shop, "goods")
+        refresh_price = dirty_value(shop, "refresh_price")
+        # AmuletEventData 本身没有 ended 字段，这里恒为 False
+        GAME_STATE.update_other_info(stage=stage, goods=goods, refresh_price=refresh_price, ended=False, reason=".lq.Lobby.amuletActivitySelectRewardPack:12")
+    return "pass", None
+
+
+@register_hook("Res", ".lq.Lobby.amuletActivityUpgradeShopBuff", events=(21,))
+def _res_upgrade_shop_buff(view) -> Tuple[str, Any]:
+    """升级增益"""
+    upgrade_shop_buff = view.first_event(21)
+    if upgrade_shop_buff:
+        value_changes = upgrade_shop_buff.value_changes
+        coin = int(dirty_value(value_changes.game, "coin"))
+        record = _record_dict(value_changes)
+        GAME_STATE.update_record(record)
+        GAME_STATE.update_other_info(coin=coin, reason=".lq.Lobby.amuletActivityUpgradeShopBuff:21")
+    return "pass", None
+
+
+def on_inbound(view: Dict) -> Tuple[str, Any]:
+    spec = HOOKS.get(view["type"], view["method"])
+    if spec is None:
+        return "pass", None
+    error = _error_of(view)
+    if error is not None:
+        logger.error(f"error occurred: {error}")
+        return "pass", None
+    return HOOKS.call(spec, view)
+
+
+# on_outbound / on_inbound 实际处理的 method（即上面登记过的）。addon 只把这些帧交给 hook，
+# 其余帧（心跳、登录、统计……）的 data 不会被读取，也就不会被解码
+OUTBOUND_METHODS = HOOKS.methods("Req")
+INBOUND_METHODS = HOOKS.methods("Res")
+
+
 def has_amulet_221(effects: List[Dict[str, Any]]) -> bool:
     for e in effects or []:
         try:
@@ -835,25 +872,20 @@ def reorder_wall_tiles_by_amulet221(
         deck_map: Union[Dict[int, str], List[Dict[str, Any]]],
         wall_tiles: List[int],
         effect_list: List[Dict[str, Any]],
+        codes: Optional[bytes] = None,
 ) -> List[int]:
+    """
+    护身符 221：牌山按 m/p/s 各 1,2,3,4,0,5..9、字牌 1..7 理牌（同牌保持原相对顺序）。
+    codes 为 GameState.tile_codes；不传则由 deck_map 现算。
+    """
     if not has_amulet_221(effect_list):
         return list(wall_tiles)
-    if isinstance(deck_map, dict):
-        id2tile: Dict[int, str] = deck_map
-    else:
-        id2tile = {int(x["id"]): str(x["tile"]) for x in deck_map}
-
-    suit_order_digits = ["1", "2", "3", "4", "0", "5", "6", "7", "8", "9"]
-    order = []
-    for s in ("m", "p", "s"):
-        order += [d + s for d in suit_order_digits]
-    order += [str(d) + "z" for d in range(1, 8)]
-
-    rank = {t: i for i, t in enumerate(order)}
-    original_index = {tid: i for i, tid in enumerate(wall_tiles)}
-
-    def sort_key(tid: int):
-        tile = id2tile.get(tid, "")
-        return rank.get(tile, len(order)), original_index[tid]
-
-    return sorted(wall_tiles, key=sort_key)
+    if codes is None:
+        if isinstance(deck_map, dict):
+            codes = encode_deck(deck_map)
+        else:
+            codes = encode_deck({int(x["id"]): str(x["tile"]) for x in deck_map})
+
+    n = len(codes)
+    # sorted 是稳定排序：只按牌种排即可保持原始相对顺序
+    return sorted(wall_tiles, key=lambda tid: WALL_RANK[codes[tid]] if tid < n else WALL_RANK[UNKNOWN])
@@ -0,0 +1,313 @@
+"""
+protobuf <-> dict 转换与 protobuf 运行时检测。
+
+json_format.MessageToDict / ParseDict 无论底层是 upb、cpp 还是纯 Python 实现，本身都是纯 Python，
+逐字段查描述符、走通用分支，是解码的大头。这里按消息描述符缓存“字段 -> (json 名, 转换函数)”，
+直接遍历 ListFields()：
+  - message_to_dict(msg)      等价于 MessageToDict(msg, always_print_fields_with_no_presence=True)
+  - parse_dict(data, cls)     等价于 ParseDict(data, cls())；遇到少见写法（null、oneof、map、
+                              带空格的整数串……）整条退回 ParseDict，行为与报错完全一致
+set_converter("json_format") 可切回 json_format（对照、排查用）。
+"""
+from __future__ import annotations
+
+import base64
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import google.protobuf
+from google.protobuf import descriptor as _d
+from google.protobuf.internal import api_implementation, type_checkers
+from google.protobuf.json_format import MessageToDict, ParseDict
+from loguru import logger
+
+CONVERTERS = ("descriptor", "json_format")
+_converter = "descriptor"
+
+
+def protobuf_backend() -> str:
+    """当前 protobuf 运行时：upb / cpp / python"""
+    return api_implementation.Type()
+
+
+def backend_info() -> Dict[str, str]:
+    return {"implementation": protobuf_backend(), "version": google.protobuf.__version__, "converter": _converter}
+
+
+def log_backend() -> None:
+    info = backend_info()
+    if info["implementation"] == "python":
+        logger.warning(
+            f"[protobuf] {info['version']} 使用纯 Python 实现，解码会慢一个数量级；"
+            f"请安装带 upb 的官方 wheel（protobuf>=4.21），并确认没有设置 PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=python"
+        )
+    else:
+        logger.info(f"[protobuf] {info['version']} backend={info['implementation']} converter={info['converter']}")
+
+
+def set_converter(name: str) -> None:
+    global _converter
+    if name not in CONVERTERS:
+        raise ValueError(f"unknown converter: {name}")
+    _converter = name
+
+
+# ---------- message -> dict ----------
+
+_INT64 = {_d.FieldDescriptor.CPPTYPE_INT64, _d.FieldDescriptor.CPPTYPE_UINT64}
+_LIST = object()
+_MAP = object()
+# descriptor -> ({field: (json 名, 转换函数或 None)}, [(json 名, 默认值)])；None 表示交给 MessageToDict
+_DEC: Dict[Any, Optional[Tuple[Dict[Any, Tuple[str, Optional[Callable]]], List[Tuple[str, Any]]]]] = {}
+
+
+def _float_json(v):
+    if math.isinf(v):
+        return "-Infinity" if v < 0 else "Infinity"
+    if math.isnan(v):
+        return "NaN"
+    return type_checkers.ToShortestFloat(v)
+
+
+def _double_json(v):
+    if math.isinf(v):
+        return "-Infinity" if v < 0 else "Infinity"
+    if math.isnan(v):
+        return "NaN"
+    return v
+
+
+def _bytes_json(v):
+    return base64.b64encode(v).decode("utf-8")
+
+
+def _scalar_conv(field) -> Optional[Callable]:
+    cpp = field.cpp_type
+    if cpp == _d.FieldDescriptor.CPPTYPE_MESSAGE:
+        return _to_dict
+    if cpp == _d.FieldDescriptor.CPPTYPE_ENUM:
+        names = {v.number: v.name for v in field.enum_type.values}
+        return lambda v: names.get(v, v)
+    if cpp in _INT64:
+        return str
+    if cpp == _d.FieldDescriptor.CPPTYPE_FLOAT:
+        return _float_json
+    if cpp == _d.FieldDescriptor.CPPTYPE_DOUBLE:
+        return _double_json
+    if field.type == _d.FieldDescriptor.TYPE_BYTES:
+        return _bytes_json
+    return None  # int32 / uint32 / bool / string 原样
+
+
+def _is_map(field) -> bool:
+    return field.message_type is not None and field.message_type.GetOptions().map_entry
+
+
+def _field_conv(field) -> Optional[Callable]:
+    if _is_map(field):
+        v_conv = _scalar_conv(field.message_type.fields_by_name["value"])
+
+        def conv_map(m):
+            out = {}
+            for k in m:
+                key = ("true" if k else "false") if isinstance(k, bool) else str(k)
+                out[key] = m[k] if v_conv is None else v_conv(m[k])
+            return out
+
+        return conv_map
+    conv = _scalar_conv(field)
+    if field.is_repeated:
+        if conv is None:
+            return list
+        return lambda vs: [conv(x) for x in vs]
+    return conv
+
+
+def _dec_plan(desc):
+    if desc.full_name.startswith("google.protobuf.") or desc.extensions or desc.is_extendable:
+        _DEC[desc] = None  # 知名类型（Timestamp、Any……）与扩展字段走 json_format
+        return None
+    fields = {}
+    defaults = []
+    for f in desc.fields:
+        name = f.json_name
+        fields[f] = (name, _field_conv(f))
+        if f.has_presence:
+            continue
+        if _is_map(f):
+            defaults.append((name, _MAP))
+        elif f.is_repeated:
+            defaults.append((name, _LIST))
+        else:
+            conv = _scalar_conv(f)
+            defaults.append((name, f.default_value if conv is None else conv(f.default_value)))
+    plan = _DEC[desc] = (fields, defaults)
+    return plan
+
+
+def _to_dict(msg) -> dict:
+    desc = msg.DESCRIPTOR
+    plan = _DEC[desc] if desc in _DEC else _dec_plan(desc)
+    if plan is None:
+        return MessageToDict(msg, always_print_fields_with_no_presence=True)
+    fields, defaults = plan
+    out = {}
+    for f, v in msg.ListFields():
+        name, conv = fields[f]
+        out[name] = v if conv is None else conv(v)
+    for name, default in defaults:
+        if name not in out:
+            out[name] = [] if default is _LIST else {} if default is _MAP else default
+    return out
+
+
+def message_to_dict(msg) -> dict:
+    if _converter == "json_format":
+        return MessageToDict(msg, always_print_fields_with_no_presence=True)
+    return _to_dict(msg)
+
+
+# ---------- dict -> message ----------
+
+class _Fallback(Exception):
+    """快速路径不处理的写法：整条交给 ParseDict"""
+
+
+_ENC: Dict[Any, Dict[str, Tuple[Any, Callable]]] = {}  # descriptor -> {json 名 / 字段名: (field, 写入函数)}
+_FLOAT_MAX = type_checkers._FLOAT_MAX
+
+
+def _int_value(v):
+    t = type(v)
+    if t is int:
+        return v
+    if t is str and v.lstrip("-").isdigit():
+        return int(v)  # int64 在 dict 里是字符串
+    raise _Fallback
+
+
+def _float_value(v, single: bool):
+    if type(v) not in (int, float) or not math.isfinite(v) or (single and abs(v) > _FLOAT_MAX):
+        raise _Fallback
+    return float(v)
+
+
+def _bytes_value(v):
+    encoded = v.encode("utf-8") if isinstance(v, str) else v
+    if not isinstance(encoded, bytes):
+        raise _Fallback
+    return base64.urlsafe_b64decode(encoded + b"=" * (4 - len(encoded) % 4))
+
+
+def _scalar_value(field) -> Callable:
+    cpp = field.cpp_type
+    if cpp in (_d.FieldDescriptor.CPPTYPE_INT32, _d.FieldDescriptor.CPPTYPE_UINT32) or cpp in _INT64:
+        return _int_value
+    if cpp == _d.FieldDescriptor.CPPTYPE_FLOAT:
+        return lambda v: _float_value(v, True)
+    if cpp == _d.FieldDescriptor.CPPTYPE_DOUBLE:
+        return lambda v: _float_value(v, False)
+    if cpp == _d.FieldDescriptor.CPPTYPE_BOOL:
+        def as_bool(v):
+            if type(v) is not bool:
+                raise _Fallback
+            return v
+
+        return as_bool
+    if cpp == _d.FieldDescriptor.CPPTYPE_ENUM:
+        by_name = {v.name: v.number for v in field.enum_type.values}
+
+        def as_enum(v):
+            n = by_name.get(v) if type(v) is str else None
+            if n is None:
+                raise _Fallback
+            return n
+
+        return as_enum
+    if field.type == _d.FieldDescriptor.TYPE_BYTES:
+        return _bytes_value
+
+    def as_str(v):
+        if type(v) is not str:
+            raise _Fallback
+        return v
+
+    return as_str
+
+
+def _setter(field) -> Callable:
+    name = field.name
+    if field.containing_oneof is not None or _is_map(field):
+        def unsupported(msg, v):
+            raise _Fallback
+
+        return unsupported
+    if field.cpp_type == _d.FieldDescriptor.CPPTYPE_MESSAGE:
+        if field.is_repeated:
+            def set_messages(msg, vs):
+                if type(vs) not in (list, tuple):
+                    raise _Fallback
+                rep = getattr(msg, name)
+                del rep[:]
+                for item in vs:
+                    _fill(rep.add(), item)
+
+            return set_messages
+
+        def set_message(msg, v):
+            sub = getattr(msg, name)
+            sub.SetInParent()
+            _fill(sub, v)
+
+        return set_message
+    conv = _scalar_value(field)
+    if field.is_repeated:
+        def set_scalars(msg, vs):
+            if type(vs) not in (list, tuple):
+                raise _Fallback
+            rep = getattr(msg, name)
+            del rep[:]
+            rep.extend([conv(x) for x in vs])
+
+        return set_scalars
+
+    def set_scalar(msg, v):
+        setattr(msg, name, conv(v))
+
+    return set_scalar
+
+
+def _enc_plan(desc) -> Dict[str, Tuple[Any, Callable]]:
+    if desc.full_name.startswith("google.protobuf.") or desc.is_extendable:
+        raise _Fallback
+    plan = {}
+    for f in desc.fields:
+        s = _setter(f)
+        plan[f.name] = (f, s)
+        plan[f.json_name] = (f, s)
+    _ENC[desc] = plan
+    return plan
+
+
+def _fill(msg, data) -> None:
+    if type(data) is not dict:
+        raise _Fallback
+    desc = msg.DESCRIPTOR
+    plan = _ENC.get(desc) or _enc_plan(desc)
+    for key, value in data.items():
+        item = plan.get(key)
+        if item is None or value is None:
+            raise _Fallback  # 未知字段 / null：由 ParseDict 给出同样的结果或报错
+        item[1](msg, value)
+
+
+def parse_dict(data: dict, cls):
+    """ParseDict(data, cls()) 的快速版本，返回新消息"""
+    if _converter == "descriptor":
+        msg = cls()
+        try:
+            _fill(msg, data)
+            return msg
+        except (_Fallback, TypeError, ValueError, OverflowError):
+            pass
+    return ParseDict(data, cls())
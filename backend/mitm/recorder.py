@@ -0,0 +1,71 @@
+"""
+WebSocket 原始帧录制（只追加的紧凑二进制格式），供 backend.mitm.replay 离线回放。
+
+文件格式：
+  文件头  MAGIC (8 字节)
+  每帧    <d B I> = 时间戳(epoch 秒, float64) + 方向(1=客户端发出, 0=服务端下发) + 长度(uint32)
+          紧跟 长度 字节的原始帧（即 LiqiCodec.parse_frame 的输入）
+"""
+from __future__ import annotations
+
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from loguru import logger
+
+MAGIC = b"LQFRAME1"
+_HEAD = struct.Struct("<dBI")
+
+
+class FrameRecorder:
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new_file = not self.path.exists() or self.path.stat().st_size == 0
+        self._fp: Optional[BinaryIO] = open(self.path, "ab")
+        if new_file:
+            self._fp.write(MAGIC)
+        self._lock = threading.Lock()
+        self.frames = 0
+        logger.info(f"[recorder] recording ws frames -> {self.path}")
+
+    def write(self, content: bytes, from_client: bool, ts: Optional[float] = None) -> None:
+        fp = self._fp
+        if fp is None:
+            return
+        head = _HEAD.pack(time.time() if ts is None else ts, 1 if from_client else 0, len(content))
+        with self._lock:
+            fp.write(head)
+            fp.write(content)
+            self.frames += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._fp is not None:
+                self._fp.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+                logger.info(f"[recorder] closed {self.path} ({self.frames} frames)")
+
+
+def iter_frames(path: str | Path) -> Iterator[Tuple[float, bool, bytes]]:
+    """依次读出 (时间戳, from_client, 原始帧)；末尾不完整的帧（录制中断）直接忽略"""
+    with open(path, "rb") as fp:
+        if fp.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"not a frame capture: {path}")
+        while True:
+            head = fp.read(_HEAD.size)
+            if len(head) < _HEAD.size:
+                return
+            ts, direction, n = _HEAD.unpack(head)
+            content = fp.read(n)
+            if len(content) < n:
+                return
+            yield ts, bool(direction), content
@@ -0,0 +1,161 @@
+"""
+离线回放录制的 WebSocket 帧（见 backend.mitm.recorder），不需要 mitmproxy、游戏或网络。
+
+    python -m backend.mitm.replay captures/20250101_120000.lqfr
+    python -m backend.mitm.replay FILE --no-hooks        # 只测解码
+    python -m backend.mitm.replay FILE --repeat 5 --top 30
+
+按录制顺序全速把每帧送进 LiqiCodec.parse_frame，再与线上一样只把 hooks.OUTBOUND_METHODS / INBOUND_METHODS
+里的帧交给 hooks.on_outbound / on_inbound（从而驱动 GAME_STATE），最后输出：总帧率、各 method 的解码耗时、
+各 method 的 hook 耗时、hook 返回的动作计数，以及真正解码了 data 的帧数。
+
+回放时自动打牌/自摸与帧录制会被临时关闭（只改内存，不写配置）；
+熔断确认框按 --confirm 直接给出答复，不会弹窗等待。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend.mitm.codec import LiqiCodec
+from backend.mitm.recorder import iter_frames
+
+
+class _Timing:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, dt: float) -> None:
+        self.count += 1
+        self.total += dt
+        if dt > self.max:
+            self.max = dt
+
+
+def _print_table(title: str, rows: Dict[str, _Timing], top: int) -> None:
+    print(f"\n{title}")
+    if not rows:
+        print("  (none)")
+        return
+    print(f"  {'method':<56} {'count':>7} {'total ms':>10} {'avg us':>9} {'max us':>9}")
+    for name, t in sorted(rows.items(), key=lambda kv: kv[1].total, reverse=True)[:top]:
+        print(f"  {name:<56} {t.count:>7} {t.total * 1e3:>10.2f} {t.total / t.count * 1e6:>9.1f} {t.max * 1e6:>9.1f}")
+
+
+def _prepare_hooks(confirm: bool) -> Tuple[Tuple[Callable, frozenset], Tuple[Callable, frozenset]]:
+    # 导入 hooks 会带起 backend.app（配置、GAME_STATE、推荐引擎等），只在需要时导入
+    import backend.app
+    from backend.mitm import hooks
+
+    for key in ("game.auto_discard", "game.auto_tsumo", "general.record_frames"):
+        backend.app.MANAGER.set(key, False)
+    hooks._ui_confirm_blocking = lambda **_: confirm
+    hooks._confirm = lambda *_, **__: confirm
+    return (hooks.on_outbound, hooks.OUTBOUND_METHODS), (hooks.on_inbound, hooks.INBOUND_METHODS)
+
+
+async def replay(
+        path: Path,
+        *,
+        use_hooks: bool = True,
+        repeat: int = 1,
+        confirm: bool = False,
+        top: int = 20,
+) -> None:
+    frames: List[Tuple[float, bool, bytes]] = list(iter_frames(path))
+    if not frames:
+        print(f"{path}: no frames")
+        return
+    span = frames[-1][0] - frames[0][0]
+    print(f"{path}: {len(frames)} frames, {sum(len(c) for _, _, c in frames)} bytes, captured over {span:.1f}s")
+
+    on_outbound: Optional[Tuple[Callable, frozenset]] = None
+    on_inbound: Optional[Tuple[Callable, frozenset]] = None
+    if use_hooks:
+        on_outbound, on_inbound = _prepare_hooks(confirm)
+
+    decode: Dict[str, _Timing] = defaultdict(_Timing)
+    hook_cost: Dict[str, _Timing] = defaultdict(_Timing)
+    actions: Counter = Counter()
+    errors: Counter = Counter()
+
+    started = time.perf_counter()
+    total = 0
+    decoded = 0
+    for _ in range(repeat):
+        # 每轮用新的 codec：Req/Res 的 id 配对状态从头开始
+        codec = LiqiCodec()
+        for _, from_client, content in frames:
+            total += 1
+            t0 = time.perf_counter()
+            try:
+                view = codec.parse_frame(content, from_client)
+            except Exception as e:
+                errors[f"decode: {type(e).__name__}"] += 1
+                continue
+            t1 = time.perf_counter()
+            method = view.get("method") or "?"
+            decode[method].add(t1 - t0)
+
+            hook = on_outbound if from_client else on_inbound
+            if hook is not None and method in hook[1]:
+                try:
+                    action, payload = hook[0](view)
+                except Exception as e:
+                    errors[f"hook {method}: {type(e).__name__}"] += 1
+                    continue
+                hook_cost[method].add(time.perf_counter() - t1)
+                if action == "hold":
+                    # 熔断确认：和 addon 一样等答复，放行记为 pass，否则 drop（等待时间不计入 hook 耗时）
+                    action = "pass" if await payload() else "drop"
+                    if action == "drop" and view.get("type") == "Req":
+                        codec.discard_req(view["id"])
+                actions[action] += 1
+            decoded += view.decoded
+        # 让 hooks 里 create_task 出来的广播等协程有机会跑完
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+
+    print(f"replayed {total} frames in {elapsed * 1e3:.1f} ms -> {total / elapsed:,.0f} frames/s")
+    print(f"payload decoded for {decoded}/{total} frames (the rest were never read)")
+    print("request ids (last round): " + ", ".join(f"{k}={v}" for k, v in codec.req_id_stats().items()))
+    _print_table("decode (LiqiCodec.parse_frame)", decode, top)
+    if use_hooks:
+        _print_table("hooks (on_outbound / on_inbound)", hook_cost, top)
+        print("\nhook actions: " + ", ".join(f"{k}={v}" for k, v in actions.most_common()))
+    if errors:
+        print("\nerrors:")
+        for k, v in errors.most_common():
+            print(f"  {k}: {v}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m backend.mitm.replay", description="离线回放录制的 WebSocket 帧")
+    p.add_argument("capture", type=Path, help="录制文件（*.lqfr）")
+    p.add_argument("--no-hooks", action="store_true", help="只解码，不调用 hooks / 不更新 GAME_STATE")
+    p.add_argument("--repeat", type=int, default=1, help="重复回放次数")
+    p.add_argument("--confirm", choices=("yes", "no"), default="no", help="熔断确认框的固定答复")
+    p.add_argument("--top", type=int, default=20, help="每张表最多显示的 method 数")
+    args = p.parse_args(argv)
+
+    asyncio.run(replay(
+        args.capture,
+        use_hooks=not args.no_hooks,
+        repeat=max(1, args.repeat),
+        confirm=args.confirm == "yes",
+        top=args.top,
+    ))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Req id -> (method, 响应类) 的配对表（LiqiCodec 用来解码 Res）。
+
+旧实现是一个只增不减的 dict：被 drop 的请求、超时的请求、响应被吞掉的注入请求都会永久留在里面。
+这里限定容量并给每项一个 TTL：
+  - 过期项在每次登记/分配时从最旧端顺带清掉（插入顺序即到期顺序，均摊 O(1)）
+  - 超出容量时淘汰最旧的一项
+  - 过期与淘汰都会记日志并计数，stats() 可查
+注入用的空闲 id 由 allocate() 给出：优先调用方给的 hint，其次最近释放的 id，不再逐个向下试探。
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from loguru import logger
+
+ID_MASK = 0xFFFF  # Req/Res 帧头里的 id 是 uint16
+
+
+class RequestIdTable:
+    def __init__(self, capacity: int = 1024, ttl: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[int, Tuple[str, Any, float]]" = OrderedDict()  # id -> (method, 响应类, 到期时刻)
+        self._free: deque = deque(maxlen=capacity)  # 最近释放（已配对/过期/淘汰）的 id
+        self._lock = threading.Lock()
+        self.registered = 0
+        self.matched = 0
+        self.expired = 0
+        self.evicted = 0
+        self.allocated = 0
+
+    def put(self, msg_id: int, method: str, resp_cls) -> None:
+        now = self._clock()
+        with self._lock:
+            self._sweep(now)
+            self._entries.pop(msg_id, None)
+            self._entries[msg_id] = (method, resp_cls, now + self.ttl)
+            self.registered += 1
+            while len(self._entries) > self.capacity:
+                old_id, (old_method, _, _) = self._entries.popitem(last=False)
+                self._free.append(old_id)
+                self.evicted += 1
+                logger.warning(f"[reqtable] evicted id={old_id} ({old_method}): table full ({self.capacity})")
+
+    def pop(self, msg_id: int) -> Optional[Tuple[str, Any]]:
+        """取出并移除配对项；已过期但还没被清掉的照样返回（迟到的响应也能解）"""
+        with self._lock:
+            item = self._entries.pop(msg_id, None)
+            if item is None:
+                return None
+            self._free.append(msg_id)
+            self.matched += 1
+            return item[0], item[1]
+
+    def allocate(self, hint: int) -> int:
+        """给注入的 Req 挑一个当前没有在等响应的 id（不登记，登记仍由组帧/解帧完成）"""
+        hint &= ID_MASK
+        with self._lock:
+            self._sweep(self._clock())
+            self.allocated += 1
+            if hint not in self._entries:
+                return hint
+            while self._free:
+                i = self._free.pop()
+                if i not in self._entries:
+                    return i
+            # 释放队列也用完了：表里至多 capacity 项，向下探测必在 capacity + 1 步内找到空位
+            i = (hint - 1) & ID_MASK
+            while i in self._entries:
+                i = (i - 1) & ID_MASK
+            return i
+
+    def _sweep(self, now: float) -> None:
+        entries = self._entries
+        while entries:
+            msg_id, (method, _, deadline) = next(iter(entries.items()))
+            if deadline > now:
+                break
+            entries.popitem(last=False)
+            self._free.append(msg_id)
+            self.expired += 1
+            logger.warning(f"[reqtable] expired id={msg_id} ({method}): no response within {self.ttl:.0f}s")
+
+    def sweep(self) -> None:
+        with self._lock:
+            self._sweep(self._clock())
+
+    def __contains__(self, msg_id) -> bool:
+        return msg_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "ttl": self.ttl,
+                "registered": self.registered,
+                "matched": self.matched,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "allocated": self.allocated,
+            }
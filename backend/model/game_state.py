@@ -6,6 +6,8 @@ from collections import OrderedDict
 from dataclasses import dataclass, field
 from typing import List, Dict
 
+from backend.model.tiles import encode_deck
+
 
 @dataclass
 class GameState:
@@ -38,6 +40,7 @@ class GameState:
     boss_buff: List[int] = field(default_factory=list)
 
     update_reason: List[str] = field(default_factory=list)
+    tile_codes: bytes = b""  # tile id → 牌码（见 backend.model.tiles），随 deck_map 一起更新，不下发前端
 
     def to_dict(self) -> dict:
         """
@@ -95,6 +98,7 @@ class GameState:
         self.stage = -1
         for item in pool:
             self.deck_map[item["id"]] = item["tile"]
+        self.tile_codes = encode_deck(self.deck_map)
         temp = self.deck_map.copy()
         self.hand_tiles = hand_tiles.copy()
         for hand_tile_id in hand_tiles:
@@ -208,6 +212,7 @@ class GameState:
     def on_giveup(self):
         self.stage = -1
         self.deck_map.clear()
+        self.tile_codes = b""
         self.hand_tiles.clear()
         self.dora_tiles.clear()
         self.replacement_tiles.clear()
@@ -0,0 +1,111 @@
+"""
+牌面编码：把 "3p" / "0m" / "bd" 这样的牌面字符串映射成一个字节的牌码。
+
+  低 6 位：牌种 kind
+      0..8   = 1m..9m
+      9..17  = 1p..9p
+      18..26 = 1s..9s
+      27..33 = 1z..7z
+      34     = 癞子（bd）
+      35     = 未知牌面
+  0x40   ：红五标记（0m/0p/0s 的 kind 与对应 5 相同，另加此位）
+
+每次 GameState.update_pool 时按 tile id 建一张 bytes 表（encode_deck），
+推荐器、排序等热路径直接查表，不再做字符串解析和字典查找。
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Mapping, Tuple
+
+KIND_MASK = 0x3F
+RED = 0x40
+
+JOKER = 34
+UNKNOWN = 35
+N_KINDS = 34  # 不含癞子/未知
+
+JOKER_FACE = "bd"
+
+_FACE_TO_CODE: Dict[str, int] = {JOKER_FACE: JOKER}
+for _si, _s in enumerate("mps"):
+    for _r in range(1, 10):
+        _FACE_TO_CODE[f"{_r}{_s}"] = _si * 9 + _r - 1
+    _FACE_TO_CODE[f"0{_s}"] = (_si * 9 + 4) | RED
+for _r in range(1, 8):
+    _FACE_TO_CODE[f"{_r}z"] = 27 + _r - 1
+
+# kind -> 归一后的牌面（红五归到 5），癞子为 "bd"
+KIND_FACE: List[str] = [""] * (UNKNOWN + 1)
+for _f, _c in _FACE_TO_CODE.items():
+    if not _c & RED:
+        KIND_FACE[_c] = _f
+KIND_FACE[UNKNOWN] = "??"
+
+# code -> 原始牌面
+CODE_FACE: Dict[int, str] = {c: f for f, c in _FACE_TO_CODE.items()}
+
+
+def encode_face(face: str) -> int:
+    return _FACE_TO_CODE.get(face, UNKNOWN)
+
+
+def encode_deck(deck_map: Mapping[int, str]) -> bytes:
+    """tile id -> 牌码 的紧凑数组；未出现的 id 为 UNKNOWN"""
+    if not deck_map:
+        return b""
+    arr = bytearray([UNKNOWN]) * (max(deck_map) + 1)
+    for tid, face in deck_map.items():
+        arr[tid] = _FACE_TO_CODE.get(face, UNKNOWN)
+    return bytes(arr)
+
+
+def kind_of(code: int) -> int:
+    return code & KIND_MASK
+
+
+def is_red(code: int) -> bool:
+    return bool(code & RED)
+
+
+def _hand_sort_key(code: int) -> Tuple[int, int]:
+    # 与 handmap 的排序规则一致：bd 最左；数牌 1..9 且红五介于 4 与 5 之间；字牌 1..7；未知最后
+    k = code & KIND_MASK
+    if k == JOKER:
+        return -1, -999
+    if k >= UNKNOWN:
+        return 999, 999
+    suit, r = divmod(k, 9)
+    if suit == 3:
+        return 3, r + 1
+    return suit, 45 if code & RED else (r + 1) * 10
+
+
+def _wall_rank(code: int) -> int:
+    # 护身符 221 的理牌顺序：m/p/s 各按 1,2,3,4,0,5..9，字牌 1..7；其余排最后
+    k = code & KIND_MASK
+    if k >= JOKER:
+        return 37
+    suit, r = divmod(k, 9)
+    if suit == 3:
+        return 30 + r
+    if code & RED:
+        return suit * 10 + 4
+    return suit * 10 + (r if r < 4 else r + 1)
+
+
+HAND_SORT_KEY: List[Tuple[int, int]] = [_hand_sort_key(c) for c in range(256)]
+WALL_RANK: List[int] = [_wall_rank(c) for c in range(256)]
+
+# 饼子点数 1..9；非饼为 0
+PIN_RANK: List[int] = [0] * 256
+for _c in range(256):
+    _k = _c & KIND_MASK
+    if 9 <= _k <= 17:
+        PIN_RANK[_c] = _k - 8
+
+_FACE_SORT_KEY: Dict[str, Tuple[int, int]] = {f: HAND_SORT_KEY[c] for f, c in _FACE_TO_CODE.items()}
+
+
+def face_sort_key(face: str) -> Tuple[int, int]:
+    return _FACE_SORT_KEY.get(face, (999, 999))
@@ -1,10 +1,12 @@
 from __future__ import annotations
+from backend import startup  # 最先导入：启动计时从这里开始
 import argparse
 import asyncio
 from pathlib import Path
 from loguru import logger
 
 from backend.app import set_data_root, MANAGER, GAME_STATE, start_ui_services
+from backend.bot.drivers.packet.async_packet_bot import AsyncPacketBot
 from backend.bot.drivers.packet.packet_bot import PacketBot
 from backend.mitm import MitmBridge, hooks
 
@@ -18,12 +20,18 @@ def parse_args():
 
 
 async def main():
+    startup.mark("imports")
     args = parse_args()
     if args.data_root:
         set_data_root(Path(args.data_root))
 
     bridge = MitmBridge(MANAGER.get("backend.mitm_port", 10999))
-    bridge.set_hooks(on_outbound=hooks.on_outbound, on_inbound=hooks.on_inbound)
+    bridge.set_hooks(
+        on_outbound=hooks.on_outbound,
+        on_inbound=hooks.on_inbound,
+        outbound_methods=hooks.OUTBOUND_METHODS,
+        inbound_methods=hooks.INBOUND_METHODS,
+    )
 
     from backend import app as _app
     _app.PACKET_BOT = PacketBot(
@@ -31,6 +39,11 @@ async def main():
         activity_id=250811,
         state_getter=lambda: GAME_STATE,
     )
+    _app.ASYNC_PACKET_BOT = AsyncPacketBot(
+        addon_getter=lambda: bridge.addon,
+        activity_id=250811,
+        state_getter=lambda: GAME_STATE,
+    )
 
     start_ui_services(
         host="127.0.0.1",
@@ -0,0 +1,30 @@
+"""
+启动耗时打点。run_server 最先导入本模块，T0 取导入时刻（解释器自身的启动不计在内）。
+
+    mark("imports")          # 后端模块导入完毕
+    mark("proxy listening")  # mitmproxy 开始监听（WsAddon.running）
+
+游戏要等代理起来才能连上，所以“到开始监听”这段直接就是用户等待的时间。
+"""
+from __future__ import annotations
+
+import time
+from typing import Dict
+
+from loguru import logger
+
+T0 = time.perf_counter()
+_MARKS: Dict[str, float] = {}
+
+
+def mark(name: str) -> float:
+    """记录从 T0 到现在的秒数（同名只记第一次）并写日志"""
+    dt = time.perf_counter() - T0
+    if name not in _MARKS:
+        _MARKS[name] = dt
+        logger.info(f"[startup] {name}: {dt * 1e3:.0f} ms")
+    return dt
+
+
+def marks() -> Dict[str, float]:
+    return dict(_MARKS)
@@ -0,0 +1,141 @@
+"""
+amuletActivityUpgrade 响应的基准：对比 hooks 读取回合信息（type=23 事件）的两种方式。
+
+  - dict  : 整条 FromString + MessageToDict，再沿 .get("valueChanges", {}).get("round", {})... 取字段（旧实现）
+  - typed : 只 FromString，按属性读字段，只把交给 GAME_STATE 的几段转成 dict（现在 on_inbound 的做法）
+
+用法（仓库根目录）：
+    python scripts/bench_amulet_upgrade.py [录制文件.lqfr] [--repeat N]
+
+给了录制文件（general.record_frames 录下的）就用其中全部 amuletActivityUpgrade 响应，
+否则用一条按实际对局结构构造的响应。两种方式取出的字段必须一致。
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from google.protobuf.json_format import ParseDict  # noqa: E402
+
+from backend.mitm.codec import LiqiCodec, dirty_value, message_to_dict  # noqa: E402
+from backend.mitm.recorder import iter_frames  # noqa: E402
+from proto import liqi_pb2 as pb  # noqa: E402
+
+METHOD = ".lq.Lobby.amuletActivityUpgrade"
+TILES = [f"{d}{s}" for s in "mps" for d in range(1, 10)] + [f"{d}z" for d in range(1, 8)]
+
+
+def sample_response() -> bytes:
+    effect = {"id": 2210, "uid": 1, "store": ["3", "12"], "badge": {"id": 600100, "uid": 7, "store": ["1"]}, "volume": 1}
+    upgrade = {
+        "events": [
+            {
+                "type": 23,
+                "valueChanges": {
+                    "round": {
+                        "pool": {"dirty": True, "value": [{"id": i, "tile": TILES[i % len(TILES)]} for i in range(136)]},
+                        "hands": {"dirty": True, "value": list(range(14))},
+                        "lockedTile": {"dirty": True, "value": [40, 41]},
+                        "changeTileCount": {"dirty": True, "value": 3},
+                        "totalChangeTileCount": {"dirty": True, "value": 3},
+                        "nextOperation": {"dirty": True, "value": [{"type": 1}, {"type": 5, "value": 2}]},
+                        "tingList": {"dirty": True, "value": [{"tile": "1p", "fan": "8", "tingTile": "1p"}] * 3},
+                        "desktopRemain": {"dirty": True, "value": 36},
+                        "showDesktopTiles": {"dirty": True, "value": [{"id": i, "pos": i} for i in range(14, 50)]},
+                    },
+                    "effect": {"effectList": {"dirty": True, "value": [dict(effect, uid=u) for u in range(12)]}},
+                    "game": {"level": {"dirty": True, "value": 4}, "bossBuff": {"dirty": True, "value": [3]}},
+                    "record": {"roundCount": {"dirty": True, "value": 9}, "coinGain": {"dirty": True, "value": "1200"}},
+                    "stage": 3,
+                },
+            },
+            {"type": 19, "valueChanges": {"stage": 4}},
+            {"type": 48, "valueChanges": {"game": {"coin": {"dirty": True, "value": "350"}}}},
+            {"type": 49, "valueChanges": {"stage": 4}},
+        ],
+    }
+    return ParseDict(upgrade, pb.ResAmuletEventResponse()).SerializeToString()
+
+
+def captured_responses(path: str) -> list:
+    codec = LiqiCodec()
+    out = []
+    for _, from_client, content in iter_frames(path):
+        view = codec.parse_frame(content, from_client)
+        if view["type"] == "Res" and view["method"] == METHOD:
+            out.append(bytes(view.payload))
+    return out
+
+
+def read_dict(payload: bytes):
+    data = message_to_dict(pb.ResAmuletEventResponse.FromString(payload))
+    events = data.get("events", [])
+    matched = next((e for e in events if e.get("type") == 23), None)
+    if not matched:
+        return None
+    value_changes = matched.get("valueChanges", {})
+    round_info = value_changes.get("round", {})
+    return (
+        round_info.get("hands", {}).get("value", None),
+        round_info.get("pool", {}).get("value", None),
+        round_info.get("tingList", {}).get("value", None),
+        round_info.get("lockedTile", {}).get("value", None),
+        round_info.get("desktopRemain", {}).get("value", 0),
+        value_changes.get("effect", {}).get("effectList", {}).get("value", None),
+        value_changes.get("record", None),
+    )
+
+
+def read_typed(payload: bytes):
+    msg = pb.ResAmuletEventResponse.FromString(payload)
+    matched = next((e for e in msg.events if e.type == 23), None)
+    if not matched:
+        return None
+    value_changes = matched.value_changes
+    round_info = value_changes.round
+    return (
+        dirty_value(round_info, "hands"),
+        dirty_value(round_info, "pool"),
+        dirty_value(round_info, "ting_list"),
+        dirty_value(round_info, "locked_tile"),
+        dirty_value(round_info, "desktop_remain", 0),
+        dirty_value(value_changes.effect, "effect_list"),
+        message_to_dict(value_changes.record) if value_changes.HasField("record") else None,
+    )
+
+
+def bench(name, fn, payloads, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for p in payloads:
+            fn(p)
+    dt = (time.perf_counter() - t0) / (repeat * len(payloads))
+    print(f"{name:<6}: {dt * 1e6:8.1f} us/response")
+    return dt
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("capture", nargs="?", help="录制文件（*.lqfr）")
+    ap.add_argument("--repeat", type=int, default=300)
+    args = ap.parse_args()
+
+    payloads = captured_responses(args.capture) if args.capture else [sample_response()]
+    if not payloads:
+        print(f"{args.capture}: no {METHOD} responses")
+        return
+    print(f"{len(payloads)} responses, avg {sum(map(len, payloads)) / len(payloads):.0f} bytes")
+
+    for p in payloads:
+        assert read_dict(p) == read_typed(p), "dict 与 typed 取出的字段不一致"
+
+    d = bench("dict", read_dict, payloads, args.repeat)
+    t = bench("typed", read_typed, payloads, args.repeat)
+    print(f"typed / dict = {t / d:.2f}")
+    print("结果一致")
+
+
+if __name__ == "__main__":
+    main()
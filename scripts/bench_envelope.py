@@ -0,0 +1,102 @@
+"""
+LiqiCodec 外层信封解析的基准：对比旧的 bytes 切片与现在的 memoryview 视图。
+
+  - bytes      : content[3:] 再 from_protobuf，方法名与 payload 都切成新的 bytes（旧实现，原样保留在下面）
+  - memoryview : memoryview(content)[3:] 再 _envelope，两段都是原始帧上的视图
+
+用法（仓库根目录）：
+    python scripts/bench_envelope.py [每种大小的帧数]
+
+对几种 payload 大小分别报告每帧耗时，以及 tracemalloc 统计的每帧临时分配峰值（字节）
+和“相当于复制了几份 payload”。
+
+实测（连跑三次）：1 KB 以上 memoryview 更快、分配与 payload 大小无关（64 KB：约 3.6 us 对 8~15 us，
+956 B 对 131 KB）；但 64 字节的帧上 memoryview 反而略慢、分配更多（2.80 对 2.67 us，864 对 325 B/帧），
+视图对象本身比切出来的小 bytes 还大。心跳和大部分大厅消息都在这个量级，所以“不复制”只对大帧是净收益。
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.mitm.codec import _envelope, _parse_varint, _to_protobuf  # noqa: E402
+
+METHOD = b".lq.Lobby.amuletActivityOperate"
+
+
+def from_protobuf(buf: bytes):
+    # 改写前 codec._from_protobuf 的原样实现，作对照用
+    p = 0
+    out = []
+    while p < len(buf):
+        tag = buf[p]
+        p += 1
+        typ = tag & 7
+        fid = tag >> 3
+        if typ == 0:
+            val, p = _parse_varint(buf, p)
+            out.append({"id": fid, "type": "varint", "data": val})
+        elif typ == 2:
+            ln, p = _parse_varint(buf, p)
+            data = buf[p:p + ln]
+            p += ln
+            out.append({"id": fid, "type": "string", "data": data})
+        else:
+            raise ValueError(f"wire={typ}")
+    return out
+
+
+def make_frame(size: int, rnd: random.Random) -> bytes:
+    blk = [
+        {"id": 1, "type": "string", "data": METHOD},
+        {"id": 2, "type": "string", "data": rnd.randbytes(size)},
+    ]
+    return b"\x02" + (7).to_bytes(2, "little") + _to_protobuf(blk)
+
+
+def parse_bytes(content: bytes):
+    blk = from_protobuf(content[3:])
+    return blk[0]["data"].decode(errors="ignore"), blk[1]["data"]
+
+
+def parse_view(content: bytes):
+    method, payload = _envelope(memoryview(content)[3:])
+    return str(method, "utf-8", "ignore"), payload
+
+
+def measure(fn, frames):
+    t0 = time.perf_counter()
+    for f in frames:
+        fn(f)
+    dt = (time.perf_counter() - t0) / len(frames)
+
+    tracemalloc.start()
+    peak_total = 0
+    for f in frames:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        out = fn(f)
+        peak_total += tracemalloc.get_traced_memory()[1] - base
+        del out
+    tracemalloc.stop()
+    return dt, peak_total / len(frames)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rnd = random.Random(0)
+    print(f"{'payload':>8}  {'impl':<10} {'us/frame':>9} {'alloc B/frame':>14} {'payload copies':>15}")
+    for size in (64, 1024, 16384, 65536):
+        frames = [make_frame(size, rnd) for _ in range(max(10, count * 64 // max(size, 64)))]
+        assert parse_bytes(frames[0])[0] == parse_view(frames[0])[0]
+        assert parse_bytes(frames[0])[1] == bytes(parse_view(frames[0])[1])
+        for name, fn in (("bytes", parse_bytes), ("memoryview", parse_view)):
+            dt, peak = measure(fn, frames)
+            print(f"{size:>8}  {name:<10} {dt * 1e6:>9.2f} {peak:>14.0f} {peak / size:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
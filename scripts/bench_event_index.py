@@ -0,0 +1,82 @@
+"""
+amuletActivityOperate 响应按事件 type 取事件的基准：
+
+  - scan  : 每个 type 一次 next((e for e in events if e.type == t), None)（旧写法，每次都从头扫）
+  - index : FrameView.index_events 一趟建 {type: [事件]}，再 first_event(t)（现在 hook 分发的做法）
+
+用法（仓库根目录）：
+    python scripts/bench_event_index.py [--events N] [--repeat N]
+
+构造一条带 N 个事件（摸牌、护身符触发链……）的响应，两种方式取到的事件必须是同一批。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.mitm.codec import FrameView  # noqa: E402
+from proto import liqi_pb2 as pb  # noqa: E402
+
+METHOD = ".lq.Lobby.amuletActivityOperate"
+OPERATE_TYPES = (100, 4, 6, 11, 12, 15, 24)  # hooks 里 amuletActivityOperate 处理的事件
+
+
+def sample_response(n_events: int) -> bytes:
+    rnd = random.Random(0)
+    msg = pb.ResAmuletEventResponse()
+    # 实际对局里大部分是护身符/印章触发的事件，hook 关心的只有少数几种
+    for _ in range(n_events):
+        e = msg.events.add(type=rnd.choice((5, 7, 8, 9, 10, 25, 26, 27, 6, 11)))
+        for _ in range(rnd.randrange(4)):
+            e.effected_hooks.add(id=rnd.randrange(1000), uid=rnd.randrange(40))
+        e.value_changes.stage = 3
+    return msg.SerializeToString()
+
+
+def view_of(payload: bytes) -> FrameView:
+    return FrameView(1, "Res", METHOD, False, b"", cls=pb.ResAmuletEventResponse, payload=payload)
+
+
+def by_scan(view):
+    events = view.message.events
+    return [next((e for e in events if e.type == t), None) for t in OPERATE_TYPES]
+
+
+def by_index(view):
+    view.index_events(OPERATE_TYPES)
+    return [view.first_event(t) for t in OPERATE_TYPES]
+
+
+def bench(fn, payload: bytes, repeat: int) -> float:
+    views = [view_of(payload) for _ in range(repeat)]
+    for v in views:
+        v.message  # 只比较取事件，FromString 不计入
+    t0 = time.perf_counter()
+    for v in views:
+        fn(v)
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=60)
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args()
+
+    payload = sample_response(args.events)
+    a, b = by_scan(view_of(payload)), by_index(view_of(payload))
+    assert [x.SerializeToString() if x else None for x in a] == [x.SerializeToString() if x else None for x in b]
+
+    scan = bench(by_scan, payload, args.repeat)
+    index = bench(by_index, payload, args.repeat)
+    print(f"{args.events} events, {len(OPERATE_TYPES)} lookups")
+    print(f"scan  : {scan * 1e6:7.1f} us/response")
+    print(f"index : {index * 1e6:7.1f} us/response  ({scan / index:.1f}x)")
+    print("结果一致")
+
+
+if __name__ == "__main__":
+    main()
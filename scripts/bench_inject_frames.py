@@ -0,0 +1,101 @@
+"""
+注入 Req 组帧的基准：PacketBot 每次操作（出牌、买卡、刷新商店……）都要组一帧 Req。
+
+  - old      : 整条 ParseDict + SerializeToString + _to_protobuf 拼外层，再 parse_frame 自己的帧来登记响应类型
+  - template : LiqiCodec.build_frame（按 method 的 ReqTemplate 拼帧，直接登记响应类型）
+
+用法（仓库根目录）：
+    python scripts/bench_inject_frames.py [--repeat N] [--check N]
+
+先校验逐字节一致：PacketBot 的各类请求，以及 liqi 里每个 RPC 的请求各随机填充 --check 条。
+"""
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from google.protobuf.json_format import MessageToDict, ParseDict  # noqa: E402
+
+from backend.mitm.codec import LiqiCodec, _to_protobuf, default_method_index  # noqa: E402
+from bench_pbconv import fill_random  # noqa: E402
+
+ACTIVITY = 250811
+PACKET_BOT = [
+    (".lq.Lobby.amuletActivityOperate", lambda r: {"activityId": ACTIVITY, "type": 1, "tileList": [r.randrange(136)]}),
+    (".lq.Lobby.amuletActivityOperate", lambda r: {"activityId": ACTIVITY, "type": 8, "tileList": []}),
+    (".lq.Lobby.amuletActivityOperate", lambda r: {"activityId": ACTIVITY, "type": 101, "tileList": r.sample(range(136), 3)}),
+    (".lq.Lobby.amuletActivityBuy", lambda r: {"activityId": ACTIVITY, "id": r.randrange(1, 7)}),
+    (".lq.Lobby.amuletActivityRefreshShop", lambda r: {"activityId": ACTIVITY}),
+    (".lq.Lobby.amuletActivitySellEffect", lambda r: {"activityId": ACTIVITY, "id": r.randrange(1, 40)}),
+    (".lq.Lobby.amuletActivitySelectPack", lambda r: {"activityId": ACTIVITY, "id": r.randrange(0, 3)}),
+    (".lq.Lobby.amuletActivityEndShopping", lambda r: {"activityId": ACTIVITY}),
+    (".lq.Lobby.amuletActivityUpgrade", lambda r: {"activityId": ACTIVITY}),
+    (".lq.Route.heartbeat", lambda r: {"delay": 100, "platform": 5, "networkQuality": 100, "noOperationCounter": 0}),
+]
+
+
+def old_frame(codec: LiqiCodec, method: str, data: dict, msg_id: int) -> bytes:
+    req_cls, _ = default_method_index()[method]
+    blk = [
+        {"id": 1, "type": "string", "data": method.encode()},
+        {"id": 2, "type": "string", "data": ParseDict(data, req_cls()).SerializeToString()},
+    ]
+    frame = b"\x02" + struct.pack("<H", msg_id) + _to_protobuf(blk)
+    codec.parse_frame(frame, from_client=True)  # 旧 inject_now：解自己的帧来登记 _res_map
+    return frame
+
+
+def new_frame(codec: LiqiCodec, method: str, data: dict, msg_id: int) -> bytes:
+    return codec.build_frame({"type": "Req", "method": method, "data": data, "id": msg_id})
+
+
+def check(per_method: int) -> int:
+    rnd = random.Random(0)
+    a, b = LiqiCodec(), LiqiCodec()
+    n = 0
+    cases = [(m, make(rnd)) for m, make in PACKET_BOT for _ in range(20)]
+    for method, (req_cls, _) in default_method_index().items():
+        for _ in range(per_method):
+            cases.append((method, MessageToDict(fill_random(req_cls(), rnd))))
+    for i, (method, data) in enumerate(cases):
+        msg_id = i & 0xFFFF
+        assert old_frame(a, method, data, msg_id) == new_frame(b, method, data, msg_id), (method, data)
+        assert (msg_id in a._res_map) and (msg_id in b._res_map)
+        a.discard_req(msg_id)
+        b.discard_req(msg_id)
+        n += 1
+    return n
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=2000)
+    ap.add_argument("--check", type=int, default=3, help="每个 RPC 的随机请求条数")
+    args = ap.parse_args()
+
+    print(f"consistency: {check(args.check)} frames identical")
+    rnd = random.Random(1)
+    ops = [(m, make(rnd)) for m, make in PACKET_BOT]
+    for name, fn in (("old", old_frame), ("template", new_frame)):
+        codec = LiqiCodec()
+        t0 = time.perf_counter()
+        for i in range(args.repeat):
+            for method, data in ops:
+                msg_id = i & 0xFFFF
+                fn(codec, method, data, msg_id)
+                codec.discard_req(msg_id)
+        dt = (time.perf_counter() - t0) / (args.repeat * len(ops))
+        print(f"{name:<9}: {dt * 1e6:6.2f} us/frame")
+        if name == "old":
+            old = dt
+    print(f"template / old = {dt / old:.2f}")
+    print("结果一致")
+
+
+if __name__ == "__main__":
+    main()
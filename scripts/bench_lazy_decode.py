@@ -0,0 +1,75 @@
+"""
+LiqiCodec 惰性解码的基准：用一段“空闲”流量（心跳、对时、登录心跳、账号信息、通知）对比
+
+  - eager : parse_frame 后立即读取 data（相当于旧实现每帧都 FromString + MessageToDict）
+  - lazy  : parse_frame 后只看 method（addon 对不在 hook 关心范围内的帧就是这样）
+
+用法（仓库根目录）：
+    python scripts/bench_lazy_decode.py [轮数]
+
+会先校验：只看 method 时 data 确实没有被解码，且事后再读出的 dict(view) 与立即读取的一致。
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.mitm.codec import LiqiCodec  # noqa: E402
+
+IDLE = [
+    ("Req", ".lq.Route.heartbeat", {}),
+    ("Req", ".lq.Lobby.fetchServerTime", {}),
+    ("Req", ".lq.Lobby.loginBeat", {"contract": "DF2vkXCnfeXp4WoGrBGNcJBufZiMN3uP"}),
+    ("Req", ".lq.Lobby.fetchAccountInfo", {"accountId": 12345678}),
+    ("Notify", ".lq.NotifyAccountUpdate", {"update": {"numerical": [{"id": 100001, "final": 2000}]}}),
+]
+
+
+def make_traffic(codec: LiqiCodec):
+    """按 Req -> Res 成对生成帧；Res 用空 payload（各 Res 类型都能解）"""
+    frames = []
+    for i, (t, method, data) in enumerate(IDLE, 1):
+        if t == "Notify":
+            frames.append((False, codec.build_frame({"type": t, "method": method, "data": data})))
+            continue
+        frames.append((True, codec.build_frame({"type": "Req", "method": method, "data": data, "id": i})))
+        frames.append((False, codec.build_frame({"type": "Res", "method": method, "data": {}, "id": i})))
+    return frames
+
+
+def run(codec: LiqiCodec, frames, rounds: int, read_data: bool) -> float:
+    # 帧是成对的 Req/Res，每轮结束时 _res_map 已清空，可以复用同一个 codec
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for from_client, content in frames:
+            view = codec.parse_frame(content, from_client)
+            if read_data:
+                view["data"]
+            else:
+                view.get("method")
+    return (time.perf_counter() - t0) / (rounds * len(frames))
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    frames = make_traffic(LiqiCodec())
+
+    a, b = LiqiCodec(), LiqiCodec()
+    for from_client, content in frames:
+        lazy = a.parse_frame(content, from_client)
+        eager_dict = dict(b.parse_frame(content, from_client))
+        lazy.get("method")
+        assert not lazy.decoded
+        assert dict(lazy) == eager_dict, (lazy, eager_dict)
+
+    eager_us = run(a, frames, rounds, True) * 1e6
+    lazy_us = run(a, frames, rounds, False) * 1e6
+    print(f"{len(frames)} idle frames x {rounds} rounds")
+    print(f"eager : {eager_us:7.2f} us/frame")
+    print(f"lazy  : {lazy_us:7.2f} us/frame  ({eager_us / lazy_us:.1f}x)")
+    print("结果一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+protobuf <-> dict 转换的基准：json_format（MessageToDict / ParseDict）对比 backend.mitm.pbconv 的描述符缓存实现。
+
+用法（仓库根目录）：
+    python scripts/bench_pbconv.py [--repeat N] [--check N]
+    python scripts/bench_pbconv.py --all-backends     # 分别在 upb 与纯 Python protobuf 下各跑一遍
+
+消息取 amuletActivity* 相关的几类：ResAmuletEventResponse（对局升级）、ReqAmuletActivityOperate、
+ResFetchAmuletActivityData（随机填充）。跑基准前先做一致性校验：liqi 里每个消息类型各随机填充 --check 条，
+两种实现转出的 dict 必须相同，dict 转回的消息序列化后也必须相同。
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from google.protobuf import descriptor as _d  # noqa: E402
+from google.protobuf.json_format import MessageToDict, ParseDict  # noqa: E402
+
+from backend.mitm import pbconv  # noqa: E402
+from bench_amulet_upgrade import sample_response  # noqa: E402
+from proto import liqi_pb2 as pb  # noqa: E402
+
+F = _d.FieldDescriptor
+
+
+def _random_scalar(field, rnd: random.Random):
+    cpp = field.cpp_type
+    if cpp == F.CPPTYPE_INT32:
+        return rnd.randint(-2 ** 31, 2 ** 31 - 1)
+    if cpp == F.CPPTYPE_UINT32:
+        return rnd.randint(0, 2 ** 32 - 1)
+    if cpp == F.CPPTYPE_INT64:
+        return rnd.randint(-2 ** 63, 2 ** 63 - 1)
+    if cpp == F.CPPTYPE_UINT64:
+        return rnd.randint(0, 2 ** 64 - 1)
+    if cpp in (F.CPPTYPE_FLOAT, F.CPPTYPE_DOUBLE):
+        return rnd.choice([0.0, 1.5, -2.25, rnd.uniform(-1e6, 1e6), float("inf"), float("nan")])
+    if cpp == F.CPPTYPE_BOOL:
+        return rnd.random() < 0.5
+    if cpp == F.CPPTYPE_ENUM:
+        return rnd.choice(field.enum_type.values).number
+    if field.type == F.TYPE_BYTES:
+        return bytes(rnd.randrange(256) for _ in range(rnd.randrange(8)))
+    return rnd.choice(["", "1m", "coin", "中文", str(rnd.random())])
+
+
+def fill_random(msg, rnd: random.Random, depth: int = 0):
+    for field in msg.DESCRIPTOR.fields:
+        if rnd.random() < 0.4:
+            continue
+        n = rnd.randrange(4) if field.is_repeated else 1
+        if field.cpp_type == F.CPPTYPE_MESSAGE:
+            if depth >= 3:
+                continue
+            if field.is_repeated:
+                for _ in range(n):
+                    fill_random(getattr(msg, field.name).add(), rnd, depth + 1)
+            else:
+                sub = getattr(msg, field.name)
+                sub.SetInParent()
+                fill_random(sub, rnd, depth + 1)
+        elif field.is_repeated:
+            getattr(msg, field.name).extend(_random_scalar(field, rnd) for _ in range(n))
+        else:
+            setattr(msg, field.name, _random_scalar(field, rnd))
+    return msg
+
+
+def _json_format_to_dict(msg):
+    return MessageToDict(msg, always_print_fields_with_no_presence=True)
+
+
+def _same(a, b) -> bool:
+    # NaN != NaN：按 repr 比较
+    return repr(a) == repr(b)
+
+
+def check(per_type: int, seed: int = 0) -> int:
+    rnd = random.Random(seed)
+    n = 0
+    for name in pb.DESCRIPTOR.message_types_by_name:
+        cls = getattr(pb, name)
+        for _ in range(per_type):
+            msg = fill_random(cls(), rnd)
+            ref = _json_format_to_dict(msg)
+            got = pbconv.message_to_dict(msg)
+            assert _same(ref, got), (name, ref, got)
+            a = ParseDict(ref, cls()).SerializeToString(deterministic=True)
+            b = pbconv.parse_dict(ref, cls).SerializeToString(deterministic=True)
+            assert a == b, (name, ref)
+            n += 1
+    return n
+
+
+def samples():
+    rnd = random.Random(1)
+    operate = {"activityId": 250811, "type": 1, "tileList": [3, 17, 42]}
+    return [
+        ("ResAmuletEventResponse", pb.ResAmuletEventResponse.FromString(sample_response())),
+        ("ReqAmuletActivityOperate", ParseDict(operate, pb.ReqAmuletActivityOperate())),
+        ("ResFetchAmuletActivityData", fill_random(pb.ResFetchAmuletActivityData(), rnd)),
+    ]
+
+
+def bench(fn, arg, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - t0) / repeat
+
+
+def run(repeat: int, per_type: int):
+    print(f"protobuf {pbconv.backend_info()['version']}, backend={pbconv.protobuf_backend()}")
+    print(f"consistency: {check(per_type)} random messages identical")
+    print(f"  {'message':<28} {'bytes':>6} {'to_dict jf/desc us':>20} {'x':>5} {'parse jf/desc us':>18} {'x':>5}")
+    for name, msg in samples():
+        cls = type(msg)
+        d = _json_format_to_dict(msg)
+        assert _same(d, pbconv.message_to_dict(msg))
+        assert ParseDict(d, cls()).SerializeToString(deterministic=True) == \
+            pbconv.parse_dict(d, cls).SerializeToString(deterministic=True)
+        a = bench(_json_format_to_dict, msg, repeat)
+        b = bench(pbconv.message_to_dict, msg, repeat)
+        c = bench(lambda x: ParseDict(x, cls()), d, repeat)
+        e = bench(lambda x: pbconv.parse_dict(x, cls), d, repeat)
+        print(f"  {name:<28} {msg.ByteSize():>6} {a * 1e6:>9.1f}/{b * 1e6:<9.1f} {a / b:>5.1f}"
+              f" {c * 1e6:>8.1f}/{e * 1e6:<8.1f} {c / e:>6.1f}")
+    print("结果一致")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=500)
+    ap.add_argument("--check", type=int, default=5, help="一致性校验时每个消息类型的随机条数")
+    ap.add_argument("--all-backends", action="store_true", help="分别在 upb 与 python 实现下运行")
+    args = ap.parse_args()
+
+    if not args.all_backends:
+        run(args.repeat, args.check)
+        return
+    argv = [sys.executable, os.path.abspath(__file__), "--repeat", str(args.repeat), "--check", str(args.check)]
+    for impl in ("upb", "python"):
+        print(f"\n=== PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION={impl} ===", flush=True)
+        subprocess.run(argv, env=dict(os.environ, PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=impl), check=True)
+
+
+if __name__ == "__main__":
+    main()
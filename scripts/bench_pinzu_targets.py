@@ -0,0 +1,101 @@
+"""
+纯饼四暗刻目标缺口的微基准：对比三种求“最少癞子数”的方式。
+
+  - counter : 每次现生成 1134 个 Counter 目标逐个比较（旧实现的做法）
+  - table   : 预建 1134 x 9 的 NumPy 目标表，一次相减截断求和 + argmin（需要 numpy）
+  - closed  : 排序前缀和的闭式解（min_pinzu_deficit，规划器热路径在用）
+
+查表版比闭式解慢将近一倍（本机 63.6 us 对 34.5 us），所以只作为参照留在这里，规划器不用它。
+
+用法（仓库根目录）：
+    python scripts/bench_pinzu_targets.py [次数] [随机种子]
+"""
+import os
+import random
+import sys
+import time
+from collections import Counter
+from itertools import combinations
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.autorun.util import suannkou_recommender as suu  # noqa: E402
+
+try:
+    import numpy as np
+except ImportError:  # 没有 numpy 时跳过查表版
+    np = None
+
+
+def counter_min_deficit(cnt):
+    have = Counter({r: cnt[r] for r in range(1, 10)})
+    best = None
+    for trip in combinations(range(1, 10), 4):
+        for pair in range(1, 10):
+            need = Counter()
+            for r in trip:
+                need[r] += 3
+            need[pair] += 2
+            d = sum(max(0, v - have[r]) for r, v in need.items())
+            key = (d, trip, pair)
+            if best is None or key < best:
+                best = key
+    return best
+
+
+def build_targets():
+    # 全部 (4 个不同刻子点数, 雀头点数) 组合：C(9,4) * 9 = 1134 个，按 (刻子, 雀头) 字典序
+    keys, rows = [], []
+    for trip in combinations(range(1, 10), 4):
+        for pair in range(1, 10):
+            need = [0] * 9
+            for r in trip:
+                need[r - 1] += 3
+            need[pair - 1] += 2
+            keys.append((trip, pair))
+            rows.append(need)
+    return keys, np.array(rows, dtype=np.int8)
+
+
+def make_table_min_deficit():
+    keys, targets = build_targets()
+
+    def table_min_deficit(cnt):
+        # argmin 取第一个最小值：表按字典序排列，同缺口时与闭式解的取舍一致
+        d = np.maximum(targets - np.asarray(cnt[1:10], dtype=np.int8), 0).sum(axis=1)
+        i = int(d.argmin())
+        trip, pair = keys[i]
+        return int(d[i]), trip, pair
+
+    return table_min_deficit
+
+
+def bench(name, fn, vectors):
+    t0 = time.perf_counter()
+    out = [fn(c) for c in vectors]
+    dt = time.perf_counter() - t0
+    print(f"{name:<14}: {dt / len(vectors) * 1e6:9.1f} us/call")
+    return out
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    rnd = random.Random(seed)
+    vectors = [[0] + [rnd.randint(0, 5) for _ in range(9)] for _ in range(n)]
+
+    ref = bench("counter", counter_min_deficit, vectors[: max(1, n // 20)])
+    closed = bench("closed-form", suu.min_pinzu_deficit, vectors)
+    bench("closed (value)", suu._pinzu_deficit, vectors)
+    if np is not None:
+        table = bench("table", make_table_min_deficit(), vectors)
+        assert table == closed, "table 与 closed-form 结果不一致"
+    else:
+        print("table         : 未安装 numpy，跳过")
+
+    assert ref == closed[: len(ref)], "counter 与 closed-form 结果不一致"
+    print("结果一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+PacketBot 注入请求后等响应的竞态：服务端回得足够快时，响应可能赶在 waiter 登记之前到达。
+
+  - old    : 先 inject_now 把帧交给 mitm 循环，再 register_waiter_sync（旧 _inject_and_wait 的顺序）
+  - atomic : inject_req，分配 id、登记配对表和 waiter 在同一把锁里完成，之后才交给 mitm 循环
+
+用法（仓库根目录）：
+    python scripts/bench_waiter_race.py [--requests N] [--latency 秒] [--timeout 秒]
+
+mitm 循环跑在单独线程上，假服务端收到注入的 Req 后隔 --latency 秒回 Res（默认 0，即立刻回）。
+报告两种顺序各自的超时次数与 WsAddon.waiter_stats()。old 下每次超时都是响应先到、waiter 后登记，
+白等 --timeout 秒（autorun 里是 3 秒加一轮 1004 重试）；atomic 下应为 0。
+线上看 /api/mitm/waiters：timeout 只应来自服务端真的没回，迟到的响应记在 late。
+
+old 的超时次数取决于线程调度，每次运行都不同：默认参数连跑三次为 2/300、2/300、2/300，
+--requests 500 为 1/500、2/500、2/500；atomic 始终是 0。
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+import types
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mitmproxy.test import tflow  # noqa: E402
+from mitmproxy.websocket import WebSocketMessage  # noqa: E402
+
+from backend.mitm.addon import WsAddon  # noqa: E402
+from backend.mitm.codec import LiqiCodec  # noqa: E402
+
+METHOD = ".lq.Route.heartbeat"
+DATA = {"delay": 100, "platform": 5, "networkQuality": 100, "noOperationCounter": 0}
+
+
+def make_addon(latency: float) -> WsAddon:
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="fake-mitm-loop", daemon=True).start()
+    addon = WsAddon(LiqiCodec())
+    flow = tflow.twebsocketflow()
+    flow.websocket.timestamp_end = None
+    flow.websocket.messages.clear()
+    addon.preferred_flow = flow
+    addon._client_last_req_id[id(flow)] = 1000
+    server = LiqiCodec()
+
+    def deliver(content: bytes, from_client: bool):
+        flow.websocket.messages.append(WebSocketMessage(2, from_client, content))
+        addon.websocket_message(flow)
+
+    def inject(cmd, f, to_client, content, is_text):
+        # 在 mitm 循环上：客户端方向的帧经过 addon，服务端解出 id 后回一个 Res
+        deliver(content, True)
+        view = server.parse_frame(content, True)
+        res = server.build_frame({"type": "Res", "method": view["method"], "data": {}, "id": view["id"]})
+        if latency > 0:
+            loop.call_later(latency, deliver, res, False)
+        else:
+            deliver(res, False)
+
+    addon.master = types.SimpleNamespace(event_loop=loop, commands=types.SimpleNamespace(call=inject))
+    for c in (addon.codec, server):
+        c.warm_up()
+    return addon
+
+
+def request_old(addon: WsAddon, timeout: float) -> bool:
+    ok, _, msg_id = addon.inject_now(method=METHOD, data=DATA, t="Req")
+    ev = addon.register_waiter_sync(msg_id)  # 响应若已经到了，这里只能等到超时
+    if not ev.wait(timeout):
+        addon.discard_waiter_sync(msg_id, timed_out=True)
+        return False
+    addon.pop_waiter_sync_resp(msg_id)
+    return True
+
+
+def request_atomic(addon: WsAddon, timeout: float) -> bool:
+    ok, _, msg_id, ev = addon.inject_req(method=METHOD, data=DATA, wait="sync")
+    if not ev.wait(timeout):
+        addon.discard_waiter_sync(msg_id, timed_out=True)
+        return False
+    addon.pop_waiter_sync_resp(msg_id)
+    return True
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--latency", type=float, default=0.0)
+    ap.add_argument("--timeout", type=float, default=0.2, help="每个请求等响应的秒数（autorun 里是 3）")
+    args = ap.parse_args()
+
+    results = {}
+    for name, fn in (("old", request_old), ("atomic", request_atomic)):
+        addon = make_addon(args.latency)
+        t0 = time.perf_counter()
+        timeouts = sum(not fn(addon, args.timeout) for _ in range(args.requests))
+        dt = time.perf_counter() - t0
+        results[name] = timeouts
+        print(f"{name:<6}: {timeouts:4d}/{args.requests} timeouts, {dt / args.requests * 1e3:7.2f} ms/request, "
+              f"waiters {addon.waiter_stats()}")
+    if args.latency < args.timeout:
+        assert results["atomic"] == 0, "inject_req 之后不应再有超时"
+        print("atomic 无超时")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+LiqiCodec 通知内层 XOR 的基准与一致性检查。
+
+  - slow : 逐字节循环（旧实现，原样保留在下面的 xor_slow）
+  - fast : 按长度缓存掩码 + 整数异或（codec._xor）
+
+用法（仓库根目录）：
+    python scripts/bench_xor.py [每种长度的次数] [随机种子]
+
+先对随机长度/内容检查 fast 与 slow 逐字节一致、且 fast(fast(x)) == x，再对几种典型长度计时。
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.mitm.codec import _KEYS, _xor  # noqa: E402
+
+
+def xor_slow(data: bytes) -> bytes:
+    # 改写前 codec._xor 的原样实现，作对照用
+    b = bytearray(data)
+    n = len(b)
+    for i in range(n):
+        u = (23 ^ n) + 5 * i + _KEYS[i % len(_KEYS)] & 255
+        b[i] ^= u
+    return bytes(b)
+
+
+def check(rnd: random.Random, cases: int = 2000) -> None:
+    for _ in range(cases):
+        n = rnd.choice((0, 1, 2, 8, 9, 10, 17, rnd.randint(0, 4096)))
+        data = rnd.randbytes(n)
+        fast = _xor(data)
+        assert fast == xor_slow(data), f"mismatch at n={n}"
+        assert _xor(fast) == data, f"round-trip failed at n={n}"
+    print(f"一致性检查通过（{cases} 组）")
+
+
+def bench(n: int, repeat: int, rnd: random.Random) -> None:
+    payloads = [rnd.randbytes(n) for _ in range(repeat)]
+    t0 = time.perf_counter()
+    for p in payloads:
+        xor_slow(p)
+    t_slow = time.perf_counter() - t0
+    _xor(payloads[0])  # 预热掩码缓存
+    t0 = time.perf_counter()
+    for p in payloads:
+        _xor(p)
+    t_fast = time.perf_counter() - t0
+    print(f"n={n:>6}: slow {t_slow / repeat * 1e6:9.2f} us   fast {t_fast / repeat * 1e6:7.2f} us   x{t_slow / t_fast:6.1f}")
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    rnd = random.Random(seed)
+    check(rnd)
+    for n in (32, 256, 1024, 4096, 16384):
+        bench(n, repeat, rnd)
+
+
+if __name__ == "__main__":
+    main()